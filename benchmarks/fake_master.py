@@ -0,0 +1,391 @@
+"""serve a /slaves and /state.json pair the way a Mesos master would
+
+    python -m benchmarks.fake_master test/dev-mom_prod-mom_slave.json \\
+                                     test/dev-mom_prod-mom_state.json --port 5050
+    dcos_monitor --master 127.0.0.1:5050 print_full_status
+
+Besides the two documents themselves it derives /state-summary,
+/frameworks, paged /tasks and /roles from them, so the fetch planner can be
+compared with /state.json on the same data.  Every request is logged and
+the bytes sent per endpoint are printed on exit; --page-limit caps /tasks
+pages and --no-endpoints only serves /slaves and /state.json, like an old
+master.
+
+Marathon is served under /marathon: /v2/apps (with the embed, label and id
+filters), /v2/groups and /v2/info, its apps made up from the tasks of the
+framework called marathon.
+
+A SUBSCRIBE call to /api/v1 is answered with a SUBSCRIBED snapshot of the
+documents (converted to v1), then the events of --events (a RecordIO
+stream, e.g. written by benchmarks.record_events) --event-delay seconds
+apart, then heartbeats.  A recorded stream that starts with its own
+SUBSCRIBED event is replayed as is.
+"""
+import collections
+import gzip
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import click
+
+from dcos_monitor.marathon import label_matches, task_app_id
+from dcos_monitor.operator_api import encode_record, read_file
+from dcos_monitor.planner import SUMMARY_FIELDS, TASK_LISTS
+
+# task counts of a summarized framework or agent
+COUNTED_STATES = ('TASK_STAGING', 'TASK_STARTING', 'TASK_RUNNING', 'TASK_KILLING', 'TASK_FINISHED',
+                  'TASK_KILLED', 'TASK_FAILED', 'TASK_LOST', 'TASK_ERROR', 'TASK_UNREACHABLE')
+AGENT_SUMMARY_FIELDS = ('id', 'pid', 'hostname', 'registered_time', 'resources', 'used_resources',
+                        'offered_resources', 'reserved_resources', 'unreserved_resources',
+                        'attributes', 'active', 'version')
+
+
+def all_tasks(state):
+    for framework in state.get('frameworks', []) + state.get('completed_frameworks', []):
+        for field in TASK_LISTS:
+            for task in framework.get(field, []):
+                yield task
+
+
+def count_states(tasks):
+    counts = collections.Counter(task.get('state') for task in tasks)
+    return {state: counts.get(state, 0) for state in COUNTED_STATES}
+
+
+def state_summary(slaves, state):
+    frameworks = []
+    for framework in state.get('frameworks', []):
+        summary = {field: framework[field] for field in SUMMARY_FIELDS if field in framework}
+        summary.update(count_states(task for field in TASK_LISTS for task in framework.get(field, [])))
+        frameworks.append(summary)
+
+    tasks_by_agent = collections.defaultdict(list)
+    for task in all_tasks(state):
+        tasks_by_agent[task.get('slave_id')].append(task)
+    agents = []
+    for slave in slaves.get('slaves', []):
+        summary = {field: slave[field] for field in AGENT_SUMMARY_FIELDS if field in slave}
+        summary.update(count_states(tasks_by_agent[slave['id']]))
+        agents.append(summary)
+
+    return {'hostname': state.get('hostname'), 'cluster': state.get('cluster'),
+            'slaves': agents, 'frameworks': frameworks}
+
+
+def roles(state):
+    by_role = collections.OrderedDict()
+    for framework in state.get('frameworks', []):
+        role = by_role.setdefault(framework.get('role', '*'), {'frameworks': [], 'resources': {}})
+        role['frameworks'].append(framework['id'])
+        for resource, amount in framework.get('used_resources', {}).items():
+            if isinstance(amount, (int, float)):
+                role['resources'][resource] = role['resources'].get(resource, 0) + amount
+    return {'roles': [dict(name=name, weight=1.0, **role) for name, role in by_role.items()]}
+
+
+#
+# v0 -> v1, for the SUBSCRIBED snapshot
+#
+
+def v1_id(value):
+    return {'value': value}
+
+
+def v1_nanoseconds(seconds):
+    return {'nanoseconds': int((seconds or 0) * 1e9)}
+
+
+# {'cpus': 1.0, 'ports': '[1-2, 5-6]'} -> v1 Resources
+def v1_resources(resources, role='*'):
+    items = []
+    for name, amount in sorted(resources.items()):
+        if isinstance(amount, (int, float)):
+            if amount:
+                items.append({'name': name, 'type': 'SCALAR', 'scalar': {'value': amount}, 'role': role})
+        elif amount.startswith('['):
+            ranges = []
+            for r in amount.strip('[]').split(','):
+                if r.strip():
+                    begin, _, end = r.strip().partition('-')
+                    ranges.append({'begin': int(begin), 'end': int(end or begin)})
+            items.append({'name': name, 'type': 'RANGES', 'ranges': {'range': ranges}, 'role': role})
+    return items
+
+
+def v1_attribute(name, value):
+    if isinstance(value, (int, float)):
+        return {'name': name, 'type': 'SCALAR', 'scalar': {'value': value}}
+    return {'name': name, 'type': 'TEXT', 'text': {'value': value}}
+
+
+def v1_agent(slave):
+    total = list(slave.get('unreserved_resources_full', []))
+    for items in slave.get('reserved_resources_full', {}).values():
+        total += items
+    return {
+        'agent_info': {
+            'id': v1_id(slave['id']),
+            'hostname': slave['hostname'],
+            'port': slave.get('port', 5051),
+            'attributes': [v1_attribute(name, value) for name, value in sorted(slave.get('attributes', {}).items())],
+            'resources': total,
+        },
+        'active': slave.get('active', True),
+        'pid': slave.get('pid'),
+        'version': slave.get('version'),
+        'registered_time': v1_nanoseconds(slave.get('registered_time')),
+        'capabilities': [{'type': c} for c in slave.get('capabilities', [])],
+        'total_resources': total,
+        'allocated_resources': slave.get('used_resources_full', []),
+        'offered_resources': slave.get('offered_resources_full', []),
+    }
+
+
+def v1_framework(framework):
+    info = {'id': v1_id(framework['id']), 'name': framework['name'],
+            'capabilities': [{'type': c} for c in framework.get('capabilities', [])]}
+    for field in ('user', 'role', 'principal', 'hostname', 'webui_url'):
+        if framework.get(field) is not None:
+            info[field] = framework[field]
+    return {'framework_info': info, 'active': framework.get('active', True),
+            'connected': framework.get('connected', True), 'recovered': framework.get('recovered', False),
+            'registered_time': v1_nanoseconds(framework.get('registered_time'))}
+
+
+def v1_status(task, status):
+    record = {'task_id': v1_id(task['id']), 'agent_id': v1_id(task['slave_id'])}
+    record.update({field: status[field] for field in ('state', 'timestamp', 'healthy', 'container_status')
+                   if field in status})
+    if 'labels' in status:
+        record['labels'] = {'labels': status['labels']}
+    return record
+
+
+# /state.json doesn't say which reservation a task's resources come from,
+# take them from its role's reservation when its agent has one
+def v1_task(task, agents):
+    role = task.get('role', '*')
+    if role not in agents.get(task['slave_id'], {}).get('reserved_resources_full', {}):
+        role = '*'
+    record = {
+        'name': task['name'],
+        'task_id': v1_id(task['id']),
+        'framework_id': v1_id(task['framework_id']),
+        'agent_id': v1_id(task['slave_id']),
+        'state': task['state'],
+        'resources': v1_resources(task.get('resources', {}), role),
+        'statuses': [v1_status(task, status) for status in task.get('statuses', [])],
+        'labels': {'labels': task.get('labels', [])},
+    }
+    if task.get('executor_id'):
+        record['executor_id'] = v1_id(task['executor_id'])
+    for field in ('discovery', 'container', 'user'):
+        if field in task:
+            record[field] = task[field]
+    return record
+
+
+def v1_executor(framework, executor):
+    return {'agent_id': v1_id(executor['slave_id']),
+            'executor_info': {'executor_id': v1_id(executor['id']), 'framework_id': v1_id(framework['id']),
+                              'resources': v1_resources(executor.get('resources', {}), framework.get('role', '*'))}}
+
+
+def subscribed_event(slaves, state):
+    frameworks = state.get('frameworks', [])
+    agents = {slave['id']: slave for slave in slaves.get('slaves', [])}
+    return {'type': 'SUBSCRIBED', 'subscribed': {
+        'heartbeat_interval_seconds': 15,
+        'get_state': {
+            'get_agents': {'agents': [v1_agent(slave) for slave in slaves.get('slaves', [])]},
+            'get_frameworks': {'frameworks': [v1_framework(framework) for framework in frameworks]},
+            'get_executors': {'executors': [v1_executor(framework, executor) for framework in frameworks
+                                            for executor in framework.get('executors', [])]},
+            'get_tasks': {field: [v1_task(task, agents) for framework in frameworks for task in framework.get(field, [])]
+                          for field in TASK_LISTS},
+        },
+    }}
+
+
+# the tasks of the framework called marathon as Marathon would list them
+def marathon_apps(state):
+    frameworks = [f for f in state.get('frameworks', []) if f.get('name') == 'marathon']
+    apps = collections.OrderedDict()
+    for framework in frameworks:
+        for task in framework.get('tasks', []):
+            app_id = task_app_id(task['id'])
+            if app_id is None:
+                continue
+            if app_id not in apps:
+                resources = task.get('resources', {})
+                apps[app_id] = {
+                    'id': app_id, 'instances': 0, 'cpus': resources.get('cpus', 1.0),
+                    'mem': resources.get('mem', 128.0), 'disk': resources.get('disk', 0.0),
+                    'gpus': resources.get('gpus', 0.0), 'acceptedResourceRoles': [task.get('role', '*')],
+                    'portDefinitions': [{'port': 0, 'protocol': 'tcp'}], 'fetch': [], 'env': {},
+                    'labels': {'tier': 'public' if task.get('role') == 'slave_public' else 'private'},
+                    'container': {'type': 'DOCKER', 'docker': {'image': 'example/{0}'.format(app_id.split('/')[-1])}},
+                    'tasksStaged': 0, 'tasksRunning': 0, 'tasksHealthy': 0, 'tasksUnhealthy': 0, 'tasks': [],
+                }
+            app = apps[app_id]
+            app['instances'] += 1
+            app['tasksRunning' if task['state'] == 'TASK_RUNNING' else 'tasksStaged'] += 1
+            app['tasks'].append({'id': task['id'], 'appId': app_id, 'slaveId': task.get('slave_id'),
+                                 'state': task['state'], 'host': None})
+    return {'frameworkId': frameworks[0]['id'] if frameworks else None, 'apps': list(apps.values())}
+
+
+class FakeMaster(object):
+
+    def __init__(self, slaves, state, page_limit=None, endpoints=True, events=(), event_delay=0):
+        self.page_limit = page_limit
+        self.subscribed = subscribed_event(slaves, state)
+        # recorded events, replayed to every subscriber
+        self.events = list(events)
+        self.event_delay = event_delay
+        self.tasks = list(all_tasks(state))
+        self.documents = {
+            '/slaves': slaves,
+            '/state.json': state,
+            '/state': state,
+        }
+        if endpoints:
+            self.documents.update({
+                '/state-summary': state_summary(slaves, state),
+                '/frameworks': {'frameworks': state.get('frameworks', []),
+                                'completed_frameworks': state.get('completed_frameworks', []),
+                                'unregistered_frameworks': []},
+                '/roles': roles(state),
+            })
+        self.marathon = marathon_apps(state)
+        self.sent = collections.Counter()
+
+    # the document for a request path, None for a 404
+    def answer(self, path):
+        url = urlparse(path)
+        if url.path.startswith('/marathon/'):
+            return self.answer_marathon(url.path[len('/marathon'):], parse_qs(url.query))
+        if url.path == '/tasks' and '/frameworks' in self.documents:
+            query = parse_qs(url.query)
+            limit = int(query.get('limit', ['100'])[0])
+            if self.page_limit is not None:
+                limit = min(limit, self.page_limit)
+            offset = int(query.get('offset', ['0'])[0])
+            tasks = self.tasks if query.get('order', ['desc'])[0] == 'asc' else self.tasks[::-1]
+            return {'tasks': tasks[offset:offset + limit]}
+        return self.documents.get(url.path)
+
+    def answer_marathon(self, path, query):
+        apps = self.marathon['apps']
+        if path == '/v2/info':
+            return {'name': 'marathon', 'frameworkId': self.marathon['frameworkId']}
+        if path == '/v2/apps':
+            embed = query.get('embed', [])
+            if 'id' in query:
+                apps = [app for app in apps if query['id'][0] in app['id']]
+            if 'label' in query:
+                apps = [app for app in apps if label_matches(app['labels'], query['label'][0])]
+            return {'apps': [dict(app, tasks=app['tasks'] if 'apps.tasks' in embed else [])
+                             for app in apps]}
+        if path == '/v2/groups':
+            embed = query.get('embed', [])
+            group_ids = sorted(set('/' + app['id'].split('/')[1] for app in apps if app['id'].count('/') > 1))
+            return {'id': '/',
+                    'apps': [dict(app, tasks=app['tasks'] if 'group.apps.tasks' in embed else [])
+                             for app in apps if app['id'].count('/') == 1] if 'group.apps' in embed else [],
+                    'groups': [{'id': group_id} for group_id in group_ids] if 'group.groups' in embed else []}
+        return None
+
+    # RecordIO records of a SUBSCRIBE call, forever
+    def subscription(self, heartbeat=15):
+        if not self.events or json.loads(self.events[0].decode('utf-8')).get('type') != 'SUBSCRIBED':
+            yield encode_record(self.subscribed)
+        for record in self.events:
+            time.sleep(self.event_delay)
+            yield b'%d\n' % len(record) + record
+        while True:
+            time.sleep(heartbeat)
+            yield encode_record({'type': 'HEARTBEAT'})
+
+
+def make_handler(master):
+
+    class Handler(BaseHTTPRequestHandler):
+        # the event stream is sent chunked, like the master does
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            document = master.answer(self.path)
+            if document is None:
+                self.send_error(404)
+                return
+            body = json.dumps(document).encode('utf-8')
+            gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+            if gzipped:
+                body = gzip.compress(body)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            if gzipped:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            master.sent[urlparse(self.path).path] += len(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            call = json.loads(body.decode('utf-8') or '{}')
+            if urlparse(self.path).path != '/api/v1' or call.get('type') != 'SUBSCRIBE':
+                self.send_error(400)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            try:
+                for record in master.subscription():
+                    self.wfile.write(b'%x\r\n' % len(record) + record + b'\r\n')
+                    self.wfile.flush()
+                    master.sent['/api/v1'] += len(record)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, fmt, *args):
+            sys.stderr.write("{0} {1}\n".format(self.address_string(), fmt % args))
+
+    return Handler
+
+
+@click.command()
+@click.argument('slaves_file', type=click.File('r'))
+@click.argument('state_file', type=click.File('r'))
+@click.option('--host', default='127.0.0.1')
+@click.option('--port', type=click.INT, default=5050)
+@click.option('--page-limit', type=click.INT, default=None,
+                help='largest /tasks page served, whatever limit is asked for')
+@click.option('--endpoints/--no-endpoints', default=True,
+                help='serve /state-summary, /frameworks, /tasks and /roles')
+@click.option('--events', 'events_file', type=click.File('rb'), default=None,
+                help='RecordIO event stream to replay to subscribers')
+@click.option('--event-delay', type=click.FLOAT, default=1,
+                help='seconds between replayed events')
+def main(slaves_file, state_file, host, port, page_limit, endpoints, events_file, event_delay):
+    events = list(read_file(events_file)) if events_file else []
+    master = FakeMaster(json.load(slaves_file), json.load(state_file), page_limit, endpoints,
+                        events, event_delay)
+    server = ThreadingHTTPServer((host, port), make_handler(master))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for path, sent in sorted(master.sent.items()):
+            sys.stderr.write("{0:<20} {1:>12} bytes sent\n".format(path, sent))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""write the documents of a synthetic cluster to a directory
+
+    python -m benchmarks.generate_cluster /tmp/cluster --agents 1000
+    dcos_monitor --slave_data_file /tmp/cluster/slaves.json \\
+                 --state_data_file /tmp/cluster/state.json print_full_status
+"""
+import click
+
+from benchmarks import synthetic
+
+
+@click.command()
+@click.argument('directory', type=click.Path(file_okay=False))
+@click.option('--agents', type=click.INT, default=10)
+@click.option('--frameworks', type=click.INT, default=None,
+                help='default: one per 50 agents, at least 2')
+@click.option('--tasks', type=click.INT, default=None,
+                help='default: 4 per agent')
+@click.option('--seed', type=click.INT, default=0)
+@click.option('--statistics/--no-statistics', default=False,
+                help='also write statistics/<hostname>.json for every agent')
+def main(directory, agents, frameworks, tasks, seed, statistics):
+    cluster = synthetic.generate(agents, frameworks=frameworks, tasks=tasks, seed=seed)
+    cluster.write(directory, statistics=statistics)
+
+
+if __name__ == '__main__':
+    main()
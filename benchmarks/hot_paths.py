@@ -0,0 +1,182 @@
+"""time and memory-profile the hot paths on synthetic clusters
+
+    python -m benchmarks.hot_paths --agents 10,1000,10000 --output results.json
+    python -m benchmarks.hot_paths --agents 1000 --compare results.json
+
+Every path runs `--repeat` times for timing (the best and median run are
+kept) and once more under tracemalloc for its peak allocation, so the
+timings are not skewed by tracing.  Results are written as JSON together
+with the interpreter and commit they were taken on; --compare prints the
+ratio against an earlier results file.
+"""
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+import click
+
+from benchmarks import synthetic
+from dcos_monitor import jsonstream, model
+from dcos_monitor.aggregation import ClusterResources
+from dcos_monitor.agent_table import gather_cluster_stats
+from dcos_monitor.cli import Context
+from dcos_monitor.cmds.cmd_print_full_status import print_agent, print_agent_info
+from dcos_monitor.cmds.cmd_role_data import RoleStats
+from dcos_monitor.placement import AppSpec, FreeResources
+from dcos_monitor.task_index import TASK_INDEX_FIELDS, aggregate_tasks_by_vip
+
+# seconds between the two container statistics samples rendered
+SAMPLE_INTERVAL = 5
+
+
+# name -> function(cluster, documents) returning the function to time
+def hot_paths():
+    return [
+        ('json.loads /slaves', lambda c, d: lambda: json.loads(d['slaves'])),
+        ('json.loads /state.json', lambda c, d: lambda: json.loads(d['state'])),
+        ('model.compact /state.json', lambda c, d: lambda: model.compact(c.state_data)),
+        ('jsonstream /state.json (task index fields)',
+         lambda c, d: lambda: jsonstream.load(io.BytesIO(d['state'].encode('utf-8')), TASK_INDEX_FIELDS)),
+        ('gather_cluster_stats', lambda c, d: lambda: gather_cluster_stats(c.slave_data)),
+        ('aggregate agent resources', lambda c, d: lambda: list(ClusterResources(c.slave_data['slaves']))),
+        ('RoleStats', lambda c, d: lambda: RoleStats(d['ctx'], c.slave_data['slaves'])),
+        ('FreeResources', lambda c, d: lambda: FreeResources(c.slave_data['slaves'])),
+        ('FreeResources.fit (100 specs)', lambda c, d: fit_specs(FreeResources(c.slave_data['slaves']))),
+        ('aggregate_tasks_by_vip', lambda c, d: lambda: vips_by_framework(c.state_data)),
+        ('print_agent_info', lambda c, d: lambda: render(print_agent_info, c.slave_data['slaves'], False, True)),
+        ('print_agent_info --container-stats', lambda c, d: lambda: render(render_agents, c, d['samples'])),
+    ]
+
+
+# what fit --app does with a file of 100 candidate specs
+def fit_specs(free):
+    specs = [AppSpec('/bench/{0}'.format(i), 0.1 * (1 + i % 8), 128.0 * (1 + i % 16), 0.0, 0.0, i % 4,
+                     ('*',) if i % 2 else ('*', 'slave_public'), 10) for i in range(100)]
+    return lambda: [free.fit(spec) for spec in specs]
+
+
+def vips_by_framework(state_data):
+    return [aggregate_tasks_by_vip(framework['tasks']) for framework in state_data['frameworks']]
+
+
+# what print_agent_info does once the agents have been sampled
+def render_agents(cluster, samples):
+    for slave in cluster.slave_data['slaves']:
+        print_agent(slave, True, True, samples)
+
+
+def render(func, *args):
+    out = io.StringIO()
+    with redirect_stdout(out):
+        func(*args)
+    return out.tell()
+
+
+def prepare(cluster):
+    start = 1514500000.0
+    samples = {hostname: [index_containers(cluster.statistics(hostname, start)),
+                          index_containers(cluster.statistics(hostname, start + SAMPLE_INTERVAL))]
+               for hostname in cluster.hostnames}
+    return {
+        'slaves': json.dumps(cluster.slave_data),
+        'state': json.dumps(cluster.state_data),
+        'samples': samples,
+        'ctx': Context(),
+    }
+
+
+def index_containers(containers):
+    return {container['executor_id']: container for container in containers}
+
+
+def measure(func, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'best': min(times), 'median': statistics.median(times), 'peak_bytes': peak}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous):
+    before = {(r['path'], r['agents']): r for r in previous['results']}
+    print("")
+    print("{0:<45} {1:>7} {2:>10} {3:>10}".format('path', 'agents', 'time', 'peak mem'))
+    for result in results:
+        old = before.get((result['path'], result['agents']))
+        if old is None:
+            continue
+        print("{0:<45} {1:>7} {2:>9.2f}x {3:>9.2f}x".format(
+            result['path'], result['agents'],
+            result['best'] / old['best'] if old['best'] else 0,
+            result['peak_bytes'] / float(old['peak_bytes']) if old['peak_bytes'] else 0))
+
+
+@click.command()
+@click.option('--agents', default='10,1000,10000',
+                help='comma separated cluster sizes to run at')
+@click.option('--tasks-per-agent', type=click.INT, default=4)
+@click.option('--repeat', type=click.INT, default=3,
+                help='timed runs per path and size')
+@click.option('--seed', type=click.INT, default=0)
+@click.option('--path', 'only', multiple=True,
+                help='only run paths whose name contains this (can be repeated)')
+@click.option('--output', type=click.Path(dir_okay=False), default=None,
+                help='write the results to this JSON file')
+@click.option('--compare', 'previous', type=click.File('r'), default=None,
+                help='print the change against an earlier results file')
+def main(agents, tasks_per_agent, repeat, seed, only, output, previous):
+    results = []
+    for size in [int(n) for n in agents.split(',')]:
+        cluster = synthetic.generate(size, tasks=size * tasks_per_agent, seed=seed)
+        documents = prepare(cluster)
+        for name, setup in hot_paths():
+            if only and not any(o in name for o in only):
+                continue
+            result = measure(setup(cluster, documents), repeat)
+            result.update(path=name, agents=size)
+            results.append(result)
+            print("{path:<45} {agents:>7} agents {best:>10.4f}s best {median:>10.4f}s median "
+                  "{peak_mb:>9.1f} MB peak".format(peak_mb=result['peak_bytes'] / 1048576.0, **result),
+                  file=sys.stderr)
+
+    report = {
+        'taken': time.time(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'seed': seed,
+        'tasks_per_agent': tasks_per_agent,
+        'results': results,
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if previous:
+        compare(results, json.load(previous))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""memory taken by the parsed payloads, as dicts and as model.py records
+
+    python -m benchmarks.memory --agents 10000 --tasks 200000
+
+The /slaves and /state.json documents of a synthetic cluster are parsed
+with json.loads (the dicts commands used to be handed) and then compacted
+by model.compact (what Context keeps).  Both are sized by walking them and
+adding up sys.getsizeof of every object, strings shared between objects
+are counted once; tracemalloc would need more memory than the dicts of a
+cluster this size take themselves.
+"""
+import gc
+import json
+import sys
+import time
+
+import click
+
+from benchmarks import synthetic
+from dcos_monitor import model
+
+
+# bytes taken by a parsed document and everything in it
+def deep_size(document):
+    size = 0
+    seen = set()
+    stack = [document]
+    while stack:
+        value = stack.pop()
+        value_type = type(value)
+        if value_type is str:
+            if id(value) in seen:
+                continue
+            seen.add(id(value))
+        elif value_type is dict:
+            stack.extend(value)
+            stack.extend(value.values())
+        elif value_type is list:
+            stack.extend(value)
+        elif isinstance(value, model.Record):
+            stack.extend(value.values())
+        elif value is None or value_type is bool:
+            continue
+        size += sys.getsizeof(value)
+    return size
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    value = func(*args)
+    return value, time.perf_counter() - started
+
+
+@click.command()
+@click.option('--agents', type=click.INT, default=10000)
+@click.option('--tasks', type=click.INT, default=200000)
+@click.option('--seed', type=click.INT, default=0)
+def main(agents, tasks, seed):
+    print("generating {0} agents, {1} tasks".format(agents, tasks), file=sys.stderr)
+    cluster = synthetic.generate(agents, tasks=tasks, seed=seed)
+    documents = [('/slaves', json.dumps(cluster.slave_data)), ('/state.json', json.dumps(cluster.state_data))]
+    del cluster
+    gc.collect()
+
+    print("{0:<12} {1:>10} {2:>12} {3:>12} {4:>8} {5:>10} {6:>10}".format(
+        'payload', 'JSON MB', 'dicts MB', 'records MB', 'ratio', 'parse s', 'compact s'))
+    while documents:
+        name, text = documents.pop(0)
+        parsed, parse_seconds = timed(json.loads, text)
+        dicts = deep_size(parsed)
+        records, compact_seconds = timed(model.compact, parsed)
+        del parsed
+        compacted = deep_size(records)
+        print("{0:<12} {1:>10.1f} {2:>12.1f} {3:>12.1f} {4:>7.2f}x {5:>10.2f} {6:>10.2f}".format(
+            name, len(text) / 1048576.0, dicts / 1048576.0, compacted / 1048576.0,
+            compacted / float(dicts), parse_seconds, compact_seconds))
+        del records, text
+        gc.collect()
+
+
+if __name__ == '__main__':
+    main()
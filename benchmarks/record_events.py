@@ -0,0 +1,30 @@
+"""record the event stream of a master for benchmarks.fake_master --events
+
+    python -m benchmarks.record_events 10.0.6.89 events.recordio --seconds 300
+"""
+import time
+
+import click
+
+from dcos_monitor.operator_api import encode_record, subscribe
+
+
+@click.command()
+@click.argument('master')
+@click.argument('output', type=click.File('wb'))
+@click.option('--seconds', type=click.FLOAT, default=60,
+                help='stop recording after this long')
+@click.option('--heartbeats/--no-heartbeats', default=False,
+                help='also record HEARTBEAT events')
+def main(master, output, seconds, heartbeats):
+    stop = time.time() + seconds
+    for event in subscribe(master):
+        if heartbeats or event.get('type') != 'HEARTBEAT':
+            output.write(encode_record(event))
+            output.flush()
+        if time.time() >= stop:
+            break
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""time how long dcos_monitor takes to start, in a fresh interpreter per run
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 20 --budget 0.1 -- --help
+
+Every command line (`--help` and `dummy` unless given after --) runs
+`--repeat` times in its own interpreter, and so does `python -c pass`, the
+median of the latter is what the interpreter costs on its own.  What
+dcos_monitor adds on top of it has to stay under --budget seconds, and none
+of HEAVY_MODULES may have been imported by the time the command exits,
+otherwise the exit status is 1.
+"""
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+import click
+
+# modules that only commands going out on the network should pay for
+HEAVY_MODULES = ('requests', 'urllib3', 'socket', 'ssl', 'sqlite3', 'dcos_monitor.planner',
+                 'dcos_monitor.archive', 'dcos_monitor.cluster_model')
+
+# the console script, as setup.py's entry point runs it
+RUN_CLI = "from dcos_monitor.cli import cli; cli()"
+
+# the same, reporting the heavy modules that were loaded on the way out
+CHECK_CLI = """
+import atexit, json, sys
+atexit.register(lambda: sys.stderr.write('HEAVY ' + json.dumps(
+    [m for m in {heavy!r} if m in sys.modules]) + '\\n'))
+from dcos_monitor.cli import cli; cli()
+"""
+
+
+def run(args):
+    started = time.perf_counter()
+    subprocess.check_call([sys.executable, '-W', 'ignore'] + args,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def measure(args, repeat):
+    times = [run(args) for _ in range(repeat)]
+    return {'best': min(times), 'median': statistics.median(times)}
+
+
+def heavy_modules(argv):
+    check = CHECK_CLI.format(heavy=HEAVY_MODULES)
+    process = subprocess.run([sys.executable, '-W', 'ignore', '-c', check] + argv,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    for line in process.stderr.decode('utf-8', 'replace').splitlines():
+        if line.startswith('HEAVY '):
+            return json.loads(line[len('HEAVY '):])
+    raise click.ClickException("{0} did not exit cleanly:\n{1}".format(
+        ' '.join(argv), process.stderr.decode('utf-8', 'replace')))
+
+
+@click.command(context_settings={'ignore_unknown_options': True})
+@click.option('--repeat', type=click.INT, default=10,
+                help='runs per command line')
+@click.option('--budget', type=click.FLOAT, default=0.1,
+                help='seconds dcos_monitor may add to the interpreter\'s own startup')
+@click.argument('argv', nargs=-1, type=click.UNPROCESSED)
+def main(repeat, budget, argv):
+    command_lines = [list(argv)] if argv else [['--help'], ['dummy']]
+    interpreter = measure(['-c', 'pass'], repeat)
+    print("{0:<30} {1:>8.4f}s best {2:>8.4f}s median".format(
+        'python -c pass', interpreter['best'], interpreter['median']))
+
+    failed = False
+    for command_line in command_lines:
+        result = measure(['-c', RUN_CLI] + command_line, repeat)
+        added = result['median'] - interpreter['median']
+        heavy = heavy_modules(command_line)
+        print("{0:<30} {1:>8.4f}s best {2:>8.4f}s median {3:>8.4f}s added  imported: {4}".format(
+            'dcos_monitor ' + ' '.join(command_line), result['best'], result['median'], added,
+            ', '.join(heavy) or '-'))
+        failed = failed or added > budget or bool(heavy)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
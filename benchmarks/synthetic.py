@@ -0,0 +1,396 @@
+"""synthetic clusters shaped like the documents in test/
+
+generate() builds the /slaves and /state.json documents of a made up
+cluster of any size, and SyntheticCluster.statistics() the
+/monitor/statistics.json of any of its agents at any point in time.
+Everything is derived from a seed, so the same arguments always give the
+same cluster.
+
+Agents come in the flavours found in the fixtures: public agents statically
+reserved for slave_public, private agents with dynamic (labelled)
+reservations for a service role, and plain private agents.  Tasks belong to
+apps of a few instances each, every app listens on one port and some apps
+carry a VIP label.
+"""
+import json
+import os
+import random
+import uuid
+
+from dcos_monitor.ports import PortSet
+
+AGENT_PORTS = "[1025-2180, 2182-3887, 3889-5049, 5052-8079, 8082-8180, 8182-32000]"
+PUBLIC_AGENT_PORTS = "[1-21, 23-5050, 5052-32000]"
+# first port handed out to tasks on an agent
+TASK_PORT_BASE = 10000
+
+AGENT_SIZES = [(4, 15026.0), (8, 30720.0), (16, 61440.0), (32, 122880.0)]
+TASK_CPUS = [0.1, 0.25, 0.5, 1.0]
+TASK_MEM = [128.0, 256.0, 512.0, 1024.0]
+ZONES = ['aws/us-west-2a', 'aws/us-west-2b', 'aws/us-west-2c']
+# roles private agents carry dynamic reservations for
+SERVICE_ROLES = ['cassandra-role', 'kafka-role', 'hdfs-role', 'elastic-role']
+
+PUBLIC_AGENT_SHARE = 0.1
+RESERVED_AGENT_SHARE = 0.3
+VIP_APP_SHARE = 0.3
+RUNNING_TASK_SHARE = 0.95
+
+
+def scalar_resource(name, value, role='*', reservation=None, allocated=False):
+    item = {'name': name, 'type': 'SCALAR', 'scalar': {'value': value}, 'role': role}
+    add_reservation(item, role, reservation)
+    if allocated:
+        item['allocation_info'] = {'role': role}
+    return item
+
+
+def ranges_resource(ranges, role='*', reservation=None, allocated=False, name='ports'):
+    item = {'name': name, 'type': 'RANGES', 'role': role,
+            'ranges': {'range': [{'begin': begin, 'end': end} for begin, end in ranges]}}
+    add_reservation(item, role, reservation)
+    if allocated:
+        item['allocation_info'] = {'role': role}
+    return item
+
+
+# static reservations only list the role, dynamic ones also carry the
+# principal and the resource_id label in both the old and the new field
+def add_reservation(item, role, reservation):
+    if role == '*':
+        return
+    if reservation is None:
+        item['reservations'] = [{'role': role, 'type': 'STATIC'}]
+        return
+    labels = {'labels': [{'key': 'resource_id', 'value': reservation}]}
+    item['reservation'] = {'principal': role.replace('-role', '-principal'), 'labels': labels}
+    item['reservations'] = [{'role': role, 'type': 'DYNAMIC',
+                             'principal': role.replace('-role', '-principal'), 'labels': labels}]
+
+
+def empty_scalars():
+    return {'cpus': 0.0, 'gpus': 0.0, 'mem': 0.0, 'disk': 0.0}
+
+
+class SyntheticCluster(object):
+    """the documents of one generated cluster
+
+    slave_data      the /slaves document
+    state_data      the /state.json document
+    agent_tasks     hostname -> [task, ...] for the statistics documents
+    """
+
+    def __init__(self, slave_data, state_data, agent_tasks, seed):
+        self.slave_data = slave_data
+        self.state_data = state_data
+        self.agent_tasks = agent_tasks
+        self.seed = seed
+
+    @property
+    def hostnames(self):
+        return [slave['hostname'] for slave in self.slave_data['slaves']]
+
+    # /monitor/statistics.json of an agent at `timestamp`, counters grow
+    # linearly so any two samples give sensible rates
+    def statistics(self, hostname, timestamp=1514500000.0):
+        containers = []
+        for task in self.agent_tasks.get(hostname, []):
+            if task['state'] != 'TASK_RUNNING':
+                continue
+            rng = random.Random("{0}/{1}".format(self.seed, task['id']))
+            cpus = task['resources']['cpus']
+            mem_limit = int(task['resources']['mem'] * 1024 * 1024)
+            cpu_rate = cpus * rng.uniform(0.05, 0.9)
+            elapsed = timestamp - 1514400000.0
+            containers.append({
+                'executor_id': task['id'],
+                'executor_name': "Command Executor (Task: {0})".format(task['id']),
+                'framework_id': task['framework_id'],
+                'source': task['id'],
+                'statistics': {
+                    'timestamp': timestamp,
+                    'cpus_limit': cpus + 0.1,
+                    'cpus_system_time_secs': round(cpu_rate * 0.2 * elapsed, 2),
+                    'cpus_user_time_secs': round(cpu_rate * 0.8 * elapsed, 2),
+                    'mem_limit_bytes': mem_limit + 32 * 1024 * 1024,
+                    'mem_rss_bytes': int(mem_limit * rng.uniform(0.1, 0.95)),
+                    'net_rx_bytes': int(rng.uniform(1e3, 1e6) * elapsed),
+                    'net_tx_bytes': int(rng.uniform(1e3, 1e6) * elapsed),
+                    'disk_limit_bytes': 0,
+                    'disk_used_bytes': 0,
+                    'blkio_statistics': {'throttling': [{'io_service_bytes': [
+                        {'op': 'READ', 'value': int(rng.uniform(0, 1e5) * elapsed)},
+                        {'op': 'WRITE', 'value': int(rng.uniform(0, 1e5) * elapsed)},
+                    ]}]},
+                },
+            })
+        return containers
+
+    # slaves.json, state.json and, with statistics, statistics/<hostname>.json
+    def write(self, directory, statistics=False, timestamp=1514500000.0):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(os.path.join(directory, 'slaves.json'), 'w') as f:
+            json.dump(self.slave_data, f)
+        with open(os.path.join(directory, 'state.json'), 'w') as f:
+            json.dump(self.state_data, f)
+        if statistics:
+            statistics_dir = os.path.join(directory, 'statistics')
+            if not os.path.isdir(statistics_dir):
+                os.makedirs(statistics_dir)
+            for hostname in self.hostnames:
+                with open(os.path.join(statistics_dir, hostname + '.json'), 'w') as f:
+                    json.dump(self.statistics(hostname, timestamp), f)
+
+
+# A cluster of `agents` agents running `tasks` tasks (4 per agent by default)
+# for `frameworks` frameworks (one per 50 agents, at least 2 by default).
+def generate(agents=10, frameworks=None, tasks=None, seed=0):
+    rng = random.Random(seed)
+    if frameworks is None:
+        frameworks = max(2, agents // 50)
+    if tasks is None:
+        tasks = agents * 4
+
+    def new_id():
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    cluster_id = new_id()
+    slaves = [make_agent(rng, cluster_id, i, new_id) for i in range(agents)]
+    framework_list = [make_framework(cluster_id, i) for i in range(frameworks)]
+
+    agent_tasks = {}
+    placement = Placement(rng, slaves)
+    n = 0
+    app = 0
+    while n < tasks and slaves:
+        framework = framework_list[app % len(framework_list)]
+        instances = min(rng.randint(1, 5), tasks - n)
+        has_vip = rng.random() < VIP_APP_SHARE
+        app_name = "{0}-app{1}".format(framework['name'].split('-')[0], app)
+        vip_port = rng.choice([80, 443, 8080, 8443, 9042, 9092])
+        for _ in range(instances):
+            slave = placement.pick()
+            task = make_task(rng, new_id, framework, slave, app_name, has_vip, vip_port, placement)
+            framework['tasks'].append(task)
+            agent_tasks.setdefault(slave['hostname'], []).append(task)
+            n += 1
+        app += 1
+
+    for slave in slaves:
+        finish_agent(slave)
+
+    slave_data = {'slaves': slaves, 'recovered_slaves': []}
+    state_data = {
+        'id': cluster_id,
+        'cluster': 'synthetic-{0}'.format(agents),
+        'version': '1.5.0',
+        'hostname': '10.255.0.1',
+        'leader': 'master@10.255.0.1:5050',
+        'pid': 'master@10.255.0.1:5050',
+        'activated_slaves': float(agents),
+        'deactivated_slaves': 0.0,
+        'unreachable_slaves': [],
+        'frameworks': framework_list,
+        'completed_frameworks': [],
+        'unregistered_frameworks': [],
+        'orphan_tasks': [],
+        'slaves': slaves,
+        'recovered_slaves': [],
+    }
+    return SyntheticCluster(slave_data, state_data, agent_tasks, seed)
+
+
+def make_agent(rng, cluster_id, i, new_id):
+    hostname = "10.{0}.{1}.{2}".format((i >> 16) & 255, (i >> 8) & 255, i & 255)
+    cpus, mem = rng.choice(AGENT_SIZES)
+    disk = float(rng.choice([137938, 275876, 551752]))
+    gpus = 4.0 if rng.random() < 0.02 else 0.0
+    public = rng.random() < PUBLIC_AGENT_SHARE
+    zone = rng.choice(ZONES)
+
+    slave = {
+        'id': "{0}-S{1}".format(cluster_id, i),
+        'hostname': hostname,
+        'port': 5051,
+        'pid': "slave(1)@{0}:5051".format(hostname),
+        'active': True,
+        'version': '1.5.0',
+        'registered_time': 1513948466.2203 + i,
+        'capabilities': ['MULTI_ROLE', 'HIERARCHICAL_ROLE', 'RESERVATION_REFINEMENT'],
+        'domain': {'fault_domain': {'zone': {'name': zone}, 'region': {'name': zone[:-1]}}},
+        'attributes': {'zone': zone.split('/')[-1]},
+        'resources': {'cpus': float(cpus), 'gpus': gpus, 'mem': mem, 'disk': disk,
+                      'ports': PUBLIC_AGENT_PORTS if public else AGENT_PORTS},
+        'offered_resources': empty_scalars(),
+        'offered_resources_full': [],
+        'reserved_resources': {},
+        'reserved_resources_full': {},
+        'used_resources': empty_scalars(),
+        'used_resources_full': [],
+    }
+    # where tasks on this agent take their resources from: role -> reservation
+    # id (None for static and unreserved)
+    slave['_roles'] = {'*': None}
+
+    if public:
+        slave['attributes']['public_ip'] = 'true'
+        role = 'slave_public'
+        ports = PortSet.parse(PUBLIC_AGENT_PORTS)
+        slave['reserved_resources_full'][role] = [
+            ranges_resource(ports, role),
+            scalar_resource('disk', disk, role),
+            scalar_resource('cpus', float(cpus), role),
+            scalar_resource('mem', mem, role),
+        ]
+        slave['_roles'] = {role: None}
+    elif rng.random() < RESERVED_AGENT_SHARE:
+        role = rng.choice(SERVICE_ROLES)
+        items = []
+        # one reservation per resource, as the SDK services make them
+        for name, value in (('cpus', float(cpus) / 2), ('mem', mem / 2), ('disk', disk / 4)):
+            items.append(scalar_resource(name, value, role, reservation=new_id()))
+        items.append(ranges_resource([(TASK_PORT_BASE - 1000, TASK_PORT_BASE - 901)], role,
+                                     reservation=new_id()))
+        slave['reserved_resources_full'][role] = items
+        slave['_roles'][role] = items[0]['reservation']['labels']['labels'][0]['value']
+
+    return slave
+
+
+class Placement(object):
+    """spreads tasks over agents, skipping agents that are full"""
+
+    def __init__(self, rng, slaves):
+        self.rng = rng
+        self.slaves = slaves
+        self.next_port = {}
+
+    def pick(self):
+        for _ in range(8):
+            slave = self.rng.choice(self.slaves)
+            used = slave['used_resources']
+            if used['cpus'] + max(TASK_CPUS) <= slave['resources']['cpus'] and \
+                    used['mem'] + max(TASK_MEM) <= slave['resources']['mem']:
+                return slave
+        return slave
+
+    def port(self, slave, base=TASK_PORT_BASE):
+        port = self.next_port.get(slave['id'], base)
+        self.next_port[slave['id']] = port + 1
+        return port
+
+
+def make_framework(cluster_id, i):
+    names = ['marathon', 'cassandra', 'kafka', 'hdfs', 'elastic']
+    name = names[i] if i < len(names) else "marathon-user-{0}".format(i)
+    return {
+        'id': "{0}-{1:04d}".format(cluster_id, i + 1),
+        'name': name,
+        'role': 'slave_public' if name == 'marathon' else "{0}-role".format(name.split('-')[0]),
+        'principal': name,
+        'user': 'root',
+        'active': True,
+        'connected': True,
+        'checkpoint': True,
+        'failover_timeout': 604800.0,
+        'hostname': '10.255.0.1',
+        'webui_url': '',
+        'capabilities': [],
+        'registered_time': 1514475659.43296,
+        'reregistered_time': 1514496730.5626,
+        'unregistered_time': 0.0,
+        'used_resources': empty_scalars(),
+        'offered_resources': empty_scalars(),
+        'resources': empty_scalars(),
+        'offers': [],
+        'executors': [],
+        'completed_tasks': [],
+        'unreachable_tasks': [],
+        'tasks': [],
+    }
+
+
+def make_task(rng, new_id, framework, slave, app_name, has_vip, vip_port, placement):
+    cpus = rng.choice(TASK_CPUS)
+    mem = rng.choice(TASK_MEM)
+    # take resources (and ports) from the agent's reservation when there is one
+    role = sorted(slave['_roles'])[-1]
+    reservation = slave['_roles'][role]
+    port = placement.port(slave, TASK_PORT_BASE - 1000 if reservation else TASK_PORT_BASE)
+    running = rng.random() < RUNNING_TASK_SHARE
+    task_id = "{0}.{1}".format(app_name, new_id())
+    ip = "172.17.{0}.{1}".format(rng.randint(0, 255), rng.randint(2, 254))
+
+    port_labels = [{'key': 'network-scope', 'value': 'host'}]
+    if has_vip:
+        port_labels.append({'key': 'VIP_0', 'value': "/{0}:{1}".format(app_name, vip_port)})
+
+    statuses = [{'state': 'TASK_STAGING', 'timestamp': 1514479400.0}]
+    if running:
+        statuses.append({
+            'state': 'TASK_RUNNING',
+            'timestamp': 1514479404.06462,
+            'container_status': {
+                'container_id': {'value': new_id()},
+                'network_infos': [{'ip_addresses': [{'protocol': 'IPv4', 'ip_address': ip}]}],
+            },
+        })
+
+    task = {
+        'id': task_id,
+        'name': app_name,
+        'framework_id': framework['id'],
+        'executor_id': '',
+        'slave_id': slave['id'],
+        'state': 'TASK_RUNNING' if running else 'TASK_STAGING',
+        'role': role,
+        'resources': {'cpus': cpus, 'gpus': 0.0, 'mem': mem, 'disk': 0.0,
+                      'ports': "[{0}-{0}]".format(port)},
+        'labels': [],
+        'discovery': {
+            'name': app_name,
+            'visibility': 'FRAMEWORK',
+            'ports': {'ports': [{'protocol': 'tcp', 'number': port, 'labels': {'labels': port_labels}}]},
+        },
+        'statuses': statuses,
+    }
+
+    used = slave['used_resources']
+    used['cpus'] += cpus
+    used['mem'] += mem
+    slave['used_resources_full'] += [
+        scalar_resource('cpus', cpus, role, reservation, allocated=True),
+        scalar_resource('mem', mem, role, reservation, allocated=True),
+        ranges_resource([(port, port)], role, reservation, allocated=True),
+    ]
+    slave.setdefault('_ports', []).append(port)
+    return task
+
+
+# fill in the summary fields of an agent from its *_full blocks
+def finish_agent(slave):
+    del slave['_roles']
+    ports = slave.pop('_ports', [])
+    if ports:
+        slave['used_resources']['ports'] = str(PortSet((port, port) for port in ports))
+
+    for role, items in slave['reserved_resources_full'].items():
+        summary = empty_scalars()
+        for item in items:
+            if item['type'] == 'SCALAR':
+                summary[item['name']] += item['scalar']['value']
+            else:
+                summary[item['name']] = str(PortSet.from_ranges(item['ranges']['range']))
+        slave['reserved_resources'][role] = summary
+
+    unreserved = dict(slave['resources'])
+    if 'slave_public' in slave['reserved_resources']:
+        del unreserved['ports']
+    for summary in slave['reserved_resources'].values():
+        for name in ('cpus', 'gpus', 'mem', 'disk'):
+            unreserved[name] -= summary[name]
+    slave['unreserved_resources'] = unreserved
+    slave['unreserved_resources_full'] = [scalar_resource(name, unreserved[name]) for name in ('disk', 'cpus', 'mem', 'gpus') if unreserved[name] > 0]
+    if 'ports' in unreserved:
+        slave['unreserved_resources_full'].insert(0, ranges_resource(PortSet.parse(unreserved['ports'])))
@@ -0,0 +1,86 @@
+"""columnar view of the /slaves payload
+
+The agent records are walked once and their scalar resources copied into
+flat arrays (one per resource and kind), so cluster, per-agent and
+per-attribute numbers are plain reductions over those arrays instead of
+repeated walks over nested dicts.
+"""
+from array import array
+
+RESOURCES = ('mem', 'cpus', 'gpus', 'disk')
+# agent record field for each kind of numbers kept
+KINDS = {'total': 'resources', 'used': 'used_resources', 'offered': 'offered_resources'}
+
+
+class AgentTable(object):
+
+    def __init__(self, slaves):
+        self.ids = [slave['id'] for slave in slaves]
+        self.hostnames = [slave['hostname'] for slave in slaves]
+        self.attributes = [slave.get('attributes', {}) for slave in slaves]
+        self.columns = {}
+        for kind, field in KINDS.items():
+            records = [slave.get(field, {}) for slave in slaves]
+            self.columns[kind] = {resource: array('d', [values.get(resource, 0.0) for values in records])
+                                  for resource in RESOURCES}
+        self._percentages = None
+
+        self.positions = {agent_id: i for i, agent_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, agent_id):
+        return self.positions[agent_id]
+
+    def total(self):
+        return {resource: sum(self.columns['total'][resource]) for resource in RESOURCES}
+
+    def used(self):
+        return {resource: sum(self.columns['used'][resource]) for resource in RESOURCES}
+
+    def offered(self):
+        return {resource: sum(self.columns['offered'][resource]) for resource in RESOURCES}
+
+    # same shape as gather_cluster_stats: allocated, percentage, total
+    def cluster_stats(self, rows=None):
+        if rows is None:
+            total = self.total()
+            allocated = self.used()
+        else:
+            total = {r: sum(self.columns['total'][r][i] for i in rows) for r in RESOURCES}
+            allocated = {r: sum(self.columns['used'][r][i] for i in rows) for r in RESOURCES}
+        percentage = {r: 0 if total[r] == 0 else 100 * allocated[r] / total[r] for r in RESOURCES}
+        return allocated, percentage, total
+
+    # per-agent utilization, computed for every agent at once on first use
+    def percentages(self):
+        if self._percentages is None:
+            self._percentages = {
+                resource: array('d', [0 if total == 0 else 100.0 * used / total
+                                      for used, total in zip(self.columns['used'][resource],
+                                                             self.columns['total'][resource])])
+                for resource in RESOURCES
+            }
+        return self._percentages
+
+    # allocated, total, percentage for the agent in row i
+    def agent_stats(self, i):
+        allocated = {r: self.columns['used'][r][i] for r in RESOURCES}
+        total = {r: self.columns['total'][r][i] for r in RESOURCES}
+        percentages = self.percentages()
+        percentage = {r: percentages[r][i] for r in RESOURCES}
+        return allocated, total, percentage
+
+    # {attribute value: (allocated, percentage, total)} for agents grouped by
+    # one of their attributes, agents without it are grouped under None
+    def stats_by_attribute(self, name):
+        groups = {}
+        for i, attributes in enumerate(self.attributes):
+            groups.setdefault(attributes.get(name), []).append(i)
+        return {value: self.cluster_stats(rows) for value, rows in groups.items()}
+
+
+# Collect information (totals) about a cluster from a 'slaves' block
+def gather_cluster_stats(slaves):
+    return AgentTable(slaves['slaves']).cluster_stats()
@@ -0,0 +1,124 @@
+"""reserved and allocated resources of agents, split by role and reservation
+
+Every agent's reserved_resources_full blocks and used_resources_full list are
+walked once into an AgentResources; range lists are shared with the /slaves
+payload rather than copied.  ClusterResources keeps the AgentResources of
+every agent it has seen, so the report sections (and RoleStats) of one run
+aggregate each agent only once.
+"""
+from collections import namedtuple
+
+# scalar resources the reports break down by role
+SCALARS = ('cpus', 'mem', 'disk', 'gpus')
+
+# A dynamic reservation.  `resource_id` is its first label (None if it has
+# none) and `principal` who made it (None if unknown).  `amount` is set for
+# SCALAR resources, `ranges` ([{'begin': .., 'end': ..}, ...]) for RANGES ones.
+Reservation = namedtuple('Reservation', ['resource', 'role', 'resource_id', 'principal', 'amount', 'ranges'])
+
+
+# the dynamic reservation a resource is in, None if it is unreserved or
+# statically reserved
+def current_reservation(item):
+    reservation = item.get('reservation')
+    if reservation is None and item.get('reservations'):
+        # refined reservations only list the stack, the last one is the
+        # reservation the resource is currently in
+        reservation = item['reservations'][-1]
+        if reservation.get('type') == 'STATIC':
+            return None
+    return reservation
+
+
+# resource_id label of a dynamic reservation, None if it has none
+def reservation_label(item):
+    labels = (current_reservation(item) or {}).get('labels', {}).get('labels', [])
+    return labels[0]['value'] if labels else None
+
+
+# what to call a reservation in a report: its label, else its principal
+def reservation_name(resource_id, principal):
+    return resource_id or principal or '-'
+
+
+class ResourceBreakdown(object):
+    """resources of one agent by role
+
+    amounts         resource -> {role: amount} for SCALAR resources
+    ranges          resource -> {role: [{'begin': .., 'end': ..}, ...]} for RANGES resources
+    reservations    [Reservation, ...] in the order they appear in the payload
+    """
+
+    def __init__(self):
+        self.amounts = {}
+        self.ranges = {}
+        self.reservations = []
+
+    def add(self, item):
+        name = item['name']
+        role = item['role']
+        if item['type'] == 'SCALAR':
+            amount = item['scalar']['value']
+            by_role = self.amounts.setdefault(name, {})
+            by_role[role] = by_role.get(role, 0) + amount
+            ranges = None
+        elif item['type'] == 'RANGES':
+            amount = None
+            ranges = item['ranges']['range']
+            by_role = self.ranges.setdefault(name, {})
+            if role in by_role:
+                by_role[role] = by_role[role] + ranges
+            else:
+                by_role[role] = ranges
+        else:
+            return
+
+        reservation = current_reservation(item)
+        if reservation is not None:
+            self.reservations.append(Reservation(name, role, reservation_label(item),
+                                                 reservation.get('principal'), amount, ranges))
+
+    # roles holding any of `resource`, in the order they were first seen
+    def roles(self, resource):
+        return list(self.amounts.get(resource, self.ranges.get(resource, {})))
+
+    def reservations_of(self, resource, role):
+        return [r for r in self.reservations if r.resource == resource and r.role == role]
+
+
+class AgentResources(object):
+    """reserved and allocated resources of one agent
+
+    reserved        ResourceBreakdown of reserved_resources_full (all roles)
+    allocated       ResourceBreakdown of used_resources_full
+    """
+
+    def __init__(self, slave):
+        self.agent_id = slave['id']
+        self.reserved = ResourceBreakdown()
+        self.allocated = ResourceBreakdown()
+
+        reserved_full = slave.get('reserved_resources_full', {})
+        for role in reserved_full:
+            for item in reserved_full[role]:
+                self.reserved.add(item)
+        for item in slave.get('used_resources_full', []):
+            self.allocated.add(item)
+
+
+class ClusterResources(object):
+    """AgentResources of a list of agents, each computed on first use"""
+
+    def __init__(self, slaves):
+        self.slaves = slaves
+        self.agents = {}
+
+    def agent(self, slave):
+        resources = self.agents.get(slave['id'])
+        if resources is None:
+            resources = self.agents[slave['id']] = AgentResources(slave)
+        return resources
+
+    def __iter__(self):
+        for slave in self.slaves:
+            yield self.agent(slave)
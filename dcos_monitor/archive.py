@@ -0,0 +1,132 @@
+"""record every response of a run into a zip archive, and replay it
+
+An archive holds the body of every GET a `record` run made (master,
+Marathon and agent statistics alike) as it came back, and manifest.json
+listing them in the order they were fetched:
+
+    {"format": 1, "master": "10.0.6.89", "started": 1514500000.0, "finished": ...,
+     "entries": [{"url": "http://10.0.6.89:5050/slaves", "member": "responses/000001",
+                  "status": 200, "fetched": 1514500000.2, "seconds": 0.18}, ...]}
+
+Both directions are HTTPAdapters of the shared transport, so every fetcher
+records and replays without knowing about it.  A replayed URL answers with
+its recorded responses in the order they were recorded (the last one over
+again once they run out), so the second statistics request of an agent
+gets its second sample; URLs that weren't recorded answer 404.
+"""
+import io
+import json
+import threading
+import time
+import zipfile
+
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.response import HTTPResponse
+
+FORMAT = 1
+MANIFEST = 'manifest.json'
+
+
+def recorded_response(status, reason, body):
+    return HTTPResponse(body=io.BytesIO(body), headers={'Content-Type': 'application/json'},
+                        status=status, reason=reason, preload_content=False)
+
+
+class ArchiveWriter(object):
+
+    def __init__(self, path, master):
+        self.path = path
+        self.zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+        self.manifest = {'format': FORMAT, 'master': master, 'started': time.time(), 'entries': []}
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, url, status, body, fetched, seconds):
+        with self._lock:
+            member = 'responses/{0:06d}'.format(len(self.manifest['entries']) + 1)
+            self.zip.writestr(member, body)
+            self.manifest['entries'].append({'url': url, 'member': member, 'status': status,
+                                             'fetched': fetched, 'seconds': seconds})
+            self.bytes += len(body)
+
+    def close(self):
+        self.manifest['finished'] = time.time()
+        self.zip.writestr(MANIFEST, json.dumps(self.manifest, indent=1))
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Archive(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.zip = zipfile.ZipFile(path)
+        try:
+            self.manifest = json.loads(self.zip.read(MANIFEST).decode('utf-8'))
+        except KeyError:
+            raise ValueError("{0} has no {1}, it was not written by `record`".format(path, MANIFEST))
+        if self.manifest.get('format') != FORMAT:
+            raise ValueError("{0} is of an unknown archive format {1}".format(path, self.manifest.get('format')))
+        # url -> [entry, ...] in the order they were fetched
+        self.entries = {}
+        for entry in self.manifest['entries']:
+            self.entries.setdefault(entry['url'], []).append(entry)
+        self._served = {}
+        self._lock = threading.Lock()
+
+    @property
+    def master(self):
+        return self.manifest['master']
+
+    # the next recorded (status, body) of a url, None if it wasn't recorded
+    def next_response(self, url):
+        with self._lock:
+            entries = self.entries.get(url)
+            if not entries:
+                return None
+            n = self._served.get(url, 0)
+            self._served[url] = n + 1
+            entry = entries[min(n, len(entries) - 1)]
+            return entry['status'], self.zip.read(entry['member'])
+
+
+class RecordingAdapter(HTTPAdapter):
+    """writes the body of every GET to an ArchiveWriter, then hands it on"""
+
+    def __init__(self, writer, **kwargs):
+        self.writer = writer
+        super(RecordingAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        started = time.time()
+        response = super(RecordingAdapter, self).send(request, **kwargs)
+        if request.method != 'GET':
+            return response
+        # the body decompressed, it is stored compressed with the rest of the archive
+        body = response.content
+        self.writer.add(request.url, response.status_code, body, time.time(), time.time() - started)
+        return self.build_response(request, recorded_response(response.status_code, response.reason, body))
+
+
+class ReplayAdapter(HTTPAdapter):
+    """answers every request from an Archive, nothing goes out on the network"""
+
+    offline = True
+
+    def __init__(self, archive, **kwargs):
+        self.archive = archive
+        super(ReplayAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        recorded = self.archive.next_response(request.url) if request.method == 'GET' else None
+        if recorded is None:
+            raw = recorded_response(404, 'Not Recorded', b'')
+        else:
+            status, body = recorded
+            raw = recorded_response(status, 'OK' if status == 200 else 'Recorded', body)
+        return self.build_response(request, raw)
@@ -0,0 +1,86 @@
+"""on-disk cache of master endpoint responses
+
+Responses are stored already parsed (marshal) so a cache hit skips both the
+download and the JSON parsing.  Entries are keyed by master, endpoint,
+projection and fetch mode (state_data from /state.json or pieced together
+by the planner) and written atomically, so concurrent invocations can share
+a cache directory.
+"""
+import json
+import marshal
+import os
+import re
+import time
+
+MAGIC = b'DCOSMONC'
+# marshal's format is tied to the interpreter, entries from another version are misses
+FORMAT = MAGIC + str(marshal.version).encode('ascii') + b'\n'
+
+
+def default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'dcos_monitor')
+
+
+class SnapshotCache(object):
+
+    # Entries younger than `ttl` seconds are served as is, older ones are
+    # fetched again.  `max_staleness` overrides the ttl for one invocation
+    # (e.g. accept anything from the last 10 minutes over a slow tunnel).
+    def __init__(self, directory, ttl, max_staleness=None, log=None):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_staleness = max_staleness
+        self.log = log
+
+    def max_age(self):
+        return self.ttl if self.max_staleness is None else self.max_staleness
+
+    def path(self, master, endpoint, projection=None, mode=None):
+        import hashlib
+        key = json.dumps([master, endpoint, projection, mode], sort_keys=True)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        name = re.sub(r'[^A-Za-z0-9.-]+', '_', "{0}_{1}".format(master, endpoint))
+        return os.path.join(self.directory, "{0}_{1}.cache".format(name, digest))
+
+    def load(self, master, endpoint, projection=None, mode=None):
+        path = self.path(master, endpoint, projection, mode)
+        try:
+            with open(path, 'rb') as cache_file:
+                if cache_file.read(len(FORMAT)) != FORMAT:
+                    return None
+                fetched_at, data = marshal.load(cache_file)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+
+        age = time.time() - fetched_at
+        if age > self.max_age():
+            self._debug("cache entry for {0}{1} is stale ({2:.0f}s old)".format(master, endpoint, age))
+            return None
+        self._debug("using cached {0}{1} ({2:.0f}s old)".format(master, endpoint, age))
+        return data
+
+    def store(self, master, endpoint, data, projection=None, mode=None):
+        path = self.path(master, endpoint, projection, mode)
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            # write to a temp file in the same directory and rename it into
+            # place, readers see either the old entry or the new one
+            import tempfile
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as cache_file:
+                    cache_file.write(FORMAT)
+                    marshal.dump((time.time(), data), cache_file)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except (IOError, OSError, ValueError) as e:
+            # a cache that can't be written is not worth failing the command over
+            self._debug("unable to write cache entry {0}: {1}".format(path, e))
+
+    def _debug(self, message):
+        if self.log is not None:
+            self.log.debug(message)
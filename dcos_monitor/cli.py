@@ -3,38 +3,254 @@ DCOS monitoring and introspection commands.
 
 NOTE Adapted from a status script written by Justin Lee.
 """
+import functools
 import logging
-import os
 import sys
 import click
 import click_log
+from dcos_monitor.cmds import COMMANDS
 
+# Like the commands, the modules the global options and the data loading
+# need (aggregation, cache, fleet, model, render, transport) are imported
+# by the functions that use them, `--help` and commands that don't load any
+# data start without them.
 
 CONTEXT_SETTINGS = dict(auto_envvar_prefix='DCOSMON')
 logger = logging.getLogger(__name__)
 click_log.basic_config(logger)
 
+# the --output formats, render.make_renderer has a renderer for each
+FORMATS = ('text', 'json', 'ndjson', 'csv')
+
+DATASETS = ('slave_data', 'state_data')
+# the master endpoint each dataset comes from
+ENDPOINTS = {'slave_data': '/slaves', 'state_data': '/state.json'}
+
 class Context(object):
 
     def __init__(self):
         self.log = logger
+        self._data = {}
+        # dataset -> jsonstream projection of the fields a command reads
+        self.projections = {}
+        self.cache = None
+        self.output = 'text'
+        self._resources = None
+        # every cluster of the run, see fleet.py; the first one is self.master
+        self.clusters = []
+        self.cluster_timeout = None
+        # fetch state_data from /state.json even when cheaper endpoints would do, see planner.py
+        self.full_state = False
+        # long running commands follow the master's event stream instead of polling, see cluster_model.py
+        self.subscribe = False
+        self._model = None
+        # dataset -> [(cluster, data), ...] of the clusters that answered
+        self._fleet = {}
+
+    # slave and state data are only fetched the first time a command looks at
+    # them, and kept as the interned records of model.py
+    @property
+    def slave_data(self):
+        return self.load('slave_data')
+
+    @property
+    def state_data(self):
+        return self.load('state_data')
+
+    # per-agent resource breakdowns of slave_data, shared by every report
+    # section of a run and rebuilt when slave_data is reloaded
+    @property
+    def resources(self):
+        from dcos_monitor.aggregation import ClusterResources
+        slaves = self.slave_data['slaves']
+        if self._resources is None or self._resources.slaves is not slaves:
+            self._resources = ClusterResources(slaves)
+        return self._resources
+
+    # with --subscribe the first load is already the event stream's
+    # snapshot, nothing is polled from the master
+    def load(self, dataset):
+        if dataset not in self._data:
+            self._data[dataset] = self._fetch(dataset)
+        return self._data[dataset]
+
+    # throw away what was loaded and fetch it again, with --subscribe take
+    # the current state of the event stream instead
+    def reload(self, dataset):
+        self._data.pop(dataset, None)
+        return self.load(dataset)
+
+    # the ClusterModel following the master, subscribed on first use
+    def cluster_model(self):
+        if self._model is None:
+            from dcos_monitor import cluster_model
+            from dcos_monitor.transport import transport
+            self.log.debug("subscribing to the event stream of {0}".format(self.master))
+            try:
+                self._model = cluster_model.subscribe(self.master, self.log, timeout=transport.read_timeout)
+            except RuntimeError as e:
+                self.log.error(str(e))
+                exit(1)
+        return self._model
+
+    # load every dataset a command declared up front, network fetches in parallel
+    def prefetch(self, datasets):
+        missing = [d for d in datasets if d not in self._data and not self._ignored(d)]
+        # the event stream is subscribed to once, its datasets are in memory
+        if len(missing) < 2 or self.subscribe:
+            for dataset in missing:
+                self.load(dataset)
+            return
 
-pass_context = click.make_pass_decorator(Context, ensure=True)
-cmd_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), 'cmds'))
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+            futures = {dataset: pool.submit(self._fetch, dataset) for dataset in missing}
+        for dataset, future in futures.items():
+            self._data[dataset] = future.result()
+
+    # more than one cluster was given
+    @property
+    def fleet(self):
+        return len(self.clusters) > 1
+
+    # [(cluster, data), ...] of every cluster that answered in time
+    def fleet_data(self, dataset):
+        if dataset not in self._fleet:
+            self.prefetch_fleet([dataset])
+        return self._fleet[dataset]
+
+    # fetch datasets from all clusters at once, each cluster gets
+    # --cluster-timeout seconds for all of them
+    def prefetch_fleet(self, datasets):
+        missing = [d for d in datasets if d not in self._fleet and not self._ignored(d)]
+        if not missing:
+            return
+
+        from dcos_monitor.fleet import fetch_clusters
+        fetch = functools.partial(self._fetch_cluster, datasets=missing)
+        results = fetch_clusters(self.clusters, fetch, self.cluster_timeout, self.log)
+        for dataset in missing:
+            self._fleet[dataset] = [(cluster, data[dataset]) for cluster, data in results]
+
+    # where a command writes its report, see render.make_renderer
+    def renderer(self, formatters):
+        from dcos_monitor.render import make_renderer
+        return make_renderer(self.output, formatters)
+
+    def _ignored(self, dataset):
+        return getattr(self, 'ignore_' + dataset)
+
+    def _fetch(self, dataset):
+        if self._ignored(dataset):
+            self.log.error("{0} was skipped with --ignore_{0} but this command needs it".format(dataset))
+            exit(1)
+
+        from dcos_monitor.model import compact
+        projection = self.projections.get(dataset)
+        data_file = getattr(self, dataset + '_file')
+        if data_file is not None:
+            self.log.debug("loading {0} from file {1}".format(dataset, data_file))
+            return compact(load_data_from_file(data_file, projection))
+
+        if self.subscribe:
+            return self.cluster_model().dataset(dataset)
+
+        if dataset == 'slave_data':
+            fetch = functools.partial(get_slave_data, self, self.master, projection)
+        else:
+            fetch = functools.partial(get_state_data, self, self.master, projection)
+        return compact(self._cached(self.master, dataset, fetch))
+
+    # datasets of one cluster of a fleet, errors are raised for fetch_clusters to report
+    def _fetch_cluster(self, cluster, datasets):
+        data = {}
+        from dcos_monitor.model import compact
+        from dcos_monitor.planner import fetch_state
+        for dataset in datasets:
+            projection = self.projections.get(dataset)
+            if dataset == 'slave_data':
+                fetch = functools.partial(get_slaves, cluster.master, projection, timeout=self.cluster_timeout)
+            else:
+                fetch = functools.partial(fetch_state, cluster.master, projection, timeout=self.cluster_timeout,
+                                          planned=not self.full_state, log=self.log)
+            data[dataset] = compact(self._cached(cluster.master, dataset, fetch))
+        return data
 
+    def _cached(self, master, dataset, fetch):
+        projection = self.projections.get(dataset)
+        # state_data from /state.json and from the planner's endpoints are
+        # cached apart, --full-state never gets the other's answer
+        mode = None
+        if dataset == 'state_data':
+            mode = 'full' if self.full_state else 'planned'
+        if self.cache is not None:
+            data = self.cache.load(master, ENDPOINTS[dataset], projection, mode)
+            if data is not None:
+                return data
+
+        self.log.debug("fetching {0} from {1}".format(dataset, master))
+        data = fetch()
+
+        if self.cache is not None:
+            self.cache.store(master, ENDPOINTS[dataset], data, projection, mode)
+        return data
+
+pass_context = click.make_pass_decorator(Context, ensure=True)
 
+# Declare which datasets (see DATASETS) a subcommand reads.  They are loaded
+# together right before the command runs; anything not declared is still
+# loaded lazily on first access.  Datasets passed as keywords are streamed
+# and only keep the given jsonstream projection:
+#
+#   @requires('slave_data', state_data={'frameworks': {'id': True}})
+#   @click.command('print_full_status', ...)
+#
+# Commands that report on several clusters (ctx.fleet_data) pass fleet=True,
+# the datasets are then fetched from every cluster at once when more than
+# one was given.  Other commands only look at the first cluster.  Commands
+# that poll pass cache=False, their data (the first fetch included) never
+# comes from the snapshot cache.
+def requires(*datasets, **projections):
+    fleet = projections.pop('fleet', False)
+    cache = projections.pop('cache', True)
+    datasets = datasets + tuple(sorted(projections))
+
+    def decorator(cmd):
+        callback = cmd.callback
+
+        @functools.wraps(callback)
+        def prefetching_callback(*args, **kwargs):
+            ctx = click.get_current_context().find_object(Context)
+            ctx.projections.update(projections)
+            if not cache:
+                ctx.cache = None
+            if ctx.fleet and fleet:
+                ctx.prefetch_fleet(datasets)
+            else:
+                if ctx.fleet:
+                    ctx.log.warning("{0} only reports on the first cluster, {1}".format(
+                        cmd.name, ctx.master))
+                ctx.prefetch(datasets)
+            return callback(*args, **kwargs)
+
+        cmd.callback = prefetching_callback
+        cmd.required_data = datasets
+        cmd.fleet = fleet
+        return cmd
+    return decorator
+
+
+# The subcommands are the cmds/cmd_<name>.py modules listed in
+# cmds.COMMANDS, a module is only imported once its command is run (or asked
+# for its own --help).
 class DCOSMonitorCLI(click.MultiCommand):
 
     def list_commands(self, ctx):
-        rv = []
-        for filename in os.listdir(cmd_folder):
-            if filename.endswith('.py') and \
-               filename.startswith('cmd_'):
-                rv.append(filename[4:-3])
-        rv.sort()
-        return rv
+        return sorted(COMMANDS)
 
     def get_command(self, ctx, name):
+        if name not in COMMANDS:
+            return
         try:
             if sys.version_info[0] == 2:
                 name = name.encode('ascii', 'replace')
@@ -44,10 +260,37 @@ class DCOSMonitorCLI(click.MultiCommand):
             return
         return mod.cli
 
+    # the command list of --help, from the registry rather than every command module
+    def format_commands(self, ctx, formatter):
+        commands = self.list_commands(ctx)
+        if not commands:
+            return
+        limit = formatter.width - 6 - max(len(name) for name in commands)
+        rows = [(name, click.utils.make_default_short_help(COMMANDS[name], limit)) for name in commands]
+        with formatter.section('Commands'):
+            formatter.write_dl(rows)
+
 
 @click.command(cls=DCOSMonitorCLI, context_settings=CONTEXT_SETTINGS)
-@click.option('--master', default='localhost',
-              help='hostname of the DC/OS master')
+@click.option('--master', multiple=True,
+              help='hostname[:port] of the DC/OS master (default localhost), can be repeated '
+                   'or comma separated for several clusters, "name=hostname" names a cluster')
+@click.option('--clusters-file', type=click.Path(exists=True, dir_okay=False),
+              help='file with one "[name] hostname[:port]" cluster per line')
+@click.option('--cluster-timeout', type=click.FLOAT, default=30,
+              help='seconds each cluster has to answer before it is left out of a multi-cluster report')
+@click.option('--connect-timeout', type=click.FLOAT, default=5,
+              help='seconds to wait for a connection to a master, agent or Marathon')
+@click.option('--read-timeout', type=click.FLOAT, default=30,
+              help='seconds to wait for a master or Marathon to send data')
+@click.option('--retries', type=click.INT, default=2,
+              help='times a failed GET is retried (with jittered backoff)')
+@click.option('--full-state', is_flag=True, default=False,
+              help='always fetch state data from /state.json instead of /state-summary, /frameworks and /tasks')
+@click.option('--subscribe', is_flag=True, default=False,
+              help='--watch and exporter follow the master\'s v1 operator API event stream instead of re-polling')
+@click.option('--replay', type=click.Path(exists=True, dir_okay=False), metavar='ARCHIVE',
+              help='answer every request (master, Marathon, agent statistics) from an archive written by record')
 @click.option('--token',
               help='dcos authentication token')
 @click.option('--slave_data_file', type=click.Path(exists=True),
@@ -58,9 +301,21 @@ class DCOSMonitorCLI(click.MultiCommand):
               help='use data file for state data instead of mesos.master')
 @click.option('--ignore_state_data', is_flag=True, default=False,
               help='do not attempt to load state data (may prevent subcmds from working)')
+@click.option('--cache-dir', type=click.Path(file_okay=False), default=None,
+              help='directory for cached master responses (default $XDG_CACHE_HOME/dcos_monitor '
+                   'or ~/.cache/dcos_monitor)')
+@click.option('--cache-ttl', type=click.FLOAT, default=60,
+              help='seconds a cached master response is reused before fetching it again')
+@click.option('--max-staleness', type=click.FLOAT, default=None,
+              help='accept cached master responses up to this many seconds old (overrides --cache-ttl)')
+@click.option('--no-cache', is_flag=True, default=False,
+              help='always fetch from the master and do not write the cache')
+@click.option('--output', type=click.Choice(FORMATS), default='text',
+              help='report format of print_full_status, role_data, print_marathon_apps, ports and vip')
 @click_log.simple_verbosity_option(logger)
 @pass_context
-def cli(ctx, master, token, slave_data_file, ignore_slave_data, state_data_file, ignore_state_data):
+def cli(ctx, master, clusters_file, cluster_timeout, connect_timeout, read_timeout, retries, full_state, subscribe, replay, token, slave_data_file, ignore_slave_data, state_data_file, ignore_state_data,
+        cache_dir, cache_ttl, max_staleness, no_cache, output):
     """A command line interface to getting and munging data from a DC/OS cluster.
     This command must have access to the master node on port 5050. The easiest
     way to accomplish this is to setup an SSH tunnel to the master if you
@@ -70,65 +325,79 @@ def cli(ctx, master, token, slave_data_file, ignore_slave_data, state_data_file,
 
             ssh -A -L 5050:<int master ip>:5050 core@<ext master ip>
             ssh -A -L 5050:10.0.6.89:5050 core@54.191.211.256
+
+    Several clusters can be given with repeated --master options or a
+    --clusters-file, role_data, print_full_status and print_slave_data then
+    report on each cluster and on the whole fleet.
     """
+    from dcos_monitor.fleet import Cluster, collect_clusters
+    from dcos_monitor.transport import transport
     ctx.log.debug("starting global option processing")
-    ctx.master = master
+    ctx.clusters = collect_clusters(master, clusters_file) or [Cluster('localhost', 'localhost')]
+    ctx.cluster_timeout = cluster_timeout
+    if ctx.fleet and (slave_data_file or state_data_file):
+        raise click.UsageError("data files can only be used with a single master")
+    if replay is not None:
+        if master or clusters_file or slave_data_file or state_data_file or subscribe:
+            raise click.UsageError("--replay takes the master and its data from the archive, "
+                                   "it can't be combined with --master, data files or --subscribe")
+        import zipfile
+        from dcos_monitor.archive import Archive, ReplayAdapter
+        try:
+            archive = Archive(replay)
+        except (ValueError, zipfile.BadZipfile) as e:
+            raise click.BadParameter(str(e), param_hint='--replay')
+        ctx.clusters = [Cluster(archive.master, archive.master)]
+        # the archive has /state.json rather than the planner's endpoints
+        full_state = True
+        no_cache = True
+        transport.use_adapter(ReplayAdapter, archive=archive)
+    ctx.master = ctx.clusters[0].master
     ctx.token = token
     ctx.slave_data_file = slave_data_file
     ctx.ignore_slave_data = ignore_slave_data
     ctx.state_data_file = state_data_file
     ctx.ignore_state_data = ignore_state_data
-
-    # are we loading slave data from a file or from a running cluster?
-    if ctx.ignore_slave_data:
-        ctx.log.debug("skipping slave data...")
-    elif ctx.slave_data_file is not None:
-        ctx.log.debug("loading slave data from file {0}".format(ctx.slave_data_file))
-        ctx.slave_data = load_slave_data_from_file(ctx.slave_data_file)
-    else:
-        ctx.slave_data = get_slave_data(ctx, ctx.master)
-
-    # are we loading state data from a file or from a running cluster?
-    if ctx.ignore_state_data:
-        ctx.log.debug("skipping state data...")
-    elif ctx.state_data_file is not None:
-        ctx.log.debug("loading state data from file {0}".format(ctx.state_data_file))
-        ctx.state_data = load_state_data_from_file(ctx.state_data_file)
-    else:
-        ctx.state_data = get_state_data(ctx, ctx.master)
+    if not no_cache:
+        from dcos_monitor.cache import SnapshotCache, default_cache_dir
+        ctx.cache = SnapshotCache(cache_dir or default_cache_dir(), cache_ttl, max_staleness, log=ctx.log)
+    ctx.output = output
+    ctx.full_state = full_state
+    ctx.subscribe = subscribe
+    transport.configure(connect_timeout, read_timeout, retries, log=ctx.log)
+    click.get_current_context().call_on_close(log_transport_stats)
 
     ctx.log.debug("global option processing complete")
 
-def load_slave_data_from_file(slave_data_file):
-    with open(slave_data_file) as json_file:  
-        data = json.load(json_file)
-        return data
+def log_transport_stats():
+    from dcos_monitor.transport import transport
+    for line in transport.summary():
+        logger.debug(line)
 
-def load_state_data_from_file(state_data_file):
-    with open(state_data_file) as json_file:  
-        data = json.load(json_file)
-        return data
+# plain JSON or a snapshot written by `dcos_monitor convert`
+def load_data_from_file(data_file, projection=None):
+    from dcos_monitor import snapshot
+    return snapshot.load_file(data_file, projection)
 
-#---- Move this in to separate file ----#
-import getpass
-import json
-import requests
-import socket
+def load_slave_data_from_file(slave_data_file):
+    return load_data_from_file(slave_data_file)
 
-# Disable auth InsecureRequestWarning
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
-requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+def load_state_data_from_file(state_data_file):
+    return load_data_from_file(state_data_file)
 
-# Hack to get working in proxy environment (basically ignores proxy)
-session = requests.Session()
-session.trust_env = False
+#---- fetchers, all requests go through transport.py ----#
+# transport, requests and socket are imported by the fetchers that need
+# them, commands that don't go out on the network start faster without them
 
 def get_auth_token(hostname, username, password):
+    import json
+    from dcos_monitor.transport import transport
     if hostname is None:
+        import socket
         hostname = socket.gethostname()
     headers = {'content-type': 'application/json'}
     data = {'uid': username, 'password': password}
-    response = session.post("https://{hostname}/acs/api/v1/auth/login".format(hostname=hostname),
+    response = transport.post("https://{hostname}/acs/api/v1/auth/login".format(hostname=hostname),
                              headers=headers,
                              data=json.dumps(data),
                              verify=False).json()
@@ -137,6 +406,7 @@ def get_auth_token(hostname, username, password):
 
 def login(hostname, username, password):
     if hostname is None:
+        import socket
         hostname = socket.gethostname()
     token = None
     try:
@@ -148,67 +418,71 @@ def login(hostname, username, password):
 
 
 '''.json() Doesn't actually return json - it's roughly equivalent to json.loads'''
-def get_json(url):
-    req = session.get(url)
-    return req.json()
-
-def get_slaves(hostname = None):
-    if hostname is None:
-        hostname = socket.gethostname()
-    port = 5050
+def get_json(url, timeout=None, projection=None, retries=None):
+    from dcos_monitor.transport import transport
+    return transport.get_json(url, timeout=timeout, projection=projection, retries=retries)
 
-    slaves_url = "http://{hostname}:{port}/slaves".format(hostname=hostname, port=port)
+def get_slaves(hostname = None, projection=None, timeout=None):
+    from dcos_monitor.transport import master_url
+    slaves_url = master_url(hostname, "/slaves")
 
-    return get_json(slaves_url)
-
-def get_state_json(hostname=None):
-    if hostname is None:
-        hostname = socket.gethostname()
-    port = 5050
+    return get_json(slaves_url, timeout=timeout, projection=projection)
 
-    url = "http://{hostname}:{port}/state.json".format(hostname=hostname, port=port)
+def get_state_json(hostname=None, projection=None, timeout=None):
+    from dcos_monitor.transport import master_url
+    url = master_url(hostname, "/state.json")
 
-    return get_json(url)
+    return get_json(url, timeout=timeout, projection=projection)
 
-def get_statistics(hostname):
+def statistics_url(hostname):
     port = 5051
 
-    containers_url = "http://{hostname}:{port}/monitor/statistics.json".format(
-        hostname=hostname, port=port)
+    return "http://{hostname}:{port}/monitor/statistics.json".format(hostname=hostname, port=port)
+
+def get_statistics(hostname, timeout=None):
+    containers_url = statistics_url(hostname)
 
     try:
-        containers = get_json(containers_url)
-    except:
-        print("Unable to connect to slave at {}.".format(containers_url))
+        # one retry, the collector gives up on agents that miss their first poll
+        containers = get_json(containers_url, timeout=timeout, retries=1)
+    except Exception:
+        # on stderr, the report on stdout may be JSON
+        logger.warning("Unable to connect to slave at {}.".format(containers_url))
         containers = None
     return containers
 
-def get_state_data(ctx, master):
+def get_state_data(ctx, master, projection=None):
+    import requests
+    from dcos_monitor.transport import master_url
+    from dcos_monitor.planner import fetch_state
     try:
-        state_data = get_state_json(master)
-    except requests.exceptions.ConnectionError:
+        state_data = fetch_state(master, projection, planned=not ctx.full_state, log=ctx.log)
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
         if master is None:
             ctx.log.error("ConnectionError: Nothing listening on port 5050")
         else:
-            ctx.log.error("ConnectionError: Unable to connect to {0}:5050".format(master))
+            ctx.log.error("ConnectionError: Unable to connect to {0}".format(master_url(master, '')))
         exit(1)
 
     return state_data
 
-def get_slave_data(ctx, master):
+def get_slave_data(ctx, master, projection=None):
+    import requests
+    from dcos_monitor.transport import master_url
     try:
-        slave_data = get_slaves(master)
-    except requests.exceptions.ConnectionError:
+        slave_data = get_slaves(master, projection)
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
         if master is None:
-            ctx.logging.error("ConnectionError: Nothing listening on port 5050")
+            ctx.log.error("ConnectionError: Nothing listening on port 5050")
         else:
-            ctx.logging.error("ConnectionError: Unable to connect to {0}:5050".format(master))
+            ctx.log.error("ConnectionError: Unable to connect to {0}".format(master_url(master, '')))
         exit(1)
 
     return slave_data
 
 def login(hostname, username, password):
     if hostname is None:
+        import socket
         hostname = socket.gethostname()
     token = None
     try:
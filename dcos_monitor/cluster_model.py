@@ -0,0 +1,205 @@
+"""a cluster kept up to date from the operator API event stream
+
+ClusterModel takes the SUBSCRIBED snapshot once and applies the events
+after it, its slave_data and state_data have the /slaves and /state.json
+shape the reports read (gather_cluster_stats, RoleStats, TaskIndex, ...).
+
+The events don't say how much of an agent is allocated, so an agent's
+used resources are worked out the way the master does it: the resources
+of its active tasks plus those of the executors running them.  Executors
+only come with the snapshot, the overhead of executors started later is
+not counted.  Reservations are those of the snapshot or AGENT_ADDED.
+"""
+import collections
+import threading
+import time
+
+from dcos_monitor import operator_api
+from dcos_monitor.operator_api import agent_v0, framework_v0, resource_v0, resources_dict, status_v0, task_v0
+from dcos_monitor.planner import TASK_LISTS, task_list
+
+# completed tasks kept per framework, like the master's --max_completed_tasks_per_framework
+MAX_COMPLETED_TASKS = 1000
+
+
+class ClusterModel(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # set once the first snapshot is in
+        self.ready = threading.Event()
+        # events applied since the model was created
+        self.version = 0
+        self.reset()
+
+    def reset(self):
+        # agent id -> v0 agent record
+        self.agents = collections.OrderedDict()
+        # framework id -> v0 framework record, without its tasks
+        self.frameworks = collections.OrderedDict()
+        # (framework id, task id) -> v0 task of every task that isn't completed
+        self.tasks = collections.OrderedDict()
+        # (framework id, task id) -> v0 resource items of the task
+        self.task_resources = {}
+        # framework id -> completed v0 tasks, oldest first
+        self.completed = {}
+        # (framework id, executor id, agent id) -> v0 resource items
+        self.executors = {}
+        # agent id -> {(framework id, task id): True} of its active tasks, in launch order
+        self.agent_tasks = collections.defaultdict(collections.OrderedDict)
+        self._slave_data = None
+        self._state_data = None
+
+    def apply(self, event):
+        handler = getattr(self, 'on_' + event.get('type', '').lower(), None)
+        if handler is None:
+            return
+        with self.lock:
+            handler(event.get(event['type'].lower(), {}))
+            self.version += 1
+            self._slave_data = None
+            self._state_data = None
+        if event['type'] == 'SUBSCRIBED':
+            self.ready.set()
+
+    def on_subscribed(self, subscribed):
+        self.reset()
+        state = subscribed.get('get_state', {})
+        for framework in state.get('get_frameworks', {}).get('frameworks', []):
+            self.on_framework_added({'framework': framework})
+        for agent in state.get('get_agents', {}).get('agents', []):
+            self.on_agent_added({'agent': agent})
+        for executor in state.get('get_executors', {}).get('executors', []):
+            info = executor['executor_info']
+            key = (operator_api.value(info.get('framework_id')), operator_api.value(info['executor_id']),
+                   operator_api.value(executor['agent_id']))
+            self.executors[key] = [resource_v0(item) for item in info.get('resources', [])]
+        tasks = state.get('get_tasks', {})
+        for field in ('tasks', 'unreachable_tasks', 'completed_tasks'):
+            for task in tasks.get(field, []):
+                self.on_task_added({'task': task})
+
+    def on_heartbeat(self, heartbeat):
+        pass
+
+    def on_agent_added(self, agent_added):
+        agent = agent_v0(agent_added['agent'])
+        self.agents[agent['id']] = agent
+
+    def on_agent_removed(self, agent_removed):
+        self.agents.pop(operator_api.value(agent_removed['agent_id']), None)
+
+    def on_framework_added(self, framework_added):
+        framework = framework_v0(framework_added['framework'])
+        self.frameworks[framework['id']] = framework
+
+    on_framework_updated = on_framework_added
+
+    def on_framework_removed(self, framework_removed):
+        framework_id = operator_api.value(framework_removed['framework_info']['id'])
+        self.frameworks.pop(framework_id, None)
+        self.completed.pop(framework_id, None)
+
+    def on_task_added(self, task_added):
+        task = task_added['task']
+        record = task_v0(task)
+        key = (record['framework_id'], record['id'])
+        self.tasks[key] = record
+        self.task_resources[key] = [resource_v0(item) for item in task.get('resources', [])]
+        self.agent_tasks[record['slave_id']][key] = True
+        self._task_state(key, record)
+
+    def on_task_updated(self, task_updated):
+        status = task_updated['status']
+        key = (operator_api.value(task_updated['framework_id']), operator_api.value(status['task_id']))
+        record = self.tasks.get(key)
+        if record is None:
+            return
+        # an updated copy, documents handed out before keep the task as it was
+        record = dict(record, state=task_updated.get('state', status['state']),
+                      statuses=record['statuses'] + [status_v0(status)])
+        self.tasks[key] = record
+        self._task_state(key, record)
+
+    # move tasks that reached a terminal state to their framework's completed tasks
+    def _task_state(self, key, record):
+        if task_list(record) != 'completed_tasks':
+            return
+        del self.tasks[key]
+        del self.task_resources[key]
+        self.agent_tasks[record['slave_id']].pop(key, None)
+        completed = self.completed.setdefault(record['framework_id'],
+                                              collections.deque(maxlen=MAX_COMPLETED_TASKS))
+        completed.append(record)
+
+    # v0 items allocated on an agent: its active tasks and their executors
+    def used_resources_full(self, agent_id):
+        items = []
+        executors = set()
+        for key in self.agent_tasks.get(agent_id, ()):
+            items += self.task_resources[key]
+            executor_id = self.tasks[key]['executor_id']
+            if executor_id:
+                executors.add((key[0], executor_id, agent_id))
+        for executor in sorted(executors):
+            items += self.executors.get(executor, [])
+        return items
+
+    # the /slaves document
+    @property
+    def slave_data(self):
+        with self.lock:
+            if self._slave_data is None:
+                slaves = []
+                for agent_id, agent in self.agents.items():
+                    used = self.used_resources_full(agent_id)
+                    slave = dict(agent, used_resources_full=used, used_resources=resources_dict(used))
+                    slaves.append(slave)
+                self._slave_data = {'slaves': slaves}
+            return self._slave_data
+
+    # the /state.json document, frameworks and their tasks
+    @property
+    def state_data(self):
+        with self.lock:
+            if self._state_data is None:
+                frameworks = collections.OrderedDict()
+                for framework_id, framework in self.frameworks.items():
+                    frameworks[framework_id] = dict(framework, **{field: [] for field in TASK_LISTS})
+                    frameworks[framework_id]['completed_tasks'] = list(self.completed.get(framework_id, []))
+                for (framework_id, _), task in self.tasks.items():
+                    if framework_id in frameworks:
+                        frameworks[framework_id][task_list(task)].append(task)
+                self._state_data = {'frameworks': list(frameworks.values())}
+            return self._state_data
+
+    def dataset(self, name):
+        return getattr(self, name)
+
+
+# Keep `model` up to date from `master` until `stop` is set, subscribing
+# again (and starting over from a new snapshot) when the stream drops.
+def follow(master, model, log, stop=None, retry_interval=5):
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            for event in operator_api.subscribe(master):
+                model.apply(event)
+                if stop.is_set():
+                    return
+            log.warning("event stream from {0} ended, subscribing again".format(master))
+        except Exception as e:
+            log.error("event stream from {0} failed: {1}".format(master, e))
+            stop.wait(retry_interval)
+
+
+# a ClusterModel followed in a background thread, once its first snapshot is in
+def subscribe(master, log, timeout=30):
+    model = ClusterModel()
+    thread = threading.Thread(target=follow, args=(master, model, log), name='subscription')
+    thread.daemon = True
+    thread.start()
+    started = time.time()
+    if not model.ready.wait(timeout):
+        raise RuntimeError("no snapshot from {0} after {1:.0f}s".format(master, time.time() - started))
+    return model
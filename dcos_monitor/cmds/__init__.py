@@ -0,0 +1,27 @@
+"""the subcommands of dcos_monitor, one cmds/cmd_<name>.py module each
+
+Declared here with their short help so `dcos_monitor --help` can list them
+without importing every command (and everything the commands import), a
+command module is only imported when it runs.  A new command is added
+here and takes its short help from here:
+
+    @click.command('name', short_help=COMMANDS['name'])
+"""
+
+COMMANDS = {
+    'collect': 'Append cluster, role, agent and container metrics to the history store',
+    'convert': 'Convert a saved /slaves or /state.json to a pre-parsed snapshot',
+    'dummy': 'Responsds with default true',
+    'exporter': 'Serve cluster metrics for Prometheus',
+    'fit': 'Work out where instances of an app spec would fit',
+    'history': 'Show how a collected metric changed over time',
+    'ports': 'Query free and allocated ports across agents',
+    'print_full_status': 'Print out a full status report of the cluster',
+    'print_marathon_apps': 'Print out the current status of Marathon apps',
+    'print_slave_data': 'Print the slave data json',
+    'print_state_data': 'Print the state data json',
+    'record': 'Record the master, Marathon and agent statistics into an archive',
+    'role_data': 'Print out role data for the cluster',
+    'top': 'Show the containers using the most CPU or memory across the cluster',
+    'vip': 'Look up the backends of a Minuteman VIP',
+}
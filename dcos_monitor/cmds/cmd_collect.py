@@ -0,0 +1,59 @@
+import click
+import time
+from dcos_monitor.cli import pass_context, requires
+from dcos_monitor.cmds import COMMANDS
+from dcos_monitor.cmds.cmd_exporter import poll_families
+from dcos_monitor.history import HistoryStore, default_history_path
+
+@requires('slave_data', cache=False)
+@click.command('collect', short_help=COMMANDS['collect'])
+@click.option('--history-file', type=click.Path(dir_okay=False), default=default_history_path(),
+                help='SQLite file the metrics are kept in')
+@click.option('--interval', type=click.FLOAT, default=300,
+                help='seconds between polls of the master (and agents)')
+@click.option('--once', is_flag=True, default=False,
+                help='poll once and exit (e.g. from cron)')
+@click.option('--container-stats/--no-container-stats', default=False,
+                help='also keep per-container CPU/memory (polls every agent\'s /monitor/statistics.json)')
+@click.option('--wait', type=click.FLOAT, default=5,
+                help='seconds between the two container statistics samples')
+@click.option('--max-concurrency', type=click.INT, default=32,
+                help='maximum number of agents polled at the same time')
+@click.option('--agent-timeout', type=click.FLOAT, default=10,
+                help='seconds to wait for an individual agent to respond')
+@pass_context
+def cli(ctx, history_file, interval, once, container_stats, wait, max_concurrency, agent_timeout):
+    """poll the cluster every INTERVAL seconds and keep the metrics the
+    exporter serves in a local history store, see the history command
+
+    Older points are averaged into coarser buckets as they age: 5 minutes
+    after a day, an hour after a week and a day after 90 days.
+    """
+    store = HistoryStore(history_file)
+    first = True
+    try:
+        while True:
+            started = time.time()
+            try:
+                # the first poll uses what the command already loaded
+                slave_data = ctx.slave_data if first else ctx.reload('slave_data')
+                families = poll_families(ctx, slave_data, container_stats, wait, max_concurrency, agent_timeout)
+                points = store.append(started, families)
+                store.downsample(started)
+                ctx.log.debug("stored {0} points in {1:.2f}s".format(points, time.time() - started))
+            except Exception as e:
+                if once:
+                    raise
+                ctx.log.error("poll failed: {0}".format(e))
+            except SystemExit:
+                # the fetchers exit when the master is unreachable, try again next time
+                if once:
+                    raise
+            first = False
+            if once:
+                return
+            time.sleep(max(0, interval - (time.time() - started)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
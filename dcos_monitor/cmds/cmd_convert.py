@@ -0,0 +1,30 @@
+import click
+import os
+import time
+from dcos_monitor import snapshot
+from dcos_monitor.cli import pass_context, requires
+from dcos_monitor.cmds import COMMANDS
+
+@requires()
+@click.command('convert', short_help=COMMANDS['convert'])
+@click.argument('source', type=click.Path(exists=True, dir_okay=False))
+@click.argument('destination', type=click.Path(dir_okay=False, writable=True))
+@pass_context
+def cli(ctx, source, destination):
+    """convert a saved /slaves or /state.json to a pre-parsed snapshot
+
+    SOURCE is read once and written to DESTINATION in a binary form that
+    --slave_data_file and --state_data_file load without parsing JSON, and
+    of which they only read the top-level fields a command needs.  Plain
+    JSON files keep working with both options, snapshots are recognised
+    by their first bytes.
+    """
+    started = time.time()
+    try:
+        data = snapshot.convert(source, destination)
+    except ValueError as e:
+        ctx.log.error("unable to convert {0}: {1}".format(source, e))
+        exit(1)
+    ctx.log.info("wrote {0} fields of {1} ({2} bytes) to {3} ({4} bytes) in {5:.2f}s".format(
+        len(data), source, os.path.getsize(source), destination, os.path.getsize(destination),
+        time.time() - started))
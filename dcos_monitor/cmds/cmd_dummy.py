@@ -1,7 +1,9 @@
 import click
-from dcos_monitor.cli import pass_context
+from dcos_monitor.cli import pass_context, requires
+from dcos_monitor.cmds import COMMANDS
 
-@click.command('dummy', short_help='Responsds with default true')
+@requires()
+@click.command('dummy', short_help=COMMANDS['dummy'])
 @pass_context
 def cli(ctx):
     """we can safely ignore whether or not state json exists."""
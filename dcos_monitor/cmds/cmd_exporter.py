@@ -0,0 +1,150 @@
+import click
+import threading
+import time
+from dcos_monitor.cli import pass_context, requires
+from dcos_monitor.cmds import COMMANDS
+from dcos_monitor.collector import collect_statistics
+from dcos_monitor.cmds.cmd_role_data import RoleStats
+from dcos_monitor import metrics
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@requires('slave_data', cache=False)
+@click.command('exporter', short_help=COMMANDS['exporter'])
+@click.option('--listen-address', default='0.0.0.0',
+                help='address to serve /metrics on')
+@click.option('--port', type=click.INT, default=9105,
+                help='port to serve /metrics on')
+@click.option('--interval', type=click.FLOAT, default=30,
+                help='seconds between polls of the master (and agents)')
+@click.option('--container-stats/--no-container-stats', default=False,
+                help='also export per-container CPU/memory (polls every agent\'s /monitor/statistics.json)')
+@click.option('--wait', type=click.FLOAT, default=5,
+                help='seconds between the two container statistics samples')
+@click.option('--max-concurrency', type=click.INT, default=32,
+                help='maximum number of agents polled at the same time')
+@click.option('--agent-timeout', type=click.FLOAT, default=10,
+                help='seconds to wait for an individual agent to respond')
+@pass_context
+def cli(ctx, listen_address, port, interval, container_stats, wait, max_concurrency, agent_timeout):
+    """poll the cluster in the background and serve the results on /metrics
+
+    Scrapes are answered from the text rendered after the last poll, so any
+    number of scrapers costs no extra requests to the masters or agents.
+    """
+    exporter = Exporter(ctx, interval, container_stats, wait, max_concurrency, agent_timeout)
+    poller = threading.Thread(target=exporter.run, name='poller')
+    poller.daemon = True
+    poller.start()
+
+    server = make_server(listen_address, port, exporter, ctx.log)
+    ctx.log.info("serving metrics on http://{0}:{1}/metrics".format(listen_address, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class Exporter(object):
+
+    def __init__(self, ctx, interval, container_stats, wait, max_concurrency, agent_timeout):
+        self.ctx = ctx
+        self.log = ctx.log
+        self.interval = interval
+        self.container_stats = container_stats
+        self.wait = wait
+        self.max_concurrency = max_concurrency
+        self.agent_timeout = agent_timeout
+        self.errors = 0
+        # the exposition text served to scrapers, swapped in whole after each poll
+        self.text = self.status_text(up=0).encode('utf-8')
+
+    def run(self):
+        first = True
+        while True:
+            started = time.time()
+            try:
+                # the first poll uses what the command already loaded
+                slave_data = self.ctx.slave_data if first else self.ctx.reload('slave_data')
+                self.text = self.render(slave_data, started).encode('utf-8')
+            except Exception as e:
+                self.failed()
+                self.log.error("poll failed: {0}".format(e))
+            except SystemExit:
+                # the fetchers exit when the master is unreachable
+                self.failed()
+            first = False
+            time.sleep(max(0, self.interval - (time.time() - started)))
+
+    # the cluster metrics of the last poll are gone with it, scrapers only
+    # see that the exporter is down and how many polls failed
+    def failed(self):
+        self.errors += 1
+        self.text = self.status_text(up=0).encode('utf-8')
+
+    def render(self, slave_data, started):
+        families = poll_families(self.ctx, slave_data, self.container_stats, self.wait,
+                                 self.max_concurrency, self.agent_timeout)
+        return metrics.render(families) + self.status_text(up=1, started=started)
+
+    def status_text(self, up, started=None):
+        families = [
+            metrics.MetricFamily('dcos_exporter_up', 'Whether a poll of the cluster has completed').add({}, up),
+            metrics.MetricFamily('dcos_exporter_poll_errors', 'Polls that failed since the exporter started').add({}, self.errors),
+        ]
+        if started is not None:
+            families.append(metrics.MetricFamily('dcos_exporter_last_poll_timestamp_seconds',
+                                                 'When the last successful poll started').add({}, started))
+            families.append(metrics.MetricFamily('dcos_exporter_poll_duration_seconds',
+                                                 'How long the last successful poll took').add({}, time.time() - started))
+        return metrics.render(families)
+
+
+# the cluster, role and agent metrics of slave_data, and with container_stats
+# those of every container (which polls the agents)
+def poll_families(ctx, slave_data, container_stats, wait, max_concurrency, agent_timeout):
+    families = metrics.cluster_metrics(slave_data)
+    families += metrics.role_metrics(RoleStats(ctx, slave_data['slaves']))
+    families += metrics.agent_metrics(slave_data)
+    if container_stats:
+        samples = collect_statistics([slave['hostname'] for slave in slave_data['slaves']], wait,
+                                     max_concurrency=max_concurrency, timeout=agent_timeout)
+        families += metrics.container_metrics(samples)
+    return families
+
+
+def make_server(address, port, exporter, log):
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split('?')[0] == '/metrics':
+                body = exporter.text
+                content_type = CONTENT_TYPE
+                status = 200
+            elif self.path == '/':
+                body = b'<html><body><a href="/metrics">metrics</a></body></html>\n'
+                content_type = 'text/html'
+                status = 200
+            else:
+                body = b'not found\n'
+                content_type = 'text/plain'
+                status = 404
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            log.debug("{0} {1}".format(self.address_string(), format % args))
+
+    class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+    return ThreadingHTTPServer((address, port), MetricsHandler)
@@ -0,0 +1,118 @@
+import click
+import json
+from dcos_monitor.cli import pass_context, requires
+from dcos_monitor.cmds import COMMANDS
+from dcos_monitor.placement import (FREE_RESOURCES_FIELDS, RESOURCES, UNRESERVED, AppSpec, FreeResources,
+                                    marathon_apps)
+
+# formatting constants
+SPEC_STRING = "{app_id}: {cpus:g} CPU, {mem:g} MB mem, {disk:g} MB disk, {gpus:g} GPU, {ports} ports x {instances} (roles {roles})"
+RESULT_STRING = "  {verdict}: {placeable} instances on {agents} of {total} agents, limited by {limited_by}"
+HEADROOM_STRING = "  {resource:<6} {headroom:>12} instances {free:>14.2f} free"
+AGENT_STRING = "  {hostname:<20} {agent_id:<44} {instances:>9}"
+
+
+@requires(slave_data=FREE_RESOURCES_FIELDS)
+@click.command('fit', short_help=COMMANDS['fit'])
+@click.option('--app', 'app_file', type=click.File('r'), default=None,
+                help='Marathon app definitions to fit (an app, a list or a group, or one app per line), - for stdin')
+@click.option('--cpus', type=click.FLOAT, default=1.0, help='CPUs per instance')
+@click.option('--mem', type=click.FLOAT, default=128.0, help='memory per instance (MB)')
+@click.option('--disk', type=click.FLOAT, default=0.0, help='disk per instance (MB)')
+@click.option('--gpus', type=click.FLOAT, default=0.0, help='GPUs per instance')
+@click.option('--ports', type=click.INT, default=0, help='host ports per instance')
+@click.option('--role', 'roles', multiple=True,
+                help='role whose resources may be used (acceptedResourceRoles), can be repeated, defaults to *')
+@click.option('--instances', type=click.INT, default=1, help='instances wanted')
+@click.option('--summary', is_flag=True, default=False,
+                help='only the cluster-wide numbers, not the agents')
+@pass_context
+def cli(ctx, app_file, cpus, mem, disk, gpus, ports, roles, instances, summary):
+    """work out which agents could take how many instances of an app
+
+    Each agent's free unreserved resources, and those reserved for the
+    accepted roles, are matched against what an instance needs.  The spec
+    comes from the options or, with --app, from Marathon app definitions:
+    every app in the file is fitted against the same snapshot, e.g.
+
+        fit --cpus 0.5 --mem 2048 --ports 2 --role slave_public --instances 20
+        --output ndjson fit --summary --app candidates.json
+
+    Constraints and agent attributes are not taken into account.
+    """
+    if app_file is None:
+        specs = [AppSpec(None, cpus, mem, disk, gpus, ports, roles or (UNRESERVED,), instances)]
+    else:
+        try:
+            specs = [AppSpec.from_marathon(app) for app in marathon_apps(read_apps(app_file))]
+        except (ValueError, TypeError, AttributeError) as e:
+            ctx.log.error("Could not read app definitions from {0}: {1}".format(app_file.name, e))
+            exit(1)
+
+    for spec in specs:
+        if not any(amount > 0 for amount in spec.needs().values()):
+            ctx.log.error("{0} does not ask for any resources".format(spec.app_id or 'the app'))
+            exit(1)
+
+    free = FreeResources(ctx.slave_data['slaves'], ctx.resources)
+    with ctx.renderer(FORMATTERS) as out:
+        for spec in specs:
+            fit = free.fit(spec)
+            out.heading(SPEC_STRING.format(app_id=spec.app_id or 'app', cpus=spec.cpus, mem=spec.mem,
+                                           disk=spec.disk, gpus=spec.gpus, ports=spec.ports,
+                                           instances=spec.instances, roles=', '.join(spec.roles)), blank=False)
+            record = {
+                'app_id': spec.app_id,
+                'cpus': spec.cpus,
+                'mem': spec.mem,
+                'disk': spec.disk,
+                'gpus': spec.gpus,
+                'ports': spec.ports,
+                'roles': list(spec.roles),
+                'instances': spec.instances,
+                'fits': fit.fits,
+                'placeable': fit.total,
+                'agents_with_room': fit.agents,
+                'agents': len(free),
+                'limited_by': fit.limited_by(),
+                'headroom': fit.headroom,
+                'free': fit.free,
+                'placements': [] if summary else placements(spec, fit, free),
+            }
+            out.emit('spec', record, nested={'placements': 'placement'})
+
+
+# a spec is read as one JSON document or, failing that, one per line
+def read_apps(app_file):
+    text = app_file.read()
+    try:
+        return json.loads(text)
+    except ValueError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+# the agents with room for the spec, most instances first
+def placements(spec, fit, free):
+    rows = sorted((row for row, count in enumerate(fit.counts) if count), key=lambda row: -fit.counts[row])
+    return [{'app_id': spec.app_id, 'agent_id': free.ids[row], 'hostname': free.hostnames[row],
+             'instances': int(fit.counts[row])} for row in rows]
+
+
+def format_spec(out, spec):
+    out.line(RESULT_STRING.format(verdict='FITS' if spec['fits'] else 'DOES NOT FIT', placeable=spec['placeable'],
+                                  agents=spec['agents_with_room'], total=spec['agents'],
+                                  limited_by=', '.join(spec['limited_by'])))
+    for resource in RESOURCES:
+        headroom = spec['headroom'].get(resource)
+        out.line(HEADROOM_STRING.format(resource=resource, headroom='-' if headroom is None else headroom,
+                                        free=spec['free'][resource]))
+    if spec['placements']:
+        out.line()
+        out.line(AGENT_STRING.format(hostname='HOSTNAME', agent_id='ID', instances='INSTANCES'))
+        for placement in spec['placements']:
+            out.line(AGENT_STRING.format(**placement))
+    out.line()
+
+FORMATTERS = {
+    'spec': format_spec,
+}
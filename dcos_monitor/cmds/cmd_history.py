@@ -0,0 +1,92 @@
+import click
+import time
+from datetime import datetime
+from dcos_monitor.cli import pass_context, requires
+from dcos_monitor.cmds import COMMANDS
+from dcos_monitor.history import COMBINE, HistoryStore, default_history_path, parse_duration
+
+POINT_STRING = "    {time:<20} {avg:>14.2f} {min:>14.2f} {max:>14.2f} {polls:>8}"
+METRIC_STRING = "{metric:<48} {series:>8}   {labels}"
+
+def parse_where(ctx, param, values):
+    where = {}
+    for value in values:
+        label, sep, wanted = value.partition('=')
+        if not sep:
+            raise click.BadParameter("expected label=value, got {0!r}".format(value))
+        where[label] = wanted
+    return where
+
+def parse_seconds(ctx, param, value):
+    try:
+        return parse_duration(value)
+    except ValueError:
+        raise click.BadParameter("expected a duration like 90s, 15m, 6h, 7d or 2w, got {0!r}".format(value))
+
+@requires()
+@click.command('history', short_help=COMMANDS['history'])
+@click.argument('metric', required=False)
+@click.option('--history-file', type=click.Path(dir_okay=False, exists=True), default=default_history_path(),
+                help='SQLite file written by collect')
+@click.option('--where', multiple=True, callback=parse_where, metavar='LABEL=VALUE',
+                help='only series with this label value, can be repeated')
+@click.option('--group-by', metavar='LABEL',
+                help='one line per value of this label per step (e.g. role, hostname)')
+@click.option('--since', default='1d', callback=parse_seconds,
+                help='how far back to look (90s, 15m, 6h, 7d, 2w)')
+@click.option('--until', default='0s', callback=parse_seconds,
+                help='how long ago to stop')
+@click.option('--step', default='1h', callback=parse_seconds,
+                help='length of the buckets the points are averaged over')
+@click.option('--combine', type=click.Choice(sorted(COMBINE)), default='sum',
+                help='how the series of a group are combined at each poll')
+@pass_context
+def cli(ctx, metric, history_file, where, group_by, since, until, step, combine):
+    """show METRIC over time from the store `collect` writes, e.g. the
+    reserved CPU of every role over the last week:
+
+        history dcos_role_resources --where resource=cpus --where type=reserved
+                --group-by role --since 7d --step 1d
+
+    Without METRIC the metrics in the store and their labels are listed.
+    """
+    store = HistoryStore(history_file)
+    try:
+        with ctx.renderer(FORMATTERS) as out:
+            if metric is None:
+                for name, series, labels in store.metrics():
+                    out.emit('metric', {'metric': name, 'series': series, 'labels': labels})
+                return
+
+            now = time.time()
+            rows = store.query(metric, now - since, now - until, step=step, where=where,
+                               group_by=group_by, combine=combine)
+            group = None
+            for value, bucket, avg, low, high, polls in rows:
+                if group_by is not None and value != group:
+                    group = value
+                    out.heading("{0}={1}".format(group_by, value), blank=False)
+                out.emit('point', {
+                    'metric': metric,
+                    'group': value if group_by is not None else None,
+                    'timestamp': bucket,
+                    'avg': avg,
+                    'min': low,
+                    'max': high,
+                    'polls': polls,
+                })
+    finally:
+        store.close()
+
+def format_metric(out, record):
+    out.line(METRIC_STRING.format(metric=record['metric'], series=record['series'],
+                                  labels=','.join(record['labels'])))
+
+def format_point(out, record):
+    out.line(POINT_STRING.format(time=datetime.fromtimestamp(record['timestamp']).strftime('%Y-%m-%d %H:%M:%S'),
+                                 avg=record['avg'], min=record['min'], max=record['max'], polls=record['polls']))
+
+FORMATTERS = {
+    'metric': format_metric,
+    'point': format_point,
+}
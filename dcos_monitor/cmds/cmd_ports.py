@@ -0,0 +1,111 @@
+import click
+from dcos_monitor.cli import pass_context, requires
+from dcos_monitor.cmds import COMMANDS
+from dcos_monitor.ports import PortIndex
+
+# formatting constants
+AGENT_STRING = "  {hostname:<20} {agent_id:<44} {total:>7} {used:>7} {free:>7} {block:>8}"
+HOLDER_STRING = "  {hostname:<20} {agent_id:<44} [{roles}]"
+BLOCK_STRING = "  {hostname:<20} {agent_id:<44} {begin:>5} - {end:<5}"
+
+# the options that each ask a question of their own
+QUESTIONS = {'free_port': '--free', 'held_port': '--holder', 'block_size': '--block'}
+
+
+# checked while the command line is parsed, before the data is fetched
+def one_question(ctx, param, value):
+    if value is not None:
+        given = [QUESTIONS[name] for name in QUESTIONS if name != param.name and ctx.params.get(name) is not None]
+        if given:
+            raise click.UsageError("{0} can't be combined with {1}".format(QUESTIONS[param.name], given[0]),
+                                   ctx=ctx)
+    return value
+
+
+@requires('slave_data')
+@click.command('ports', short_help=COMMANDS['ports'])
+@click.option('--free', 'free_port', type=click.INT, default=None, metavar='PORT',
+                callback=one_question, help='list the agents where PORT is free')
+@click.option('--holder', 'held_port', type=click.INT, default=None, metavar='PORT',
+                callback=one_question, help='list the agents (and roles) where PORT is allocated')
+@click.option('--block', 'block_size', type=click.INT, default=None, metavar='SIZE',
+                callback=one_question, help='find agents with SIZE contiguous free ports')
+@click.option('--count', type=click.IntRange(1, None), default=1,
+                help='number of agents to find with --block')
+@pass_context
+def cli(ctx, free_port, held_port, block_size, count):
+    """answer port questions about the cluster
+
+    Without any option a per-agent summary of port usage is printed.
+    --free, --holder and --block ask one question each and can't be combined.
+    """
+    index = PortIndex(ctx.slave_data['slaves'])
+
+    found = None
+    with ctx.renderer(FORMATTERS) as out:
+        if free_port is not None:
+            agents = [{'agent_id': agent.agent_id, 'hostname': agent.hostname,
+                       'roles': agent.reserved_for(free_port) or ['*']}
+                      for agent in index.agents_with_free(free_port)]
+            out.emit('free_port', {'port': free_port, 'agents': agents}, nested={'agents': 'agent'})
+
+        elif held_port is not None:
+            agents = [{'agent_id': agent.agent_id, 'hostname': agent.hostname, 'roles': roles}
+                      for agent, roles in index.holders(held_port)]
+            out.emit('held_port', {'port': held_port, 'agents': agents}, nested={'agents': 'agent'})
+
+        elif block_size is not None:
+            found = index.find_blocks(block_size, count)
+            agents = [{'agent_id': agent.agent_id, 'hostname': agent.hostname,
+                       'begin': begin, 'end': begin + block_size - 1} for agent, begin in found]
+            out.emit('port_block', {'size': block_size, 'count': count, 'agents': agents},
+                     nested={'agents': 'agent'})
+
+        else:
+            agents = [{'agent_id': agent.agent_id, 'hostname': agent.hostname, 'total': agent.total.count(),
+                       'used': agent.used.count(), 'free': agent.free.count(),
+                       'longest_free_block': agent.longest_free_block} for agent in index.agents]
+            record = {field: sum(agent[field] for agent in agents) for field in ('total', 'used', 'free')}
+            record['agents'] = agents
+            out.emit('port_usage', record, nested={'agents': 'agent'})
+
+    # after the report is written out
+    if found is not None and len(found) < count:
+        ctx.log.warning("only {0} of {1} agents found".format(len(found), count))
+
+
+def format_free_port(out, record):
+    out.line("Agents with port {0} free:".format(record['port']))
+    out.separator()
+    for agent in record['agents']:
+        out.line(HOLDER_STRING.format(hostname=agent['hostname'], agent_id=agent['agent_id'],
+                                      roles=','.join(agent['roles'])))
+
+def format_held_port(out, record):
+    out.line("Agents with port {0} allocated:".format(record['port']))
+    out.separator()
+    for agent in record['agents']:
+        out.line(HOLDER_STRING.format(hostname=agent['hostname'], agent_id=agent['agent_id'],
+                                      roles=','.join(agent['roles']) or '?'))
+
+def format_port_block(out, record):
+    out.line("Agents with {0} contiguous free ports:".format(record['size']))
+    out.separator()
+    for agent in record['agents']:
+        out.line(BLOCK_STRING.format(hostname=agent['hostname'], agent_id=agent['agent_id'],
+                                     begin=agent['begin'], end=agent['end']))
+
+def format_port_usage(out, record):
+    out.line(AGENT_STRING.format(hostname='HOSTNAME', agent_id='ID', total='TOTAL', used='USED',
+                                 free='FREE', block='LONGEST'))
+    for agent in record['agents']:
+        out.line(AGENT_STRING.format(hostname=agent['hostname'], agent_id=agent['agent_id'],
+                                     total=agent['total'], used=agent['used'], free=agent['free'],
+                                     block=agent['longest_free_block']))
+
+FORMATTERS = {
+    'free_port': format_free_port,
+    'held_port': format_held_port,
+    'port_block': format_port_block,
+    'port_usage': format_port_usage,
+}
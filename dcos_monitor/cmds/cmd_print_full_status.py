@@ -1,10 +1,15 @@
 import click
-import copy
-import json
-import socket
-import time
-from dcos_monitor.cli import get_json, pass_context
-from dcos_monitor.util import dget, lpad, print_separator
+from dcos_monitor.aggregation import SCALARS, AgentResources, ClusterResources, reservation_name
+from dcos_monitor.agent_table import AgentTable, gather_cluster_stats
+from dcos_monitor.cli import pass_context, requires
+from dcos_monitor.cmds import COMMANDS
+from dcos_monitor.collector import collect_statistics, sample_statistics
+from dcos_monitor.fleet import cluster_title
+from dcos_monitor.ports import PortSet
+from dcos_monitor.render import Labelled, TextRenderer
+from dcos_monitor.sampler import Sampler, calculate_container_stats
+from dcos_monitor.task_index import TASK_INDEX_FIELDS, TaskIndex, vip_address
+from dcos_monitor.watch import AgentWatcher, capture_output, full_redraw, poll, print_header
 
 #
 # Formatting constants
@@ -15,6 +20,8 @@ SINGLE_PORT_RESOURCE_STRING =   "     - {port:<5}"
 SINGLE_PORT_RESOURCE_STRING_ROLE =   "     - {port:<5}                [{role:^20}]"
 
 CONTAINER_RESOURCE_STRING = "            {resource:<4}:{used:>8.2f} / {allocated:<8.2f} {unit:<8} {percentage:>6.2f} %"
+WINDOW_HEADER_STRING = "            {metric:<16}{min:>10} {avg:>10} {p95:>10} {max:>10}"
+WINDOW_STRING = "            {metric:<16}{min:>10.2f} {avg:>10.2f} {p95:>10.2f} {max:>10.2f}"
 ROLE_RESOURCE_STRING = "        {role:<20}: {amount:<12.2f} {unit:<8}"
 ROLE_STRING = "        {role}:"
 RESERVATION_STRING = "            {reservation_id:<40} {amount:<12.2f}"
@@ -23,486 +30,501 @@ PORT_RESOURCE_STRING =          "     - {start:<5} - {end:<5}"
 PORT_RESOURCE_STRING_ROLE =          "     - {start:<5} - {end:<5}        [{role:^20}]"
 
 FRAMEWORK_STRING = "{id:<51} [{name:^26}]"
-
-
-@click.command('print_full_status', short_help='Print out a full status report of the cluster')
+AGENT_STRING = "{id:<44} IP: {ip:<16} [{slave_type:^12}]"
+
+# scalar resources in the order they are reported: (resource, label, unit)
+ROLE_RESOURCES = [('cpus', 'CPU', 'Cores'), ('mem', 'Mem', 'MB'), ('disk', 'Disk', 'MB'), ('gpus', 'GPU', 'Cores')]
+STATS_RESOURCES = [('cpus', 'CPU', 'Cores'), ('mem', 'Memory', 'MB'), ('disk', 'Disk', 'MB'), ('gpus', 'GPU', 'Cores')]
+# container window summaries in the order they are reported: (field, label, divisor)
+WINDOW_METRICS = [('cpus_used', 'CPU (Cores)', 1), ('memory_used', 'Mem (MB)', 1024 * 1024),
+                  ('net_rx_rate', 'Net rx (KB/s)', 1024), ('net_tx_rate', 'Net tx (KB/s)', 1024),
+                  ('disk_read_rate', 'Disk rd (KB/s)', 1024), ('disk_write_rate', 'Disk wr (KB/s)', 1024)]
+
+# child records of agents and frameworks, see render.split
+AGENT_NESTED = {'containers': 'container'}
+FRAMEWORK_NESTED = {'vips': 'vip'}
+
+@requires('slave_data', state_data=TASK_INDEX_FIELDS, fleet=True)
+@click.command('print_full_status', short_help=COMMANDS['print_full_status'])
 @click.option('--cluster-stats/--no-cluster-stats', default=True,
                 help='show the total cluster stats')
+@click.option('--attribute-stats', type=click.STRING, default=None, metavar='ATTRIBUTE',
+                help='also show cluster stats for each value of an agent attribute')
 @click.option('--reservation-breakdown/--no-reservation-breakdown', default=True,
                 help='more granular reservation stats')
 @click.option('--container-stats/--no-container-stats', default=False,
                 help='show container level statistics (need to have access to /monitor/statistics.json for this)')
-@click.option('--wait', type=click.INT, default=5,
-                help='time to wait for agent response')
+@click.option('--wait', '--interval', 'wait', type=click.FLOAT, default=5,
+                help='seconds between container statistics samples')
+@click.option('--samples', 'sample_count', type=click.IntRange(2, None), default=2,
+                help='container statistics samples to take, more than 2 reports min/avg/p95/max over the window')
+@click.option('--max-concurrency', type=click.INT, default=32,
+                help='maximum number of agents polled at the same time')
+@click.option('--agent-timeout', type=click.FLOAT, default=10,
+                help='seconds to wait for an individual agent to respond')
+@click.option('--watch', type=click.FLOAT, default=None, metavar='INTERVAL',
+                help='keep running and re-poll the agents every INTERVAL seconds, redrawing what changed')
 @pass_context
-def cli(ctx, cluster_stats, reservation_breakdown, container_stats, wait):
+def cli(ctx, cluster_stats, attribute_stats, reservation_breakdown, container_stats, wait, sample_count, max_concurrency, agent_timeout, watch):
     """print out a full status report on the cluster
+
+    With several clusters the report of every cluster is followed by the
+    cluster (and attribute) stats of the whole fleet.
     """
-    cluster_allocated, cluster_percentage, cluster_total = gather_cluster_stats(ctx.slave_data)
-    if cluster_stats:
-        print_cluster_stats(cluster_allocated, cluster_percentage, cluster_total)
-
-    print_separator()
-    print("Agent Stats")
-    print_separator()
-    print("")
-    print_agent_info(ctx.slave_data['slaves'], container_stats, reservation_breakdown, wait=wait)
-
-    print_separator()
-    print("Minuteman Stats")
-    print_separator()
-    print("")
-    print_minuteman(ctx.state_data)
-
-#### Need to refactor to pull out calculations from prints
-#### Also need to refactor to rearrange function
-# Memory and disk in megabytes, percentage already multiplied by 100
-def print_stats(allocated, total, percentage):
-    print("    [Resource]  : [Allocated] / [Total]      [Units]  [Percentage]")
-
-    if total['cpus'] > 0:
-        print(RESOURCE_STRING.format(resource = "CPU", 
-                            allocated = allocated['cpus'], 
-                            total = total['cpus'], 
-                            percentage = percentage['cpus'],
-                            unit = "Cores"))
-
-    if total['mem'] > 0:
-        print(RESOURCE_STRING.format(resource = "Memory", 
-                            allocated = allocated['mem'], 
-                            total = total['mem'], 
-                            percentage = percentage['mem'],
-                            unit = "MB"))
-
-    # Consider adjusting for GB:
-    if total['disk'] > 0:
-        print(RESOURCE_STRING.format(resource = "Disk", 
-                            allocated = allocated['disk'], 
-                            total = total['disk'], 
-                            percentage = percentage['disk'],
-                            unit = "MB"))
-
-    if total['gpus'] > 0:
-        print(RESOURCE_STRING.format(resource = "GPU", 
-                            allocated = allocated['gpus'], 
-                            total = total['gpus'], 
-                            percentage = percentage['gpus'],
-                            unit = "Cores"))
-        
-    print("")
-
-# Collect information (totals) about a cluster from a 'slaves' block
-def gather_cluster_stats(slaves):
-    resources = ['mem', 'cpus', 'gpus', 'disk']
-
-    allocated = {}
-    percentage = {}
-    total = {}
-    for resource in resources:
-        total[resource] = sum([slave['resources'][resource] for slave in slaves['slaves']])
-        allocated[resource] = sum([slave['used_resources'][resource] for slave in slaves['slaves']])
-        percentage[resource] = 0 if total[resource] == 0 else 100 * allocated[resource] / total[resource]
-    return allocated, percentage, total
+    if watch is not None:
+        if ctx.fleet:
+            ctx.log.error("--watch only supports a single cluster")
+            return
+        if container_stats:
+            ctx.log.error("--watch does not support --container-stats")
+            return
+        if ctx.output != 'text':
+            ctx.log.error("--watch only supports text output")
+            return
+        watch_full_status(ctx, watch, cluster_stats, reservation_breakdown)
+        return
+
+    options = dict(cluster_stats=cluster_stats, attribute_stats=attribute_stats,
+                   reservation_breakdown=reservation_breakdown, container_stats=container_stats,
+                   wait=wait, sample_count=sample_count, max_concurrency=max_concurrency,
+                   agent_timeout=agent_timeout)
+    with ctx.renderer(FORMATTERS) as out:
+        if ctx.fleet:
+            emit_fleet_status(out, ctx.fleet_data('slave_data'), ctx.fleet_data('state_data'), **options)
+        else:
+            emit_full_status(out, ctx.slave_data['slaves'], ctx.state_data, resources=ctx.resources, **options)
 
-# Display information about a cluster gathered by gather_cluster_stats
-def print_cluster_stats(allocated, percentage, total):
-    print_separator()
-    print("Cluster:")
-    print_separator()
+def emit_full_status(out, slaves, state_data, cluster_stats, attribute_stats, reservation_breakdown,
+                     container_stats, wait, max_concurrency, agent_timeout, sample_count=2, resources=None):
+    table = AgentTable(slaves)
+    if cluster_stats:
+        out.emit('cluster', stats_record(*table.cluster_stats()))
+    if attribute_stats:
+        emit_attribute_stats(out, table, attribute_stats)
+
+    out.heading("Agent Stats")
+    emit_agent_info(out, slaves, container_stats, reservation_breakdown, wait=wait,
+                    max_concurrency=max_concurrency, agent_timeout=agent_timeout, table=table,
+                    resources=resources, sample_count=sample_count)
+
+    out.heading("Minuteman Stats")
+    emit_minuteman(out, state_data)
+
+# The report of each cluster, records labelled with the cluster name, then
+# the totals over the agents of all of them (labelled with cluster None)
+def emit_fleet_status(out, slave_data, state_data, cluster_stats, attribute_stats, **options):
+    states = dict(state_data)
+    fleet = []
+    clusters = 0
+    for cluster, data in slave_data:
+        if cluster not in states:
+            continue
+        out.heading(cluster_title(cluster))
+        emit_full_status(Labelled(out, cluster=cluster.name), data['slaves'], states[cluster],
+                         cluster_stats, attribute_stats, **options)
+        fleet += data['slaves']
+        clusters += 1
+
+    if not (cluster_stats or attribute_stats):
+        return
+    out.heading("Fleet ({0} clusters)".format(clusters))
+    fleet_out = Labelled(out, cluster=None)
+    table = AgentTable(fleet)
+    if cluster_stats:
+        fleet_out.emit('cluster', stats_record(*table.cluster_stats()))
+    if attribute_stats:
+        emit_attribute_stats(fleet_out, table, attribute_stats)
+
+# Keep polling /slaves and redraw the report.  Agent sections are only
+# re-rendered when that agent's record changed, the Minuteman section comes
+# from state.json and is rendered once.
+def watch_full_status(ctx, interval, cluster_stats, reservation_breakdown):
+    agents = AgentWatcher(lambda slave: capture_output(print_agent, slave, False, reservation_breakdown, {}))
+    minuteman = capture_output(print_minuteman, ctx.state_data)
+    polls = []
+
+    def redraw(slaves):
+        changed, removed = agents.update(slaves)
+        print_header(interval, changed, removed, len(slaves))
+        redraw_all = full_redraw() or not polls
+        polls.append(len(changed))
+
+        if cluster_stats and (redraw_all or changed or removed):
+            print_cluster_stats(*gather_cluster_stats({'slaves': slaves}))
+
+        if redraw_all:
+            with TextRenderer(FORMATTERS) as out:
+                out.heading("Agent Stats")
+        for slave in slaves:
+            if redraw_all or slave['id'] in changed:
+                print(agents.result(slave['id']), end='')
 
-    print_stats(allocated, total, percentage)
+        if redraw_all:
+            with TextRenderer(FORMATTERS) as out:
+                out.heading("Minuteman Stats")
+            print(minuteman, end='')
 
+    poll(ctx, interval, redraw)
 
-# Rerrange stats about a slave from a 'slaves' block (and display it).
-def print_slave_stats(slave):
-    allocated = {}
-    total = {}
-    percentage = {}
+#
+# Records: what the report is made of, independent of the output format
+#
 
-    resources = ['mem', 'cpus', 'gpus', 'disk']
+# Memory and disk in megabytes, percentage already multiplied by 100
+def stats_record(allocated, percentage, total):
+    return {'allocated': allocated, 'total': total, 'percentage': percentage}
+
+def emit_attribute_stats(out, table, attribute):
+    by_value = table.stats_by_attribute(attribute)
+    for value in sorted(by_value, key=lambda v: (v is None, str(v))):
+        record = {'attribute': attribute, 'value': value}
+        record.update(stats_record(*by_value[value]))
+        out.emit('attribute_stats', record)
+
+# Poll the agents for container statistics (if asked to) and emit one record
+# per agent as soon as it is put together: with container statistics that
+# is when its last sample is in, so agents come out in the order they
+# finish rather than waiting for the whole cluster.  Two samples are
+# compared as they are, more go through a Sampler and are summarized over
+# the window.
+def emit_agent_info(out, slaves, get_container_stats, get_reservation_breakdown, wait = 5,
+                    max_concurrency = 32, agent_timeout = 10, table = None, resources = None,
+                    sample_count = 2):
+    if table is None:
+        table = AgentTable(slaves)
+    if resources is None:
+        resources = ClusterResources(slaves)
+
+    def emit(slave, samples):
+        out.emit('agent', agent_record(slave, get_container_stats, get_reservation_breakdown, samples, table,
+                                       resources.agent(slave)),
+                 nested=AGENT_NESTED)
+
+    if not get_container_stats:
+        for slave in slaves:
+            emit(slave, {})
+        return
 
-    for resource in resources:
-        total[resource] = slave['resources'][resource]
-        allocated[resource] = slave['used_resources'][resource]
-        percentage[resource] = 0 if slave['resources'][resource] == 0 else (
-            100.0 * slave['used_resources'][resource] / slave['resources'][resource])
+    # hostname -> agents not emitted yet
+    waiting = {}
+    for slave in slaves:
+        waiting.setdefault(slave['hostname'], []).append(slave)
 
-    print_stats(allocated, total, percentage)
+    def finished(hostname, samples):
+        for slave in waiting.pop(hostname, []):
+            emit(slave, samples)
 
-def aggregate_resource_list(blob):
-    resources = {
+    if sample_count > 2:
+        samples = sample_statistics(list(waiting), wait, sample_count, max_concurrency=max_concurrency,
+                                    timeout=agent_timeout, finished=finished)
+    else:
+        samples = collect_statistics(list(waiting), wait, max_concurrency=max_concurrency,
+                                     timeout=agent_timeout, finished=finished)
+    for slave in [slave for hostname in list(waiting) for slave in waiting.pop(hostname)]:
+        emit(slave, samples)
+
+def agent_record(slave, get_container_stats, get_reservation_breakdown, samples, table=None, resources=None):
+    if table is None:
+        table = AgentTable([slave])
+    allocated, total, percentage = table.agent_stats(table.position(slave['id']))
+
+    record = {
+        'id': slave['id'],
+        'hostname': slave['hostname'],
+        'agent_type': 'slave_public' if 'public_ip' in slave['attributes'] else 'slave',
     }
-    resource_reservations = {
+    record.update(stats_record(allocated, percentage, total))
+    if resources is None:
+        resources = AgentResources(slave)
+    record.update(reservation_fields(slave, resources, get_reservation_breakdown))
+    if get_container_stats:
+        if isinstance(samples, Sampler):
+            record['containers'] = samples.container_records(slave)
+        else:
+            record['containers'] = container_records(slave, samples.get(slave['hostname']))
+    return record
+
+# [{'resource': 'cpus', 'role': role, 'amount': amount}, ...] for the scalar
+# resources of a ResourceBreakdown
+def by_role(breakdown):
+    return [{'resource': resource, 'role': role, 'amount': amount}
+            for resource, _, _ in ROLE_RESOURCES
+            for role, amount in breakdown.amounts.get(resource, {}).items()]
+
+def port_ranges(port_set):
+    return [{'begin': begin, 'end': end} for begin, end in port_set]
+
+# Reserved and allocated resources of an agent by role, and its ports
+def reservation_fields(slave, resources, get_reservation_breakdown):
+    reserved = resources.reserved
+    allocated = resources.allocated
+
+    ports = {
+        'used': port_ranges(PortSet.parse(slave['used_resources']['ports']))
+                if 'ports' in slave['used_resources'] else None,
+        'reserved': [{'role': role, 'ranges': ranges} for role, ranges in reserved.ranges.get('ports', {}).items()],
+        'allocated': [{'role': role, 'ranges': ranges} for role, ranges in allocated.ranges.get('ports', {}).items()],
+        'all': port_ranges(PortSet.parse(slave['resources'].get('ports'))),
     }
+    fields = {'reserved': by_role(reserved), 'allocated_by_role': by_role(allocated), 'ports': ports}
 
-    # print_separator(24,'+')
-    # print("starting blob:")
-    # print(blob)
-    # print_separator(24,'+')
-
-
-    for item in blob:
-        
-        # Create resource types:
-        if item['name'] not in resources:
-            resources[item['name']] = {}
-        if item['name'] not in resource_reservations:
-            # print("Adding role {} to resource reservations".format(item['name']))
-            resource_reservations[item['name']] = {}
-
-        if item['role'] not in resource_reservations[item['name']]:
-            # print("-----Creating empty list for resource_reservations[{}][{}]".format(item['name'],item['role']))
-            resource_reservations[item['name']][item['role']] = []
-        
-        # print(resource_reservations[item['name']][item['role']])
-
-        if item['type'] == 'SCALAR':
-            # desired:
-            #  - resources['cpu']['hdfs-principal'] = 3 (scalar)
-            #  - resource_breakdowns['cpu']['hdfs-principal] = [] (list of dicts)
-            
-            # Populate values in resource types
-            if item['role'] not in resources[item['name']]:
-                resources[item['name']][item['role']] = item['scalar']['value']
-            else:
-                resources[item['name']][item['role']] += item['scalar']['value']
-
-            if 'reservation' in item:
-                resource_reservations[item['name']][item['role']].append(
-                        {'amount': item['scalar']['value'],
-                        'resource_id': item['reservation']['labels']['labels'][0]['value']}
-                )
-        
-            # print(resource_reservations[item['name']][item['role']])
-
-        if item['type'] == 'RANGES':
-            # print_separator(8,'|')
-            # print("processing:")
-            # print(item)
-            # desired:
-            #  - resources['cpu']['hdfs-principal'] = []
-            #  - resource_breakdowns['cpu']['hdfs-principal] = [] (list of dicts)
-            if item['role'] not in resources[item['name']]:
-                resources[item['name']][item['role']] = copy.deepcopy(item['ranges']['range'])
-            else:
-                resources[item['name']][item['role']] += item['ranges']['range']
-
-            if 'reservation' in item:
-                new_dict = {'ranges': item['ranges']['range'], 'resource_id': item['reservation']['labels']['labels'][0]['value']}
-                resource_reservations[item['name']][item['role']].append(new_dict)
-
-        
-        # print(resource_reservations[item['name']][item['role']])
-
-
-    return resources, resource_reservations
-
-# XXX factor out get_statistics to a utility file
-def get_statistics(hostname):
-    port = 5051
-
-    containers_url = "http://{hostname}:{port}/monitor/statistics.json".format(
-        hostname=hostname, port=port)
-
-    try:
-        containers = get_json(containers_url)
-    except:
-        print("Unable to connect to slave at {}.".format(containers_url))
-        containers = None
-    return containers
-
-def print_agent_info(slaves, get_container_stats, get_reservation_breakdown, wait = 5):
-    data_start = {}
-    data_end = {}
-    if get_container_stats:
-        for slave in slaves:
-            stats = get_statistics(slave['hostname'])
-            if stats is not None:
-                data_start[slave['hostname']] = {
-                    container['executor_id']:container for container in stats}
+    if get_reservation_breakdown:
+        fields['reservations'] = [
+            {'resource': r.resource, 'role': r.role, 'resource_id': r.resource_id, 'principal': r.principal,
+             'amount': r.amount}
+            for r in reserved.reservations if r.resource in SCALARS
+        ]
+        ports['reservations'] = [
+            {'role': r.role, 'resource_id': r.resource_id, 'principal': r.principal, 'ranges': r.ranges}
+            for r in reserved.reservations if r.resource == 'ports'
+        ]
+    return fields
+
+# One record per container of an agent from its statistics samples, None if
+# the agent never answered
+def container_records(slave, agent_samples):
+    if agent_samples is None:
+        return None
+
+    records = []
+    data_start = agent_samples[0]
+    data_end = agent_samples[-1]
+    for executor in data_end:
+        record = {'agent_id': slave['id'], 'hostname': slave['hostname'], 'executor_id': executor}
+        if executor in data_start and data_start is not data_end:
+            record.update(calculate_container_stats(data_start[executor]['statistics'],
+                                                    data_end[executor]['statistics']))
+        else:
+            # If executor present in 'data_end' but not 'data_start' (or the agent only
+            # answered once), use data_end for both, then skip CPU
+            # (memory only uses data_end, CPU uses both)
+            record.update(calculate_container_stats(data_end[executor]['statistics'],
+                                                    data_end[executor]['statistics']))
+            record['cpus_used'] = None
+            record['cpus_utilization'] = None
+        records.append(record)
+    return records
+
+def emit_minuteman(out, state):
+    index = TaskIndex(state)
+    for framework_id in index.framework_ids:
+        framework = index.frameworks[framework_id]
+        vips = index.framework_vips[framework_id]
+        out.emit('framework', {
+            'id': framework['id'],
+            'name': framework['name'],
+            'vips': [{'framework_id': framework['id'], 'vip': vip,
+                      'address': vip_address(vip, framework['name']),
+                      'backends': [{'ip': ip, 'port': port} for ip, port in vips[vip]]}
+                     for vip in vips],
+        }, nested=FRAMEWORK_NESTED)
 
-        # Wait between polls.  Precision not necessary.
-        time.sleep(wait)
-        for slave in slaves:
-            stats = get_statistics(slave['hostname'])
-            if stats is not None:
-                data_end[slave['hostname']] = {
-                    container['executor_id']:container for container in stats}
+#
+# Text report, the classic output of this command
+#
 
-    for slave in slaves:
-        hostname = slave['hostname']
-        # print(slave)
-        slave_type = 'slave_public' if 'public_ip' in slave['attributes'] else 'slave'
-        print_separator()
-        print("{id:<44} IP: {ip:<16} [{slave_type:^12}]".format(id=slave['id'], ip=hostname, slave_type=slave_type))
-        print_separator()
-        print("")
-        
-        # print(slave)
-
-        print_slave_stats(slave)
-        print_slave_reservations(slave, get_reservation_breakdown)
-
-        if get_container_stats:
-            print_separator(60, spaces=4)
-            lpad("Containers: ")
-            for executor in data_end[hostname]:
-                if executor in data_start[hostname]:
-                    stats = calculate_container_stats(data_start[hostname][executor]['statistics'], 
-                                            data_end[hostname][executor]['statistics'])
-                    print_separator()
-                    # print(slave['id'])
-                    # print(hostname)
-                    # print(executor)
-                    # print(stats)
-                    print_container_stats(executor, stats)
-                else:
-                    # If executor present in 'data_end' but not 'data_start', use data_end for both,
-                    # then skip printing CPU (memory only uses data_end, CPU uses both)
-                    stats = calculate_container_stats(data_end[hostname][executor]['statistics'], 
-                                            data_end[hostname][executor]['statistics'])
-                    print_container_stats(executor, stats, single_data_point = True)
-        print("")
-
-def calculate_container_stats(start, end):
-    stats = {}
-
-    timestamp_delta = end['timestamp'] - start['timestamp']
-
-    # print(end)
-    stats['memory_allocated'] = end['mem_limit_bytes']
-    stats['memory_used'] = end['mem_rss_bytes']
-    stats['memory_utilization'] = 100.0 * end['mem_rss_bytes'] / end['mem_limit_bytes']
-
-    cpus_time_delta = (end['cpus_system_time_secs'] + end['cpus_user_time_secs']
-                       - start['cpus_system_time_secs'] - start['cpus_user_time_secs'])
-    if(abs(cpus_time_delta) < 1e-12) or timestamp_delta == 0:
-        cpus_time_delta = 0
-        timestamp_delta = 1
-    stats['cpus_used'] = float(cpus_time_delta / timestamp_delta)
-    stats['cpus_allocated'] = end['cpus_limit']
-    stats['cpus_utilization'] = 100 * stats['cpus_used'] / stats['cpus_allocated']
-
-    return stats
-
-def print_slave_reservations(slave, get_reservation_breakdown):
-    reserved_resources_full = slave['reserved_resources_full']
-    used_resources_full = slave['used_resources_full']
-
-    # print(json.dumps(reserved_resources_full))
-    # print(json.dumps(used_resources_full))
-
-    # print(reserved_resources_full)
-    combined_reserved_resources = []
-    for role in reserved_resources_full:
-        combined_reserved_resources += reserved_resources_full[role]
-        # print_separator(10, '+')
-        # print(json.dumps(reserved_resources_full[role]))
-        # print("Aggregating...")
-        # res = aggregate_resource_list(reserved_resources_full[role])
-    # print("Aggregating combined")
-    # print("Combined:")
-    # print(json.dumps(combined_reserved_resources))
-    reserved, reserved_reservations = aggregate_resource_list(combined_reserved_resources)
-    # print(reserved)
-    # print(reserved_reservations)
-
-    # print(used_resources_full)
-    # print("Aggregating...")
-    # (we don't use allocated_reservations right now)
-    allocated, allocated_reservations = aggregate_resource_list(used_resources_full)
-
-
-    print_separator(60, spaces=4)
-    lpad("Reserved Resources (By Role):")
-    print_role_breakdown(reserved, reserved_reservations, get_reservation_breakdown)
-    print("")
-    print_separator(60, spaces=4)
-    lpad("Allocated Resources (By Role):")
-    print_role_breakdown(allocated)
-
-    # if get_reservation_breakdown:
-    #     print_separator(60, spaces=4)
-    #     print("    Resource Reservations (By Role):")
-    #     print_resource_reservations(reserved_reservations)
-    # print(reserved_reservations['ports'])
-
-    print("")
-    print_separator(60, spaces=4)
-
-    if 'ports' not in reserved:
-        reserved['ports'] = {}
-    if 'ports' not in allocated:
-        allocated['ports'] = {}
-    if 'ports' not in reserved_reservations:
-        reserved_reservations['ports'] = {}
-    print_ports(slave, reserved['ports'], allocated['ports'], reserved_reservations['ports'], get_reservation_breakdown)
-
-def print_role_breakdown(aggregate, reserved_reservations = None, get_reservation_breakdown = False):
-    if 'cpus' in aggregate:
-        print_resource_by_roles('CPU', 'cpus', aggregate['cpus'], "Cores")
-        if get_reservation_breakdown:
-            print_reservation_by_role(reserved_reservations['cpus'], 'CPU', 'Cores')
-
-    if 'mem' in aggregate:
-        print_resource_by_roles('Mem', 'mem', aggregate['mem'], "MB")
-        if get_reservation_breakdown:
-            print_reservation_by_role(reserved_reservations['mem'], 'Mem', 'MB')
-
-    if 'disk' in aggregate:
-        print_resource_by_roles('Disk', 'disk', aggregate['disk'], "MB")
-        if get_reservation_breakdown:
-            print_reservation_by_role(reserved_reservations['disk'], 'Disk', 'MB')
-
-    if 'gpus' in aggregate:
-        print_resource_by_roles('GPU', 'gpus', aggregate['gpus'], "Cores")
-        if get_reservation_breakdown:
-            print_reservation_by_role(reserved_reservations['gpus'], 'GPU', 'Cores')
-
-def print_reservation_by_role(reservation_list, label, unit):
-    # print("    {label} ({unit}):".format(label=label, unit=unit))
-    for role in reservation_list:
-        print(ROLE_STRING.format(role=role))
-        for reservation in reservation_list[role]:
-            print(RESERVATION_STRING.format(reservation_id=reservation['resource_id'],
-                                            amount=reservation['amount'],
-                                            unit=unit))
-    print("")
-        # print(reservation_list[role])
-
-def print_port_reservation_by_role(reservation_list, label):
-    # print("    {label} ({unit}):".format(label=label, unit=unit))
-    for role in reservation_list:
-        print(ROLE_STRING.format(role=role))
-        for reservation in reservation_list[role]:
-            lpad(reservation['resource_id'], 12)
-            for r in reservation['ranges']:
-                if r['begin'] == r['end']:
-                    lpad(SINGLE_PORT_RESOURCE_STRING.format(port=r['begin']),8)
-                else:
-                    lpad(PORT_RESOURCE_STRING.format(start=r['begin'], end=r['end']),8)
-
-# Print information about the ports in use (one per line) / available on a slave
-def print_ports(slave, reserved, allocated, reserved_reservations = None, get_reservation_breakdown = False):
-    lpad("Used Ports: ")
-    if 'ports' in slave['used_resources']:
-        for port_range in slave['used_resources']['ports'][1:-1].split(','):
-            r = port_range.strip().split('-')
-            for port in range(int(r[0]), int(r[0]) + 1):
-                print(SINGLE_PORT_RESOURCE_STRING.format(port=port))
-    else:
-        print(SINGLE_PORT_RESOURCE_STRING.format(port="{none}"))
+# Display information about a cluster gathered by gather_cluster_stats
+def print_cluster_stats(allocated, percentage, total):
+    with TextRenderer(FORMATTERS) as out:
+        out.emit('cluster', stats_record(allocated, percentage, total))
 
-    print("")
-    lpad("Reserved Ports:")
-    for role in reserved:
-        for r in reserved[role]:
-            if r['begin'] == r['end']:
-                print(SINGLE_PORT_RESOURCE_STRING_ROLE.format(port=r['begin'],role=role))
-            else:
-                print(PORT_RESOURCE_STRING_ROLE.format(start=r['begin'],end=r['end'],role=role))
+def print_agent_info(slaves, get_container_stats, get_reservation_breakdown, wait = 5,
+                     max_concurrency = 32, agent_timeout = 10):
+    with TextRenderer(FORMATTERS) as out:
+        emit_agent_info(out, slaves, get_container_stats, get_reservation_breakdown, wait=wait,
+                        max_concurrency=max_concurrency, agent_timeout=agent_timeout)
 
-    if get_reservation_breakdown:
-        print("")
-        lpad("Reserved Ports (by Reservation):")
-        print_port_reservation_by_role(reserved_reservations, 'port')
-        # for role in reserved_reservations:
-        #     print(role)
-        #     print(reserved_reservations[role])
-
-    print("")
-    lpad("Allocated Ports:")
-    for role in allocated:
-        for r in allocated[role]:
-            if r['begin'] == r['end']:
-                print(SINGLE_PORT_RESOURCE_STRING_ROLE.format(port=r['begin'],role=role))
-            else:
-                print(PORT_RESOURCE_STRING_ROLE.format(start=r['begin'],end=r['end'],role=role))
-
-    print("")
-    lpad("All agent ports: ")
-    for port_range in slave['resources']['ports'][1:-1].split(','):
-        s,e = port_range.strip().split('-')
-        print(PORT_RESOURCE_STRING.format(start=s,end=e))
-    print("")
-
-def print_resource_by_roles(label, role, aggregate_resource, unit):
-    lpad("{label} ({unit}):".format(label=label, unit=unit))
-    total = 0
-    for role in aggregate_resource:
-        print(ROLE_RESOURCE_STRING.format(role=role, amount=aggregate_resource[role], unit=""))
-        total += aggregate_resource[role]
-    
-    print_separator(length = 32, k = '-', spaces = 8)
-    print(ROLE_RESOURCE_STRING.format(role="Total", amount=total, unit=unit))
-    print("")
-
-def print_container_stats(executor, stats, single_data_point = False):
-    lpad(executor,8)
-    if single_data_point:
-        print("            CPU not calculated for ephemeral container")
-    else:
-        print(CONTAINER_RESOURCE_STRING.format(resource="CPU",
-                                               used=stats['cpus_used'],
-                                               allocated=stats['cpus_allocated'],
-                                               unit="Cores",
-                                               percentage=stats['cpus_utilization']))
-    
-    print(CONTAINER_RESOURCE_STRING.format(resource="Mem",
-                                           used=stats['memory_used'] / 1024 / 1024,
-                                           allocated=stats['memory_allocated'] / 1024 / 1024,
-                                           unit="MB",
-                                           percentage=stats['memory_utilization']))
+def print_agent(slave, get_container_stats, get_reservation_breakdown, samples, table=None):
+    with TextRenderer(FORMATTERS) as out:
+        out.emit('agent', agent_record(slave, get_container_stats, get_reservation_breakdown, samples, table))
 
 def print_minuteman(state):
-    if 'frameworks' in state:
-        for framework in state['frameworks']:
-            print_separator()
-            print(FRAMEWORK_STRING.format(id = framework['id'], name = framework['name']))
-            if 'tasks' in framework:
-                vips = aggregate_tasks_by_vip(framework['tasks'])
-                for vip in vips:
-                    split_vip = vip.split(':')
-                    lpad("{}.{}.l4lb.thisdcos.directory:{}".format(split_vip[0], framework['name'], split_vip[1]))
-                    for backend in vips[vip]:
-                        lpad(" - {}:{}".format(backend[0], backend[1]))
-
-            print("")
-
-def aggregate_tasks_by_vip(tasks):
-    vips = {}
-    for task in tasks:
-        if task['state'] == 'TASK_RUNNING' and 'discovery' in task and 'ports' in task['discovery'] and 'ports' in task['discovery']['ports']:
-            for port in task['discovery']['ports']['ports']:
-                # Who the hell came up with this structure?
-                if 'labels' in port and 'labels' in port['labels']:
-                    for label in port['labels']['labels']:
-                        # print(label)
-                        if 'VIP' in label['key']:
-                            # print(label)
-                            vip = label['value']
-                            if vip[0] == '/':
-                                vip = vip[1:]
-                            port = port['number']
-                            # Need to get ip addess.  Again, terrible structure.
-                            running_status = get_entry_matching(task['statuses'], 'state', 'TASK_RUNNING')
-                            network_infos = running_status['container_status']['network_infos']
-                            ip = network_infos[0]['ip_addresses'][0]['ip_address']
-                            if vip not in vips:
-                                vips[vip] = [(ip, port)]
-                            else:
-                                vips[vip].append((ip,port))
-    return vips
-
-def get_entry_matching(entries, key, value):
-    # print("Looking for '{}' = '{}'".format(key, value))
-    for entry in entries:
-        # print(entry)
-        if key in entry and entry[key] == value:
-            # print('value found')
-            return entry
+    with TextRenderer(FORMATTERS) as out:
+        emit_minuteman(out, state)
+
+def format_stats(out, stats):
+    allocated, total, percentage = stats['allocated'], stats['total'], stats['percentage']
+    out.line("    [Resource]  : [Allocated] / [Total]      [Units]  [Percentage]")
+    # Consider adjusting disk for GB
+    for resource, label, unit in STATS_RESOURCES:
+        if total[resource] > 0:
+            out.line(RESOURCE_STRING.format(resource = label,
+                                            allocated = allocated[resource],
+                                            total = total[resource],
+                                            percentage = percentage[resource],
+                                            unit = unit))
+    out.line()
+
+def format_cluster(out, record):
+    out.heading("Cluster:", blank=False)
+    format_stats(out, record)
+
+def format_attribute_stats(out, record):
+    out.heading("Agents with {0}: {1}".format(record['attribute'],
+                                              "{none}" if record['value'] is None else record['value']),
+                blank=False)
+    format_stats(out, record)
+
+def format_agent(out, agent):
+    out.separator()
+    out.line(AGENT_STRING.format(id=agent['id'], ip=agent['hostname'], slave_type=agent['agent_type']))
+    out.separator()
+    out.line()
+
+    format_stats(out, agent)
+    format_reservations(out, agent)
+
+    if 'containers' in agent:
+        out.separator(60, spaces=4)
+        out.line("Containers: ", 4)
+        if agent['containers'] is None:
+            out.line("{no data}", 8)
+            out.line()
+            return
+        for container in agent['containers']:
+            format_container(out, container)
+    out.line()
+
+def format_reservations(out, agent):
+    out.separator(60, spaces=4)
+    out.line("Reserved Resources (By Role):", 4)
+    format_role_breakdown(out, agent['reserved'], agent.get('reservations'))
+    out.line()
+    out.separator(60, spaces=4)
+    out.line("Allocated Resources (By Role):", 4)
+    format_role_breakdown(out, agent['allocated_by_role'])
+
+    out.line()
+    out.separator(60, spaces=4)
+    format_ports(out, agent['ports'])
+
+def format_role_breakdown(out, by_role, reservations = None):
+    for resource, label, unit in ROLE_RESOURCES:
+        rows = [row for row in by_role if row['resource'] == resource]
+        if not rows:
+            continue
+        out.line("{label} ({unit}):".format(label=label, unit=unit), 4)
+        total = 0
+        for row in rows:
+            out.line(ROLE_RESOURCE_STRING.format(role=row['role'], amount=row['amount'], unit=""))
+            total += row['amount']
+        out.separator(length = 32, k = '-', spaces = 8)
+        out.line(ROLE_RESOURCE_STRING.format(role="Total", amount=total, unit=unit))
+        out.line()
+
+        if reservations is not None:
+            for row in rows:
+                out.line(ROLE_STRING.format(role=row['role']))
+                for reservation in reservations:
+                    if reservation['resource'] == resource and reservation['role'] == row['role']:
+                        name = reservation_name(reservation['resource_id'], reservation.get('principal'))
+                        out.line(RESERVATION_STRING.format(reservation_id=name, amount=reservation['amount']))
+            out.line()
+
+def format_port_range(out, port_range, role = None, indent = 0):
+    if port_range['begin'] == port_range['end']:
+        if role is None:
+            out.line(SINGLE_PORT_RESOURCE_STRING.format(port=port_range['begin']), indent)
         else:
-            # print("{}!={}".format(entry[key],value))
-            pass
-    return None
-
+            out.line(SINGLE_PORT_RESOURCE_STRING_ROLE.format(port=port_range['begin'], role=role), indent)
+    elif role is None:
+        out.line(PORT_RESOURCE_STRING.format(start=port_range['begin'], end=port_range['end']), indent)
+    else:
+        out.line(PORT_RESOURCE_STRING_ROLE.format(start=port_range['begin'], end=port_range['end'], role=role), indent)
+
+# Information about the ports in use (one per line) / available on a slave
+def format_ports(out, ports):
+    out.line("Used Ports: ", 4)
+    if ports['used'] is None:
+        out.line(SINGLE_PORT_RESOURCE_STRING.format(port="{none}"))
+    for port_range in ports['used'] or []:
+        format_port_range(out, port_range)
+
+    out.line()
+    out.line("Reserved Ports:", 4)
+    for entry in ports['reserved']:
+        for port_range in entry['ranges']:
+            format_port_range(out, port_range, entry['role'])
+
+    if 'reservations' in ports:
+        out.line()
+        out.line("Reserved Ports (by Reservation):", 4)
+        for entry in ports['reserved']:
+            out.line(ROLE_STRING.format(role=entry['role']))
+            for reservation in ports['reservations']:
+                if reservation['role'] == entry['role']:
+                    out.line(reservation_name(reservation['resource_id'], reservation.get('principal')), 12)
+                    for port_range in reservation['ranges']:
+                        format_port_range(out, port_range, indent=8)
+
+    out.line()
+    out.line("Allocated Ports:", 4)
+    for entry in ports['allocated']:
+        for port_range in entry['ranges']:
+            format_port_range(out, port_range, entry['role'])
+
+    out.line()
+    out.line("All agent ports: ", 4)
+    for port_range in ports['all']:
+        out.line(PORT_RESOURCE_STRING.format(start=port_range['begin'], end=port_range['end']))
+    out.line()
+
+def format_container(out, container):
+    if 'samples' in container:
+        format_container_window(out, container)
+        return
+    if container['cpus_used'] is None:
+        out.line(container['executor_id'], 8)
+        out.line("            CPU not calculated for ephemeral container")
+    else:
+        out.separator()
+        out.line(container['executor_id'], 8)
+        out.line(CONTAINER_RESOURCE_STRING.format(resource="CPU",
+                                                  used=container['cpus_used'],
+                                                  allocated=container['cpus_allocated'],
+                                                  unit="Cores",
+                                                  percentage=container['cpus_utilization']))
+
+    out.line(CONTAINER_RESOURCE_STRING.format(resource="Mem",
+                                              used=container['memory_used'] / 1024 / 1024,
+                                              allocated=container['memory_allocated'] / 1024 / 1024,
+                                              unit="MB",
+                                              percentage=container['memory_utilization']))
+
+# A container summarized over a window of samples
+def format_container_window(out, container):
+    out.separator()
+    notes = ["{0} samples".format(container['samples'])]
+    if container['appeared']:
+        notes.append("started during the window")
+    if container['disappeared']:
+        notes.append("gone before the end of the window")
+    out.line("{0} ({1})".format(container['executor_id'], ", ".join(notes)), 8)
+    if container['cpus_allocated'] is not None:
+        out.line("CPU allocated: {0:.2f} Cores".format(container['cpus_allocated']), 12)
+    if container['memory_allocated'] is not None:
+        out.line("Mem allocated: {0:.2f} MB".format(container['memory_allocated'] / 1024 / 1024), 12)
+    out.line(WINDOW_HEADER_STRING.format(metric="", min="[Min]", avg="[Avg]", p95="[P95]", max="[Max]"))
+    for field, label, divisor in WINDOW_METRICS:
+        summary = container[field]
+        if summary is None:
+            out.line(WINDOW_HEADER_STRING.format(metric=label, min="-", avg="-", p95="-", max="-"))
+            continue
+        out.line(WINDOW_STRING.format(metric=label, **{k: v / divisor for k, v in summary.items()}))
+
+def format_framework(out, framework):
+    out.separator()
+    out.line(FRAMEWORK_STRING.format(id = framework['id'], name = framework['name']))
+    for vip in framework['vips']:
+        out.line(vip['address'], 4)
+        for backend in vip['backends']:
+            out.line(" - {}:{}".format(backend['ip'], backend['port']), 4)
+
+    out.line()
+
+FORMATTERS = {
+    'cluster': format_cluster,
+    'attribute_stats': format_attribute_stats,
+    'agent': format_agent,
+    'framework': format_framework,
+}
@@ -1,122 +1,198 @@
 import click
-import copy
-import json
-import requests
-import socket
-import time
-from dcos_monitor.cli import get_json, pass_context, get_auth_token
-from dcos_monitor.util import dget, lpad, print_separator
+from dcos_monitor.cli import pass_context, requires, get_auth_token
+from dcos_monitor.cmds import COMMANDS
+from dcos_monitor.marathon import (APP_TASK_FIELDS, DEFAULT_EMBED, EMBEDS, AppTasks, get_apps,
+                                   get_apps_by_group, get_info, marathon_framework, marathon_health,
+                                   mesos_health)
+from dcos_monitor.util import dget
 
-# Hack to get working in proxy environment (basically ignores proxy)
-session = requests.Session()
-session.trust_env = False
+TASK_STRING = "{task_id:<64} {state:<14} {health:<9} {hostname}"
 
-@click.command('print_marathon_apps', short_help='Print out the current status of Marathon apps')
+@requires(slave_data={'slaves': {'id': True, 'hostname': True}}, state_data=APP_TASK_FIELDS)
+@click.command('print_marathon_apps', short_help=COMMANDS['print_marathon_apps'])
 @click.option('--marathon_user', type=click.STRING,
               help='login for marathon')
 @click.option('--marathon_password', type=click.STRING,
               help='password for marathon')
+@click.option('--label', type=click.STRING, default=None,
+              help='only apps matching this Marathon label selector, e.g. tier==web')
+@click.option('--id', 'app_id', type=click.STRING, default=None,
+              help='only apps whose id contains this')
+@click.option('--embed', multiple=True, type=click.Choice(EMBEDS), default=DEFAULT_EMBED,
+              help='what Marathon sends along with every app, can be repeated')
+@click.option('--by-group', is_flag=True, default=False,
+              help='fetch the apps one top-level group at a time, concurrently')
+@click.option('--max-concurrency', type=click.INT, default=8,
+              help='maximum number of groups fetched at the same time with --by-group')
+@click.option('--inactive', is_flag=True, default=False,
+              help='also show apps scaled to 0 instances')
+@click.option('--details', is_flag=True, default=False,
+              help='also show the environment variables and labels of every app')
 @pass_context
-def cli(ctx, marathon_user, marathon_password):
+def cli(ctx, marathon_user, marathon_password, label, app_id, embed, by_group, max_concurrency, inactive, details):
     """print out a full status of marathon
-    """
-    ctx.log.error("SORRY this doesn't work at the moment. exiting...")
-    return
 
-    GET_MARATHON = True
-    SHOW_INACTIVE = False
-    if ctx.token == None:
+    The apps are filtered by Marathon itself (--label, --id) and every app
+    is shown with its tasks: their state and health, and the agent they run
+    on, taken from the master's state in one pass rather than asked for app
+    by app.  --embed apps.tasks adds the results of Marathon's own health
+    checks.
+    """
+    import requests
+    if ctx.token is None and marathon_user is not None:
         ctx.log.debug("no token found, logging in...")
-        ctx.log.debug("get_auth_token({0}, {1}, {2})".format(ctx.master, marathon_user, marathon_password))
+        ctx.log.debug("get_auth_token({0}, {1}, ...)".format(ctx.master, marathon_user))
         ctx.token = get_auth_token(ctx.master, marathon_user, marathon_password)
-
         ctx.log.debug("token found")
-    apps, json_string = get_marathon_apps(ctx.master, ctx.token)
-    ctx.log.info("using token: {0}".format(ctx.token))
 
-    print("Marathon Apps")
-    print_separator()
-    print("")
-    print_marathon_apps(apps, GET_MARATHON, SHOW_INACTIVE)
+    try:
+        if by_group:
+            apps = get_apps_by_group(ctx.master, ctx.token, embed, label, max_concurrency)
+            if app_id is not None:
+                apps = [app for app in apps if app_id in app['id']]
+        else:
+            apps = get_apps(ctx.master, ctx.token, embed, label, app_id)
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        ctx.log.error("Unable to get the apps from Marathon at {0}: {1}".format(ctx.master, e))
+        exit(1)
+
+    index = None
+    hostnames = {}
+    if not ctx.ignore_state_data:
+        try:
+            info = get_info(ctx.master, ctx.token)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            ctx.log.debug("no /v2/info from Marathon ({0}), looking for its framework by name".format(e))
+            info = None
+        framework = marathon_framework(ctx.state_data.get('frameworks', []), info)
+        if framework is None:
+            ctx.log.warning("Marathon's framework is not in the master's state, tasks are not shown")
+        index = AppTasks(framework)
+    if not ctx.ignore_slave_data:
+        hostnames = {slave['id']: slave['hostname'] for slave in ctx.slave_data['slaves']}
 
-def get_marathon_apps(hostname, token):
-    if hostname is None:
-        hostname = socket.gethostname()
-    headers = {'authorization': "token={token}".format(token=token)}
-    response = session.get("http://{hostname}/marathon/v2/apps".format(hostname=hostname),
-                 headers=headers)
-    not_json = response.json()
-    return not_json['apps'], response.text
+    with ctx.renderer(FORMATTERS) as out:
+        out.heading("Marathon Apps")
+        emit_marathon_apps(out, apps, details, inactive, index, hostnames)
 
-def print_marathon_apps(apps, level, show_inactive):
+def emit_marathon_apps(out, apps, details, show_inactive, index=None, hostnames=None):
     app_dict = {app['id']:app for app in apps}
     for app_id in sorted(app_dict.keys()): # Need to implement sorting
         app = app_dict[app_id]
         if app['instances'] > 0 or show_inactive == True:
-            # print(app_id)
-            print_app(app, level)
-            # print(app_dict[app_id])
-            # print(json.dumps(app_dict[app_id]))
-            print("")
+            tasks = app_tasks(app, index, hostnames or {})
+            out.emit('app', app_record(app, details, tasks), nested={'tasks': 'task'})
 
-def print_app(app, level):
-    resource_string="    {resource:<8}: {amount:<6} {unit:<6} "
-    
-    print_separator(80, '-')
+# the tasks of an app, the ones in the master's state (index) joined with
+# the ones Marathon embedded (apps.tasks) by task id
+def app_tasks(app, index, hostnames):
+    embedded = {task['id']: task for task in app.get('tasks') or ()}
+    tasks = []
+    for task in index.tasks(app['id']) if index is not None else ():
+        marathon_task = embedded.pop(task['id'], {})
+        health = marathon_health(marathon_task)
+        tasks.append({
+            'app_id': app['id'],
+            'task_id': task['id'],
+            'state': task['state'],
+            'healthy': mesos_health(task) if health is None else health,
+            'agent_id': task.get('slave_id'),
+            'hostname': hostnames.get(task.get('slave_id')) or marathon_task.get('host'),
+        })
+    # tasks the master's state doesn't have (or wasn't loaded)
+    for task in embedded.values():
+        tasks.append({
+            'app_id': app['id'],
+            'task_id': task['id'],
+            'state': task.get('state'),
+            'healthy': marathon_health(task),
+            'agent_id': task.get('slaveId'),
+            'hostname': task.get('host'),
+        })
+    return tasks
+
+def app_record(app, details, tasks=()):
+    roles = app.get('acceptedResourceRoles') or ['*']
+    record = {
+        'id': app['id'],
+        'instances': app['instances'],
+        'tasks_running': app.get('tasksRunning', 0),
+        'tasks_staged': app.get('tasksStaged', 0),
+        'tasks_healthy': app.get('tasksHealthy', 0),
+        'tasks_unhealthy': app.get('tasksUnhealthy', 0),
+        'roles': roles,
+        'image': dget(app, ['container', 'docker', 'image'], 'N/A'),
+        'cpus': app['cpus'],
+        'gpus': app.get('gpus', 0),
+        'mem': app['mem'],
+        'disk': app.get('disk', 0),
+        # Marathon 1.5 and later only list portDefinitions and fetch
+        'ports': app.get('ports') or [port['port'] for port in app.get('portDefinitions') or ()],
+        'uris': app.get('uris') or [fetch['uri'] for fetch in app.get('fetch') or ()],
+        'tasks': list(tasks),
+    }
+    if details:
+        env = app.get('env') or {}
+        labels = app.get('labels') or {}
+        record['env'] = [{'name': name, 'value': env[name]} for name in sorted(env)]
+        record['labels'] = [{'name': name, 'value': labels[name]} for name in sorted(labels)]
+    return record
 
-    # print(json.dumps(app))
-    # print_separator(40, '-')
+def format_app(out, app):
+    resource_string="    {resource:<8}: {amount:<6} {unit:<6} "
 
+    out.separator(80, '-')
     if app['instances'] == 0:
-        print("{app:<40} ** INACTIVE **".format(app=app['id']))
+        out.line("{app:<40} ** INACTIVE **".format(app=app['id']))
     else:
-        print("{app:<40} ** ACTIVE [{running} Tasks Running] **".format(app=app['id'], running=app['tasksRunning']))
-    print_separator(80, '-')
-    # print("{id}".format(id=app['id']))
-    lpad("Roles:           {}".format('*' if 'acceptedResourceRoles' not in app or app['acceptedResourceRoles'] == None else 
-                                       app['acceptedResourceRoles'] if len(app['acceptedResourceRoles']) == 1 else 
-                                       ','.join(app['acceptedResourceRoles'])))
-    print("")    
-    lpad("Docker Image:    {}".format(dget(app,['container','docker','image'],'N/A')))
-    print("")
-    # print("Resources:")
-    lpad("{} Instance(s), each with:".format(app['instances']))
+        out.line("{app:<40} ** ACTIVE [{running} Tasks Running] **".format(app=app['id'], running=app['tasks_running']))
+    out.separator(80, '-')
+    out.line("Roles:           {}".format(','.join(app['roles'])), 4)
+    out.line()
+    out.line("Docker Image:    {}".format(app['image']), 4)
+    out.line()
+    out.line("{} Instance(s), each with:".format(app['instances']), 4)
     if app['cpus'] > 0:
-        lpad(resource_string.format(amount=app['cpus'], unit='Cores', resource='CPU'))
-    if app['gpus'] > 0:        
-        lpad(resource_string.format(amount=app['gpus'], unit='Cores', resource='GPU'))
-    if app['mem'] > 0:        
-        lpad(resource_string.format(amount=app['mem'], unit='MB', resource='Memory'))
-    if app['disk'] > 0:        
-        lpad(resource_string.format(amount=app['disk'], unit='MB', resource='Disk'))
-    # print("    {cpus:<4} Cores".format(cpus=app['cpus']))
-    # print("    {} GPU Core".format(gpus=app['gpus']))
-    # print("    {} MB Memory".format(mem=app['mem']))
-    # print("    {} MB Disk".format(disk=app['disk']))
-    # print("          {} Cores\n, {} GPUs\n, {} MB Memory\n, {} MB Disk\n".format(app['cpus'], app['gpus'], app['mem'], app['disk']))
-    print("")
+        out.line(resource_string.format(amount=app['cpus'], unit='Cores', resource='CPU'), 4)
+    if app['gpus'] > 0:
+        out.line(resource_string.format(amount=app['gpus'], unit='Cores', resource='GPU'), 4)
+    if app['mem'] > 0:
+        out.line(resource_string.format(amount=app['mem'], unit='MB', resource='Memory'), 4)
+    if app['disk'] > 0:
+        out.line(resource_string.format(amount=app['disk'], unit='MB', resource='Disk'), 4)
+    out.line()
     if len(app['ports']) > 0 and len(app['ports']) < 10:
-        lpad("Ports:")
+        out.line("Ports:", 4)
         for port in app['ports']:
-            lpad(" - {}".format(port))
-        print("")
+            out.line(" - {}".format(port), 4)
+        out.line()
     elif len(app['ports']) >= 10:
-        lpad("Ports: " + ','.join(str(x) for x in app['ports']))
-        print("")
+        out.line("Ports: " + ','.join(str(x) for x in app['ports']), 4)
+        out.line()
 
     if len(app['uris']) > 0:
-        lpad("URIs:")
+        out.line("URIs:", 4)
         for uri in app['uris']:
-            lpad(" - {}".format(uri),4)
-    if level > 1:
-        if len(app['env']) > 0:
-            print("")
-            lpad("Environment Variables:")
-            for v in sorted(app['env']):
-                lpad("\"{}\" : \"{}\"".format(v, app['env'][v]), 8)
-        if len(app['labels']) > 0:
-            print("")
-            lpad("Labels:")
-            for v in sorted(app['labels']):
-                lpad("\"{}\" : \"{}\"".format(v, app['labels'][v]), 8)
+            out.line(" - {}".format(uri), 4)
+    if app.get('env'):
+        out.line()
+        out.line("Environment Variables:", 4)
+        for v in app['env']:
+            out.line("\"{}\" : \"{}\"".format(v['name'], v['value']), 8)
+    if app.get('labels'):
+        out.line()
+        out.line("Labels:", 4)
+        for v in app['labels']:
+            out.line("\"{}\" : \"{}\"".format(v['name'], v['value']), 8)
+    if app['tasks']:
+        out.line()
+        out.line("Tasks:", 4)
+        for task in app['tasks']:
+            health = {True: 'healthy', False: 'unhealthy'}.get(task['healthy'], '-')
+            out.line(" - " + TASK_STRING.format(task_id=task['task_id'], state=task['state'] or '?', health=health,
+                                                hostname=task['hostname'] or task['agent_id'] or '?'), 4)
+    out.line()
 
+FORMATTERS = {
+    'app': format_app,
+}
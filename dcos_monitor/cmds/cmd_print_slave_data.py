@@ -1,18 +1,32 @@
 import click
 import json
-from dcos_monitor.cli import pass_context
+from dcos_monitor.cli import pass_context, requires
+from dcos_monitor.cmds import COMMANDS
+from dcos_monitor.model import plain
 
 # formatting constants
 SLAVE_STRING = "  {hostname:<20} {agent_id:<40}"
+FLEET_SLAVE_STRING = "  {cluster:<20} {hostname:<20} {agent_id:<40}"
+FLEET_TOTAL_STRING = "  {cluster:<20} {agents} agents"
 
-@click.command('print_slave_data', short_help='Print the slave data json')
+@requires('slave_data', fleet=True)
+@click.command('print_slave_data', short_help=COMMANDS['print_slave_data'])
 @click.option('--list_slaves', is_flag=True,
         help='list out the slave IDs with some metadata')
 @click.option('--slave_id', default=None,
         help='print out the JSON for the individual slave')
 @pass_context
 def cli(ctx, list_slaves, slave_id):
-    """print out the slave data to STDOUT"""
+    """print out the slave data to STDOUT
+
+    With several clusters the slave data of every cluster is printed as one
+    JSON object keyed by cluster name, and --list_slaves lists the agents of
+    every cluster followed by the agent count of each cluster and the fleet.
+    """
+    if ctx.fleet:
+        print_fleet_slave_data(ctx.fleet_data('slave_data'), list_slaves, slave_id)
+        return
+
     if list_slaves is True:
         print("   HOSTNAME             ID")
         for slave in ctx.slave_data["slaves"]:
@@ -20,15 +34,39 @@ def cli(ctx, list_slaves, slave_id):
         return
 
     if slave_id is None:
-        print(json.dumps(ctx.slave_data))
+        print(json.dumps(ctx.slave_data, default=plain))
         return
     else:
         for slave in ctx.slave_data["slaves"]:
             if slave["id"] == slave_id:
-                print(json.dumps(slave))
+                print(json.dumps(slave, default=plain))
                 break
             else:
                 continue
         return
 
     return
+
+def print_fleet_slave_data(slave_data, list_slaves, slave_id):
+    if list_slaves is True:
+        print("   CLUSTER              HOSTNAME             ID")
+        for cluster, data in slave_data:
+            for slave in data["slaves"]:
+                print(FLEET_SLAVE_STRING.format(cluster=cluster.name, agent_id=slave["id"],
+                                                hostname=slave["hostname"]))
+        print("")
+        for cluster, data in slave_data:
+            print(FLEET_TOTAL_STRING.format(cluster=cluster.name, agents=len(data["slaves"])))
+        print(FLEET_TOTAL_STRING.format(cluster="fleet ({0} clusters)".format(len(slave_data)),
+                                        agents=sum(len(data["slaves"]) for _, data in slave_data)))
+        return
+
+    if slave_id is None:
+        print(json.dumps({cluster.name: data for cluster, data in slave_data}, default=plain))
+        return
+
+    for cluster, data in slave_data:
+        for slave in data["slaves"]:
+            if slave["id"] == slave_id:
+                print(json.dumps(slave, default=plain))
+                return
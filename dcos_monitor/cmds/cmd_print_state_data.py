@@ -1,9 +1,12 @@
 import click
 import json
-from dcos_monitor.cli import pass_context
+from dcos_monitor.cli import pass_context, requires
+from dcos_monitor.cmds import COMMANDS
+from dcos_monitor.model import plain
 
-@click.command('print_state_data', short_help='Print the state data json')
+@requires('state_data')
+@click.command('print_state_data', short_help=COMMANDS['print_state_data'])
 @pass_context
 def cli(ctx):
     """print out the state data to STDOUT"""
-    print(json.dumps(ctx.state_data))
+    print(json.dumps(ctx.state_data, default=plain))
@@ -0,0 +1,56 @@
+import click
+from concurrent.futures import ThreadPoolExecutor
+from dcos_monitor.archive import ArchiveWriter, RecordingAdapter
+from dcos_monitor.cli import get_slave_data, get_state_json, pass_context, requires
+from dcos_monitor.cmds import COMMANDS
+from dcos_monitor.collector import poll_statistics
+from dcos_monitor.marathon import get_apps, get_info
+from dcos_monitor.transport import transport
+
+@requires()
+@click.command('record', short_help=COMMANDS['record'])
+@click.argument('archive', type=click.Path(dir_okay=False, writable=True))
+@click.option('--container-stats/--no-container-stats', default=True,
+                help='also record every agent\'s /monitor/statistics.json')
+@click.option('--samples', type=click.IntRange(1, None), default=2,
+                help='container statistics samples to record per agent')
+@click.option('--interval', '--wait', 'wait', type=click.FLOAT, default=5,
+                help='seconds between container statistics samples')
+@click.option('--marathon/--no-marathon', default=True,
+                help='also record Marathon\'s apps (with --token if the cluster needs one)')
+@click.option('--max-concurrency', type=click.INT, default=32,
+                help='maximum number of agents polled at the same time')
+@click.option('--agent-timeout', type=click.FLOAT, default=10,
+                help='seconds to wait for an individual agent to respond')
+@pass_context
+def cli(ctx, archive, container_stats, samples, wait, marathon, max_concurrency, agent_timeout):
+    """record one snapshot of the cluster into ARCHIVE
+
+    /slaves, /state.json, Marathon's apps and --samples statistics samples
+    of every agent are fetched at the same time and written, with the time
+    each of them came back, to a compressed archive.  Any command can then
+    run on it offline with `dcos_monitor --replay ARCHIVE ...`.
+    """
+    with ArchiveWriter(archive, ctx.master) as writer:
+        transport.use_adapter(RecordingAdapter, writer=writer)
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            state = pool.submit(get_state_json, ctx.master)
+            # what print_marathon_apps asks for when it runs without options
+            apps = pool.submit(get_apps, ctx.master, ctx.token) if marathon else None
+            info = pool.submit(get_info, ctx.master, ctx.token) if marathon else None
+
+            slaves = get_slave_data(ctx, ctx.master)['slaves']
+            if container_stats:
+                poll_statistics([slave['hostname'] for slave in slaves], wait, samples,
+                                lambda hostname, n, containers: None,
+                                max_concurrency=max_concurrency, timeout=agent_timeout)
+            state.result()
+            if apps is not None:
+                try:
+                    apps.result()
+                    info.result()
+                except Exception as e:
+                    ctx.log.warning("Marathon apps not recorded: {0}".format(e))
+
+    ctx.log.info("recorded {0} responses ({1} bytes) of {2} agents into {3}".format(
+        len(writer.manifest['entries']), writer.bytes, len(slaves), archive))
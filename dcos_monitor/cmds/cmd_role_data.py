@@ -1,23 +1,29 @@
 import click
-import copy
-import json
-from dcos_monitor.cli import get_json, pass_context
-from dcos_monitor.util import print_separator
+from dcos_monitor.aggregation import AgentResources, ClusterResources
+from dcos_monitor.agent_table import gather_cluster_stats
+from dcos_monitor.cli import pass_context, requires
+from dcos_monitor.cmds import COMMANDS
+from dcos_monitor.cmds.cmd_print_full_status import format_cluster, stats_record
+from dcos_monitor.fleet import cluster_title
+from dcos_monitor.render import Labelled, TextRenderer
+from dcos_monitor.watch import AgentWatcher, full_redraw, poll, print_header
 
 #
 # Formatting constants
 #
-# cluster level
-RESOURCE_STRING = "    {resource:<12}:{allocated:>12.2f} / {total:<12.2f} {unit:<8} {percentage:>6.2f} %"
-
 # role level
 ROLE_HEADER = "    Role: {role}"
 TABLE_HEADER = "        [Resource]  :  [Allocated] / [Reserved]    [Units] "
 ROLE_RESOURCE_STRING = "        {resource:<11} : {allocated:>11.2f}  /  {reserved:<11.2f}  {units}"
 
+# (resource, label, unit) of the scalar resources broken down by role, in
+# the order they are reported
+ROLE_RESOURCES = [('cpus', 'CPU', 'Cores'), ('mem', 'Mem', 'MB'), ('disk', 'Disk', 'MB'), ('gpus', 'GPU', 'Cores')]
+
 
 
-@click.command('role_data', short_help='Print out role data for the cluster')
+@requires('slave_data', fleet=True)
+@click.command('role_data', short_help=COMMANDS['role_data'])
 @click.option('--role', type=click.STRING, default=None,
                 help='query for information on an individual role')
 @click.option('--role-list/--no-role-list', default=False,
@@ -26,182 +32,104 @@ ROLE_RESOURCE_STRING = "        {resource:<11} : {allocated:>11.2f}  /  {reserve
                 help='show the total cluster stats')
 @click.option('--cluster-stats/--no-cluster-stats', default=True,
                 help='show the total cluster stats')
+@click.option('--watch', type=click.FLOAT, default=None, metavar='INTERVAL',
+                help='keep running and re-poll the agents every INTERVAL seconds')
 @pass_context
-def cli(ctx, role, role_list, role_totals, cluster_stats):
+def cli(ctx, role, role_list, role_totals, cluster_stats, watch):
     """print out a full status report on the cluster
+
+    With several clusters the report of every cluster is followed by the
+    report over the agents of all of them.
     """
-    # Need to gather cluster stats no matter what for role data
-    cluster_allocated, cluster_percentage, cluster_total = gather_cluster_stats(ctx.slave_data)
+    if watch is not None and not role_list:
+        if ctx.fleet:
+            ctx.log.error("--watch only supports a single cluster")
+            return
+        if ctx.output != 'text':
+            ctx.log.error("--watch only supports text output")
+            return
+        watch_role_data(ctx, watch, role, role_totals, cluster_stats)
+        return
+
+    with ctx.renderer(FORMATTERS) as out:
+        if ctx.fleet:
+            emit_fleet_roles(ctx, out, ctx.fleet_data('slave_data'), role, role_list, role_totals, cluster_stats)
+            return
 
-    # gather all the data
-    rs = RoleStats(ctx)
+        # gather all the data
+        rs = RoleStats(ctx)
 
-    # just print out a list of roles
-    if role_list:
-        rs.print_role_list()
-        return
+        # just print out a list of roles
+        if role_list:
+            for name in rs.roles():
+                out.emit('role_name', {'role': name})
+            return
 
+        emit_role_report(ctx, out, rs, ctx.slave_data, role, role_totals, cluster_stats)
+
+def emit_role_report(ctx, out, rs, slaves, role, role_totals, cluster_stats):
     # only deciding whether or not to print
     if cluster_stats:
-        print_cluster_stats(cluster_allocated, cluster_percentage, cluster_total)
+        out.emit('cluster', stats_record(*gather_cluster_stats(slaves)))
 
     # just show me data for the one role
     if role:
         if rs.role_stats.get(role) is None:
             ctx.log.error("No such role: {0}".format(role))
             return
-        rs.print_role(role, rs.role_stats[role])
+        out.emit('role', rs.role_record(role, rs.role_stats[role]))
 
     # show me what you got!
     else:
-        print_separator()
-        print("All Roles")
-        print_separator()
+        out.heading("All Roles", blank=False)
         for role in rs.roles():
-            rs.print_role(role, rs.role_stats[role])
+            out.emit('role', rs.role_record(role, rs.role_stats[role]))
 
     # only deciding whether or not to print
     if role_totals:
-        print("")
-        rs.print_totals()
-
-
-#### Need to refactor to pull out calculations from prints
-#### Also need to refactor to rearrange function
-# Memory and disk in megabytes, percentage already multiplied by 100
-def print_stats(allocated, total, percentage):
-    print("    [Resource]  : [Allocated] / [Total]      [Units]  [Percentage]")
-
-    if total['cpus'] > 0:
-        print(RESOURCE_STRING.format(resource = "CPU", 
-                            allocated = allocated['cpus'], 
-                            total = total['cpus'], 
-                            percentage = percentage['cpus'],
-                            unit = "Cores"))
-
-    if total['mem'] > 0:
-        print(RESOURCE_STRING.format(resource = "Memory", 
-                            allocated = allocated['mem'], 
-                            total = total['mem'], 
-                            percentage = percentage['mem'],
-                            unit = "MB"))
-
-    # Consider adjusting for GB:
-    if total['disk'] > 0:
-        print(RESOURCE_STRING.format(resource = "Disk", 
-                            allocated = allocated['disk'], 
-                            total = total['disk'], 
-                            percentage = percentage['disk'],
-                            unit = "MB"))
-
-    if total['gpus'] > 0:
-        print(RESOURCE_STRING.format(resource = "GPU", 
-                            allocated = allocated['gpus'], 
-                            total = total['gpus'], 
-                            percentage = percentage['gpus'],
-                            unit = "Cores"))
-        
-    print("")
-
-# Collect information (totals) about a cluster from a 'slaves' block
-def gather_cluster_stats(slaves):
-    resources = ['mem', 'cpus', 'gpus', 'disk']
-
-    allocated = {}
-    percentage = {}
-    total = {}
-    for resource in resources:
-        total[resource] = sum([slave['resources'][resource] for slave in slaves['slaves']])
-        allocated[resource] = sum([slave['used_resources'][resource] for slave in slaves['slaves']])
-        percentage[resource] = 0 if total[resource] == 0 else 100 * allocated[resource] / total[resource]
-    return allocated, percentage, total
-
-# Display information about a cluster gathered by gather_cluster_stats
-def print_cluster_stats(allocated, percentage, total):
-    print_separator()
-    print("Cluster:")
-    print_separator()
-
-    print_stats(allocated, total, percentage)
-
-def aggregate_resource_list(blob):
-    resources = {
-    }
-    resource_reservations = {
-    }
-
-    for item in blob:
-        
-        # Create resource types:
-        if item['name'] not in resources:
-            resources[item['name']] = {}
-        if item['name'] not in resource_reservations:
-            # print("Adding role {} to resource reservations".format(item['name']))
-            resource_reservations[item['name']] = {}
-
-        if item['role'] not in resource_reservations[item['name']]:
-            # print("-----Creating empty list for resource_reservations[{}][{}]".format(item['name'],item['role']))
-            resource_reservations[item['name']][item['role']] = []
-        
-        # print(resource_reservations[item['name']][item['role']])
-
-        if item['type'] == 'SCALAR':
-            # desired:
-            #  - resources['cpu']['hdfs-principal'] = 3 (scalar)
-            #  - resource_breakdowns['cpu']['hdfs-principal] = [] (list of dicts)
-            
-            # Populate values in resource types
-            if item['role'] not in resources[item['name']]:
-                resources[item['name']][item['role']] = item['scalar']['value']
-            else:
-                resources[item['name']][item['role']] += item['scalar']['value']
-
-            if 'reservation' in item:
-                resource_reservations[item['name']][item['role']].append(
-                        {'amount': item['scalar']['value'],
-                        'resource_id': item['reservation']['labels']['labels'][0]['value']}
-                )
-        
-            # print(resource_reservations[item['name']][item['role']])
-
-        if item['type'] == 'RANGES':
-            # print_separator(8,'|')
-            # print("processing:")
-            # print(item)
-            # desired:
-            #  - resources['cpu']['hdfs-principal'] = []
-            #  - resource_breakdowns['cpu']['hdfs-principal] = [] (list of dicts)
-            if item['role'] not in resources[item['name']]:
-                resources[item['name']][item['role']] = copy.deepcopy(item['ranges']['range'])
-            else:
-                resources[item['name']][item['role']] += item['ranges']['range']
-
-            if 'reservation' in item:
-                new_dict = {'ranges': item['ranges']['range'], 'resource_id': item['reservation']['labels']['labels'][0]['value']}
-                resource_reservations[item['name']][item['role']].append(new_dict)
-
-        
-        # print(resource_reservations[item['name']][item['role']])
-
-
-    return resources, resource_reservations
-
-# XXX factor out get_statistics to a utility file
-def get_statistics(hostname):
-    port = 5051
-
-    containers_url = "http://{hostname}:{port}/monitor/statistics.json".format(
-        hostname=hostname, port=port)
-
-    try:
-        containers = get_json(containers_url)
-    except:
-        print("Unable to connect to slave at {}.".format(containers_url))
-        containers = None
-    return containers
+        out.emit('role_totals', rs.role_record("Role Totals", rs.total_stats))
+
+# The report of each cluster, records labelled with the cluster name, then
+# the report over the agents of all of them (labelled with cluster None).
+# The role list is only given for the whole fleet.
+def emit_fleet_roles(ctx, out, slave_data, role, role_list, role_totals, cluster_stats):
+    fleet = []
+    for cluster, data in slave_data:
+        fleet += data['slaves']
+        if role_list:
+            continue
+        out.heading(cluster_title(cluster))
+        emit_role_report(ctx, Labelled(out, cluster=cluster.name), RoleStats(ctx, data['slaves']),
+                         data, role, role_totals, cluster_stats)
+
+    rs = RoleStats(ctx, fleet)
+    if role_list:
+        for name in rs.roles():
+            out.emit('role_name', {'role': name})
+        return
+
+    out.heading("Fleet ({0} clusters)".format(len(slave_data)))
+    emit_role_report(ctx, Labelled(out, cluster=None), rs, {'slaves': fleet}, role, role_totals, cluster_stats)
+
+# Keep polling /slaves and reprint the report, only agents whose record
+# changed since the last poll are aggregated again.
+def watch_role_data(ctx, interval, role, role_totals, cluster_stats):
+    agents = AgentWatcher(AgentResources)
+
+    def redraw(slaves):
+        changed, removed = agents.update(slaves)
+        print_header(interval, changed, removed, len(slaves))
+        if not (full_redraw() or changed or removed):
+            return
+        rs = RoleStats(ctx, slaves, aggregate=lambda slave: agents.result(slave['id']))
+        with TextRenderer(FORMATTERS) as out:
+            emit_role_report(ctx, out, rs, {'slaves': slaves}, role, role_totals, cluster_stats)
+
+    poll(ctx, interval, redraw)
+
 
 class RoleStats:
-    def __init__(self, ctx):
+    def __init__(self, ctx, slaves=None, aggregate=None):
         # approximate data structure
         # role_stats = {
         #   '$role/total': {
@@ -213,43 +141,31 @@ class RoleStats:
         #     }
         #   }
         # }
-        self.slaves = ctx.slave_data['slaves']
+        self.slaves = ctx.slave_data['slaves'] if slaves is None else slaves
+        # slave -> AgentResources
+        if aggregate is None:
+            aggregate = ctx.resources.agent if slaves is None else ClusterResources(self.slaves).agent
+        self.aggregate = aggregate
         self.log = ctx.log
         self.role_stats = {}
         self.total_stats = {}
         self.__populate()
 
-    def print_role_list(self):
-        for role in self.role_stats.keys():
-            print(role) 
-
-    def print_totals(self):
-        self.print_role("Role Totals", self.total_stats)
-
-    def print_role(self, role, role_stats):
+    # {'role': role, 'resources': [{'resource': 'CPU', 'allocated': .., 'reserved': .., 'unit': ..}, ...]}
+    def role_record(self, role, role_stats):
         self.log.debug("{0}: {1}".format(role, role_stats))
-        print(ROLE_HEADER.format(role=role))
-        print(TABLE_HEADER)
-        if role_stats.get('CPU', None) is not None:
-            cpu = role_stats['CPU']
-            cpu_reserved = cpu.get('reserved', {'total': 0.0})
-            cpu_allocated = cpu.get('allocated', {'total': 0.0})
-            print(ROLE_RESOURCE_STRING.format(resource="CPU", allocated=cpu_allocated['total'], reserved=cpu_reserved['total'], units=cpu.get('unit', 'Cores')))
-        if role_stats.get('Mem', None) is not None:
-            mem = role_stats['Mem']
-            mem_reserved = mem.get('reserved', {'total': 0.0})
-            mem_allocated = mem.get('allocated', {'total': 0.0})
-            print(ROLE_RESOURCE_STRING.format(resource="Mem", allocated=mem_allocated['total'], reserved=mem_reserved['total'], units=mem.get('unit', 'MB')))
-        if role_stats.get('Disk', None) is not None:
-            disk = role_stats['Disk']
-            disk_reserved = disk.get('reserved', {'total': 0.0})
-            disk_allocated = disk.get('allocated', {'total': 0.0})
-            print(ROLE_RESOURCE_STRING.format(resource="Disk", allocated=disk_allocated['total'], reserved=disk_reserved['total'], units=disk.get('unit', 'MB')))
-        if role_stats.get('GPU', None) is not None:
-            gpu = role_stats['GPU']
-            gpu_reserved = gpu.get('reserved', {'total': 0.0})
-            gpu_allocated = gpu.get('allocated', {'total': 0.0})
-            print(ROLE_RESOURCE_STRING.format(resource="GPU", allocated=gpu_allocated['total'], reserved=gpu_reserved['total'], units=gpu.get('unit', 'Cores')))
+        resources = []
+        for _, label, unit in ROLE_RESOURCES:
+            if role_stats.get(label, None) is None:
+                continue
+            stats = role_stats[label]
+            resources.append({
+                'resource': label,
+                'allocated': stats.get('allocated', {'total': 0.0})['total'],
+                'reserved': stats.get('reserved', {'total': 0.0})['total'],
+                'unit': stats.get('unit', unit),
+            })
+        return {'role': role, 'resources': resources}
 
     def roles(self):
         return self.role_stats.keys()
@@ -260,60 +176,43 @@ class RoleStats:
             self.__aggregate_slave_reservations(slave)
 
     def __aggregate_slave_reservations(self, slave):
-        reserved_resources_full = slave['reserved_resources_full']
-        used_resources_full = slave['used_resources_full']
-    
-        combined_reserved_resources = []
-        for role in reserved_resources_full:
-            combined_reserved_resources += reserved_resources_full[role]
-        reserved, reserved_reservations = aggregate_resource_list(combined_reserved_resources)
-        allocated, allocated_reservations = aggregate_resource_list(used_resources_full)
+        resources = self.aggregate(slave)
         # Reserved Resources (By Role)
-        self.__aggregate_role_breakdown("reserved", reserved, reserved_reservations)
+        self.__aggregate_role_breakdown("reserved", resources.reserved)
         # Allocated Resources (By Role)
-        self.__aggregate_role_breakdown("allocated", allocated)
-    
-    def __aggregate_role_breakdown(self, btype, aggregate, reserved_reservations = None):
-        if 'cpus' in aggregate:
-            self.__aggregate_resource_by_roles(btype, 'CPU', 'cpus', aggregate['cpus'], "Cores")
-            if reserved_reservations is not None:
-                self.__aggregate_reservation_by_role(btype, reserved_reservations['cpus'], 'CPU', 'Cores')
-    
-        if 'mem' in aggregate:
-            self.__aggregate_resource_by_roles(btype, 'Mem', 'mem', aggregate['mem'], "MB")
-            if reserved_reservations is not None:
-                self.__aggregate_reservation_by_role(btype, reserved_reservations['mem'], 'Mem', 'MB')
-    
-        if 'disk' in aggregate:
-            self.__aggregate_resource_by_roles(btype, 'Disk', 'disk', aggregate['disk'], "MB")
-            if reserved_reservations is not None:
-                self.__aggregate_reservation_by_role(btype, reserved_reservations['disk'], 'Disk', 'MB')
-    
-        if 'gpus' in aggregate:
-            self.__aggregate_resource_by_roles(btype, 'GPU', 'gpus', aggregate['gpus'], "Cores")
-            if reserved_reservations is not None:
-                self.__aggregate_reservation_by_role(btype, reserved_reservations['gpus'], 'GPU', 'Cores')
-    
-
-    def __aggregate_reservation_by_role(self, btype, reservation_list, label, unit):
-        for role in reservation_list:
+        self.__aggregate_role_breakdown("allocated", resources.allocated)
+
+    def __aggregate_role_breakdown(self, btype, breakdown):
+        for resource, label, unit in ROLE_RESOURCES:
+            if resource not in breakdown.amounts:
+                continue
             total = 0
-            for reservation in reservation_list[role]:
-                total += reservation['amount']
-                self.role_stats.setdefault(role, {}).setdefault(label, {}).setdefault(btype, {})
+            for role, amount in breakdown.amounts[resource].items():
+                stats = self.role_stats.setdefault(role, {}).setdefault(label, {})
+                stats.setdefault(btype, {}).setdefault('total', 0)
+                stats[btype]['total'] += amount
+                stats['unit'] = unit
+                total += amount
+
             self.total_stats.setdefault(label, {}).setdefault(btype, {}).setdefault('total', 0)
             self.total_stats[label][btype]['total'] += total
             self.total_stats[label]['unit'] = unit
-     
-
-    def __aggregate_resource_by_roles(self, btype, label, role, aggregate_resource, unit):
-        total = 0
-        for role in aggregate_resource:
-            self.role_stats.setdefault(role, {}).setdefault(label, {}).setdefault(btype, {})['total'] = aggregate_resource[role]
-            total += aggregate_resource[role]
-        
-        self.total_stats.setdefault(label, {}).setdefault(btype, {}).setdefault('total', 0)
-        self.total_stats[label][btype]['total'] = self.total_stats[label][btype]['total'] + total
-        self.total_stats[label]['unit'] = unit
-    
 
+
+def format_role(out, record):
+    out.line(ROLE_HEADER.format(role=record['role']))
+    out.line(TABLE_HEADER)
+    for resource in record['resources']:
+        out.line(ROLE_RESOURCE_STRING.format(resource=resource['resource'], allocated=resource['allocated'],
+                                             reserved=resource['reserved'], units=resource['unit']))
+
+def format_role_totals(out, record):
+    out.line()
+    format_role(out, record)
+
+FORMATTERS = {
+    'cluster': format_cluster,
+    'role': format_role,
+    'role_totals': format_role_totals,
+    'role_name': lambda out, record: out.line(record['role']),
+}
@@ -0,0 +1,128 @@
+import click
+import heapq
+import itertools
+from dcos_monitor.cli import pass_context, requires
+from dcos_monitor.cmds import COMMANDS
+from dcos_monitor.sampler import calculate_container_stats
+from dcos_monitor.collector import poll_statistics
+
+# formatting constants
+TOP_HEADER = "{rank:>4}  {cpus:>7} {cpus_pct:>7}  {mem:>10} {mem_pct:>7}  {hostname:<20} {executor_id}"
+TOP_STRING = "{rank:>4}  {cpus:>7} {cpus_pct:>7}  {mem:>10.1f} {mem_pct:>6.1f}%  {hostname:<20} {executor_id}"
+
+# --by -> (field of calculate_container_stats, label), CPU fields are rates
+# and need two samples, memory ones are read off a single sample
+SORT_FIELDS = {
+    'cpu': ('cpus_used', 'CPU used'),
+    'cpu-util': ('cpus_utilization', 'CPU utilization'),
+    'mem': ('memory_used', 'memory used'),
+    'mem-util': ('memory_utilization', 'memory utilization'),
+}
+RATE_FIELDS = ('cpus_used', 'cpus_utilization')
+# the parts of a first sample calculate_container_stats reads
+CPU_COUNTERS = ('timestamp', 'cpus_system_time_secs', 'cpus_user_time_secs')
+
+
+@requires('slave_data')
+@click.command('top', short_help=COMMANDS['top'])
+@click.option('--count', '-n', type=click.IntRange(1, None), default=10,
+                help='number of containers to show')
+@click.option('--by', 'sort_by', type=click.Choice(sorted(SORT_FIELDS)), default='cpu',
+                help='what the containers are ranked by')
+@click.option('--wait', '--interval', 'wait', type=click.FLOAT, default=5,
+                help='seconds between the two samples CPU usage is worked out from')
+@click.option('--max-concurrency', type=click.INT, default=32,
+                help='maximum number of agents polled at the same time')
+@click.option('--agent-timeout', type=click.FLOAT, default=10,
+                help='seconds to wait for an individual agent to respond')
+@pass_context
+def cli(ctx, count, sort_by, wait, max_concurrency, agent_timeout):
+    """show the containers using the most CPU or memory cluster-wide
+
+    Every agent's /monitor/statistics.json is polled at the same time (twice,
+    --wait seconds apart, when ranking by CPU) and its containers are merged
+    into the top --count as soon as the agent has answered, only those are
+    kept however many containers the cluster runs.
+    """
+    field, label = SORT_FIELDS[sort_by]
+    slaves = ctx.slave_data['slaves']
+    top = TopContainers(count, field, {slave['hostname']: slave['id'] for slave in slaves})
+    poll_statistics(list(top.agents), wait, top.samples, top.add,
+                    max_concurrency=max_concurrency, timeout=agent_timeout)
+
+    with ctx.renderer(FORMATTERS) as out:
+        out.heading("Top {0} containers by {1} ({2} containers on {3} of {4} agents)".format(
+            count, label, top.containers, len(top.answered), len(slaves)), blank=False)
+        for rank, record in enumerate(top.records(), 1):
+            out.emit('container', dict({'rank': rank}, **record))
+
+
+class TopContainers(object):
+    """the `count` containers with the largest `field`, merged in one agent
+    at a time through a heap that never holds more than `count` of them
+
+    add() is poll_statistics' callback.  When `field` is a rate, an agent's
+    first sample is reduced to the CPU counters of its containers until its
+    second sample comes in; containers without both samples are left out.
+    """
+
+    def __init__(self, count, field, agents):
+        self.count = count
+        self.field = field
+        # hostname -> agent id
+        self.agents = agents
+        self.samples = 2 if field in RATE_FIELDS else 1
+        # (value, arrival, record), smallest value first
+        self.heap = []
+        self.arrival = itertools.count()
+        # hostname -> {executor id: CPU counters} of first samples
+        self.first = {}
+        self.answered = set()
+        self.containers = 0
+
+    def add(self, hostname, n, containers):
+        if n + 1 < self.samples:
+            self.first[hostname] = {container['executor_id']: {k: container['statistics'][k] for k in CPU_COUNTERS}
+                                    for container in containers}
+            return
+
+        self.answered.add(hostname)
+        start = self.first.pop(hostname, {})
+        for container in containers:
+            self.containers += 1
+            statistics = container['statistics']
+            record = {
+                'agent_id': self.agents.get(hostname),
+                'hostname': hostname,
+                'executor_id': container['executor_id'],
+                'framework_id': container.get('framework_id'),
+            }
+            record.update(calculate_container_stats(start.get(container['executor_id'], statistics), statistics))
+            value = record[self.field]
+            if value is None:
+                continue
+            entry = (value, next(self.arrival), record)
+            if len(self.heap) < self.count:
+                heapq.heappush(self.heap, entry)
+            elif value > self.heap[0][0]:
+                heapq.heapreplace(self.heap, entry)
+
+    # largest first, ties in the order the containers came in
+    def records(self):
+        return [record for _, _, record in sorted(self.heap, key=lambda entry: (-entry[0], entry[1]))]
+
+
+def format_container(out, container):
+    if container['rank'] == 1:
+        out.line(TOP_HEADER.format(rank='#', cpus='CPU', cpus_pct='CPU %', mem='Mem (MB)', mem_pct='Mem %',
+                                   hostname='HOSTNAME', executor_id='EXECUTOR'))
+    cpus = '-' if container['cpus_used'] is None else "{0:.2f}".format(container['cpus_used'])
+    cpus_pct = '-' if container['cpus_utilization'] is None else "{0:.1f}%".format(container['cpus_utilization'])
+    out.line(TOP_STRING.format(rank=container['rank'], cpus=cpus, cpus_pct=cpus_pct,
+                               mem=container['memory_used'] / 1024.0 / 1024.0,
+                               mem_pct=container['memory_utilization'],
+                               hostname=container['hostname'], executor_id=container['executor_id']))
+
+FORMATTERS = {
+    'container': format_container,
+}
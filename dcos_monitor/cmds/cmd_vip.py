@@ -0,0 +1,52 @@
+import click
+from dcos_monitor.cli import pass_context, requires
+from dcos_monitor.cmds import COMMANDS
+from dcos_monitor.task_index import TASK_INDEX_FIELDS, TaskIndex
+
+FRAMEWORK_STRING = "{id:<51} [{name:^26}]"
+
+
+@requires(state_data=TASK_INDEX_FIELDS)
+@click.command('vip', short_help=COMMANDS['vip'])
+@click.option('--name', type=click.STRING, default=None,
+                help='VIP as in its label (name:port) or fully qualified, the port is optional')
+@pass_context
+def cli(ctx, name):
+    """print the running backends of a VIP, or of every VIP without --name"""
+    index = TaskIndex(ctx.state_data)
+
+    if name is None:
+        found = []
+        for framework_id in index.framework_ids:
+            for vip in index.framework_vips[framework_id]:
+                found += [entry for entry in index.lookup_vip(vip) if entry[0]['id'] == framework_id]
+    else:
+        found = index.lookup_vip(name)
+        if not found:
+            ctx.log.error("No such VIP: {0}".format(name))
+            return
+
+    with ctx.renderer(FORMATTERS) as out:
+        for framework, vip, address, backends in found:
+            record = {
+                'vip': vip,
+                'address': address,
+                'framework_id': framework['id'],
+                'framework_name': framework['name'],
+                'backends': [{'ip': ip, 'port': port} for ip, port in backends],
+            }
+            out.emit('vip', record, nested={'backends': 'backend'})
+
+
+def format_vip(out, vip):
+    out.separator()
+    out.line(vip['address'])
+    out.line(FRAMEWORK_STRING.format(id=vip['framework_id'], name=vip['framework_name']))
+    out.separator()
+    for backend in vip['backends']:
+        out.line(" - {}:{}".format(backend['ip'], backend['port']), 4)
+    out.line()
+
+FORMATTERS = {
+    'vip': format_vip,
+}
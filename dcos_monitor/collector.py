@@ -0,0 +1,114 @@
+"""concurrent collection of agent container statistics
+"""
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_futures
+from dcos_monitor.cli import get_statistics
+from dcos_monitor.sampler import Sampler
+from dcos_monitor.transport import transport
+
+# Returns {hostname: [sample, ...]} where a sample is {executor_id: container}.
+# Agents that time out or error on every poll map to None, agents that fail
+# some polls keep the samples that did come back.  finished(hostname,
+# results) is called as soon as an agent's entry is final.
+def collect_statistics(hostnames, interval, samples=2, max_concurrency=32, timeout=10, finished=None):
+    taken = {hostname: [None] * samples for hostname in hostnames}
+    results = {}
+
+    def add(hostname, n, containers):
+        taken[hostname][n] = {container['executor_id']: container for container in containers}
+
+    def settle(hostname):
+        answered = [sample for sample in taken[hostname] if sample is not None]
+        results[hostname] = answered if answered else None
+        if finished is not None:
+            finished(hostname, results)
+
+    poll_statistics(hostnames, interval, samples, add, max_concurrency, timeout, finished=settle)
+    return results
+
+# The same polls kept in a Sampler, a ring buffer of a few counters per
+# executor rather than every statistics document.  finished(hostname,
+# sampler) is called once an agent has all the samples it will get.
+def sample_statistics(hostnames, interval, samples, max_concurrency=32, timeout=10, finished=None):
+    sampler = Sampler(samples)
+    settle = None if finished is None else lambda hostname: finished(hostname, sampler)
+    poll_statistics(hostnames, interval, samples, sampler.add, max_concurrency, timeout, finished=settle)
+    return sampler
+
+# Poll every agent `samples` times, `interval` seconds apart, and call
+# add(hostname, sample number, containers) with every answer.
+#
+# Each agent keeps its own schedule: sample N is sent `N * interval` seconds
+# after that agent's first request went out, whether or not the earlier
+# request has returned yet, so the window between samples really is
+# `interval` no matter how many agents there are or how slow some of them
+# respond.  At most `max_concurrency` requests are in flight at once.
+# Agents that can't answer their first poll aren't asked again.
+#
+# finished(hostname), if given, is called once per agent as soon as nothing
+# more will be added for it: all its samples are in, or it failed its first
+# poll.  Callers can report an agent then instead of waiting for the rest.
+def poll_statistics(hostnames, interval, samples, add, max_concurrency=32, timeout=10, finished=None):
+    max_concurrency = max(1, max_concurrency)
+    # Replayed samples carry the time they were taken, there is nothing to
+    # wait for.  They are asked for one after the other instead, so they
+    # come back in the order they were recorded.
+    sequential = transport.offline
+    if sequential:
+        interval = 0
+    # keep a connection to every agent between its samples
+    transport.reserve(1, len(hostnames))
+    failed = set()
+    # hostname -> samples neither answered nor given up on yet
+    remaining = {hostname: samples for hostname in hostnames}
+    # (due time, hostname, sample number)
+    schedule = [(0, hostname, 0) for hostname in hostnames]
+    heapq.heapify(schedule)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        in_flight = {}
+        while schedule or in_flight:
+            now = time.time()
+            while schedule and schedule[0][0] <= now and len(in_flight) < max_concurrency:
+                _, hostname, n = heapq.heappop(schedule)
+                if hostname in failed:
+                    continue
+                if n == 0 and not sequential:
+                    for k in range(1, samples):
+                        heapq.heappush(schedule, (now + k * interval, hostname, k))
+                future = pool.submit(get_statistics, hostname, timeout=timeout)
+                in_flight[future] = (hostname, n)
+
+            if not in_flight:
+                if schedule:
+                    time.sleep(max(0, schedule[0][0] - time.time()))
+                continue
+
+            # wake up for whichever comes first: a finished request or the
+            # next due sample (if there is room to send it)
+            next_due = None
+            if schedule and len(in_flight) < max_concurrency:
+                next_due = max(0, schedule[0][0] - time.time())
+            done, _ = wait_futures(in_flight, timeout=next_due, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                hostname, n = in_flight.pop(future)
+                stats = future.result()
+                if sequential and n + 1 < samples:
+                    heapq.heappush(schedule, (0, hostname, n + 1))
+                if remaining[hostname] <= 0:
+                    # answered after the agent was given up on
+                    continue
+                if stats is None:
+                    # an agent that can't answer the first poll won't answer the rest
+                    if n == 0:
+                        failed.add(hostname)
+                        remaining[hostname] = 0
+                    else:
+                        remaining[hostname] -= 1
+                else:
+                    add(hostname, n, stats)
+                    remaining[hostname] -= 1
+                if remaining[hostname] == 0 and finished is not None:
+                    finished(hostname)
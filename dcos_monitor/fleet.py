@@ -0,0 +1,99 @@
+"""several clusters in one run
+
+Masters come from --master (repeatable, "name=host" to name a cluster) and
+--clusters-file, a text file with one cluster per line:
+
+    # name      master
+    prod        10.0.6.89
+    staging     10.1.6.12:5050
+    10.2.6.40
+
+All clusters are fetched at the same time, and a cluster that does not
+answer within its timeout is reported and left out instead of holding up
+the others.
+"""
+import threading
+import time
+from collections import namedtuple
+
+Cluster = namedtuple('Cluster', ['name', 'master'])
+
+
+# "name=host" or "host"
+def parse_cluster(text):
+    name, _, master = text.strip().rpartition('=')
+    return Cluster(name or master, master)
+
+
+def read_clusters_file(path):
+    clusters = []
+    with open(path) as clusters_file:
+        for line in clusters_file:
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) == 1:
+                clusters.append(Cluster(fields[0], fields[0]))
+            else:
+                clusters.append(Cluster(fields[0], fields[1]))
+    return clusters
+
+
+# masters given on the command line (comma separated lists are split) and
+# the clusters of a clusters file, without duplicates
+def collect_clusters(masters, clusters_file=None):
+    clusters = []
+    for master in masters:
+        clusters += [parse_cluster(m) for m in master.split(',') if m.strip()]
+    if clusters_file is not None:
+        clusters += read_clusters_file(clusters_file)
+
+    unique = []
+    for cluster in clusters:
+        if cluster not in unique:
+            unique.append(cluster)
+    return unique
+
+
+def cluster_title(cluster):
+    if cluster.name == cluster.master:
+        return "Cluster {0}".format(cluster.name)
+    return "Cluster {0} ({1})".format(cluster.name, cluster.master)
+
+
+# Run fetch(cluster) for every cluster at once and return [(cluster, result)]
+# for the ones that finished within `timeout` seconds without an error, in
+# the order the clusters were given.  The others are logged.  Each fetch
+# runs in a daemon thread: a cluster that never answers is left behind and
+# doesn't keep the process from exiting once the report is out.
+def fetch_clusters(clusters, fetch, timeout, log):
+    # position -> (result, error) of the fetches that finished
+    outcomes = {}
+
+    def run(i, cluster):
+        try:
+            outcomes[i] = (fetch(cluster), None)
+        except (Exception, SystemExit) as e:
+            outcomes[i] = (None, e)
+
+    threads = []
+    for i, cluster in enumerate(clusters):
+        thread = threading.Thread(target=run, args=(i, cluster), name="fetch-{0}".format(cluster.name))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    deadline = None if timeout is None else time.time() + timeout
+    for thread in threads:
+        thread.join(None if deadline is None else max(0, deadline - time.time()))
+
+    results = []
+    for i, cluster in enumerate(clusters):
+        if i not in outcomes:
+            log.error("{0}: no answer from {1} within {2}s, skipping it".format(cluster.name, cluster.master, timeout))
+            continue
+        result, error = outcomes[i]
+        if error is not None:
+            log.error("{0}: unable to fetch from {1}: {2}".format(cluster.name, cluster.master, error))
+            continue
+        results.append((cluster, result))
+    return results
@@ -0,0 +1,183 @@
+"""a local SQLite store of the metrics `collect` polls, and the queries of `history`
+
+Every poll appends one point per series, a series being a metric of
+metrics.py (e.g. dcos_role_resources) with one set of labels (role=...,
+resource=..., type=...):
+
+    series          id, metric name, labels as sorted JSON
+    series_labels   (label, value, series), the index filters and group-bys go through
+    points          (series, ts, resolution) -> avg, min, max, count
+
+Points are kept as polled for a day, then averaged into buckets that get
+coarser as they age (see TIERS), so a year of 5 minute polls stays small.
+A downsampled point keeps the min and max of what it replaced and how many
+polls it stands for, queries weigh it accordingly.
+"""
+import json
+import math
+import os
+import sqlite3
+import time
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# (age, resolution): points older than `age` seconds are averaged into
+# buckets of `resolution` seconds
+TIERS = [(DAY, 5 * MINUTE), (7 * DAY, HOUR), (90 * DAY, DAY)]
+
+COMBINE = {'sum': 'SUM', 'avg': 'AVG', 'min': 'MIN', 'max': 'MAX'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    UNIQUE (name, labels)
+);
+CREATE TABLE IF NOT EXISTS series_labels (
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    series INTEGER NOT NULL,
+    PRIMARY KEY (name, value, series)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS points (
+    series INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    resolution INTEGER NOT NULL,
+    value REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (series, ts, resolution)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS points_by_age ON points (resolution, ts);
+"""
+
+# average the points of one resolution older than a cutoff into buckets of
+# a coarser one, merging into buckets an earlier run started
+DOWNSAMPLE = """
+INSERT INTO points (series, ts, resolution, value, min, max, count)
+SELECT series, ts - ts % :resolution, :resolution, SUM(value * count) / SUM(count), MIN(min), MAX(max), SUM(count)
+FROM points WHERE resolution = :source AND ts < :cutoff
+GROUP BY series, ts - ts % :resolution
+ON CONFLICT (series, ts, resolution) DO UPDATE SET
+    value = (value * count + excluded.value * excluded.count) / (count + excluded.count),
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max),
+    count = count + excluded.count
+"""
+
+# Points of one metric combined across the series of each group at every
+# poll, then summarized per step
+QUERY = """
+SELECT grp, ts - ts % :step AS bucket, SUM(value * count) / SUM(count), MIN(low), MAX(high), SUM(count)
+FROM (
+    SELECT {group} AS grp, p.ts AS ts, {combine}(p.value) AS value, {combine}(p.min) AS low,
+           {combine}(p.max) AS high, MAX(p.count) AS count
+    FROM series s JOIN points p ON p.series = s.id {join}
+    WHERE s.name = :name AND p.ts >= :start AND p.ts < :end {filters}
+    GROUP BY grp, p.ts
+)
+GROUP BY grp, bucket
+ORDER BY grp, bucket
+"""
+
+
+def default_history_path():
+    base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'dcos_monitor', 'history.sqlite')
+
+
+# '90s', '15m', '6h', '7d', '2w' or plain seconds -> seconds
+def parse_duration(text):
+    units = {'s': 1, 'm': MINUTE, 'h': HOUR, 'd': DAY, 'w': 7 * DAY}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+class HistoryStore(object):
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        # (name, labels) -> series id
+        self._series = {}
+
+    def close(self):
+        self.db.close()
+
+    def series_id(self, name, labels):
+        key = (name, json.dumps(labels, sort_keys=True))
+        if key not in self._series:
+            row = self.db.execute("SELECT id FROM series WHERE name = ? AND labels = ?", key).fetchone()
+            if row is None:
+                series = self.db.execute("INSERT INTO series (name, labels) VALUES (?, ?)", key).lastrowid
+                self.db.executemany("INSERT INTO series_labels (name, value, series) VALUES (?, ?, ?)",
+                                    [(label, str(value), series) for label, value in labels.items()])
+            else:
+                series = row[0]
+            self._series[key] = series
+        return self._series[key]
+
+    # one point per sample of some metrics.MetricFamily, all taken at `ts`
+    def append(self, ts, families):
+        ts = int(ts)
+        rows = []
+        with self.db:
+            for family in families:
+                for labels, value in family.samples:
+                    if value is None or math.isnan(value):
+                        continue
+                    rows.append((self.series_id(family.name, labels), ts, value, value, value))
+            self.db.executemany("INSERT OR REPLACE INTO points (series, ts, resolution, value, min, max, count) "
+                                "VALUES (?, ?, 0, ?, ?, ?, 1)", rows)
+        return len(rows)
+
+    def downsample(self, now=None):
+        now = time.time() if now is None else now
+        source = 0
+        with self.db:
+            for age, resolution in TIERS:
+                cutoff = int(now - age) // resolution * resolution
+                params = {'source': source, 'resolution': resolution, 'cutoff': cutoff}
+                self.db.execute(DOWNSAMPLE, params)
+                self.db.execute("DELETE FROM points WHERE resolution = :source AND ts < :cutoff", params)
+                source = resolution
+
+    # [(metric, series, label names), ...]
+    def metrics(self):
+        rows = self.db.execute(
+            "SELECT s.name, COUNT(DISTINCT s.id), GROUP_CONCAT(DISTINCT l.name) "
+            "FROM series s LEFT JOIN series_labels l ON l.series = s.id "
+            "GROUP BY s.name ORDER BY s.name").fetchall()
+        return [(name, count, sorted(labels.split(',')) if labels else []) for name, count, labels in rows]
+
+    # [(group, bucket, avg, min, max, polls), ...] of metric `name` between
+    # `start` and `end`, over the series whose labels match `where`.  The
+    # series of a group (all of them without `group_by`) are combined at
+    # every poll with `combine`, then averaged per `step` seconds.
+    def query(self, name, start, end, step=HOUR, where=None, group_by=None, combine='sum'):
+        params = {'name': name, 'start': int(start), 'end': int(end), 'step': max(1, int(step))}
+        filters = []
+        for i, (label, value) in enumerate(sorted((where or {}).items())):
+            filters.append("AND s.id IN (SELECT series FROM series_labels "
+                           "WHERE name = :label{0} AND value = :value{0})".format(i))
+            params['label{0}'.format(i)] = label
+            params['value{0}'.format(i)] = str(value)
+        if group_by is not None:
+            join = "JOIN series_labels g ON g.series = s.id AND g.name = :group_by"
+            group = "g.value"
+            params['group_by'] = group_by
+        else:
+            join = ""
+            group = "''"
+        sql = QUERY.format(group=group, join=join, filters=' '.join(filters), combine=COMBINE[combine])
+        return self.db.execute(sql, params).fetchall()
@@ -0,0 +1,223 @@
+"""incremental JSON loading that only keeps a projection of the document
+
+A projection is a nested dict naming the fields to keep, `True` keeps a value
+whole.  Projections on a list apply to every element of the list:
+
+    {'frameworks': {'id': True, 'name': True, 'tasks': {'state': True}}}
+
+keeps `id`, `name` and each task's `state` out of every framework and drops
+everything else (flags, completed_frameworks, ...) without ever building it.
+"""
+import codecs
+import json
+import re
+from json.decoder import scanstring
+
+CHUNK_SIZE = 1 << 16
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+SCALAR = re.compile(r'[^,\]}\s]+')
+
+DECODER = json.JSONDecoder()
+DELIMITERS = ' \t\n\r,]}'
+
+
+def load(fp, projection=None):
+    """read JSON from a text or binary file object, keeping only `projection`"""
+    if projection is None:
+        return json.load(fp)
+    scanner = _Scanner(fp)
+    value = scanner.value(projection)
+    if scanner.peek(eof_ok=True) is not None:
+        raise ValueError("extra data after JSON document")
+    return value
+
+
+
+def project(value, projection):
+    """the projection of an already parsed value, as load would have kept it"""
+    if projection is None or projection is True:
+        return value
+    if isinstance(value, dict):
+        return {key: project(value[key], projection[key]) for key in value if key in projection}
+    if isinstance(value, list):
+        return [project(item, projection) for item in value]
+    return value
+
+
+def merge(*projections):
+    """a projection keeping everything any of `projections` keeps"""
+    merged = {}
+    for projection in projections:
+        if projection is True:
+            return True
+        for key, sub in projection.items():
+            merged[key] = merge(merged[key], sub) if key in merged else sub
+    return merged
+
+class _Scanner(object):
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = None
+        self.buf = ''
+        self.pos = 0
+        # while capturing a value: its start in buf and any text already
+        # pushed out of buf by a refill
+        self.mark = None
+        self.captured = []
+
+    def _read(self, size):
+        while True:
+            raw = self.fp.read(size)
+            if not isinstance(raw, bytes):
+                return raw or None
+            if self.decoder is None:
+                self.decoder = codecs.getincrementaldecoder('utf-8')()
+            # a multi-byte character split across reads decodes to nothing
+            # until the next read
+            text = self.decoder.decode(raw, final=not raw)
+            if text or not raw:
+                return text or None
+
+    def fill(self, grow=False):
+        # when a single token doesn't fit, read at least as much again as is
+        # buffered so re-matching it stays linear
+        size = max(self.chunk_size, len(self.buf) - self.pos) if grow else self.chunk_size
+        chunk = self._read(size)
+        if chunk is None:
+            return False
+        if self.mark is not None:
+            self.captured.append(self.buf[self.mark:self.pos])
+            self.mark = 0
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self, eof_ok=False):
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                if eof_ok:
+                    return None
+                raise ValueError("unexpected end of JSON document")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("expected {0!r} at {1!r}".format(char, self.buf[self.pos:self.pos + 20]))
+        self.pos += 1
+
+    def _match(self, pattern):
+        # match a token, refilling until it can't be cut off by the buffer end
+        while True:
+            m = pattern.match(self.buf, self.pos)
+            if m is not None and m.end() < len(self.buf):
+                return m
+            if not self.fill(grow=True):
+                if m is None:
+                    raise ValueError("unexpected end of JSON document")
+                return m
+
+    def string(self):
+        self._match(STRING)
+        value, self.pos = scanstring(self.buf, self.pos + 1)
+        return value
+
+    def buffered_value(self):
+        # parse the value at pos with the C decoder if it is entirely in the
+        # buffer (a number running into the end of the buffer may be cut off)
+        try:
+            value, end = DECODER.raw_decode(self.buf, self.pos)
+        except ValueError:
+            return False, None
+        if self.buf[end - 1] not in ']}"' and (end >= len(self.buf) or self.buf[end] not in DELIMITERS):
+            return False, None
+        self.pos = end
+        return True, value
+
+    def skip(self):
+        char = self.peek()
+        if self.buffered_value()[0]:
+            return
+        if char == '{':
+            self.object(None)
+        elif char == '[':
+            self.array(None)
+        elif char == '"':
+            self.pos = self._match(STRING).end()
+        else:
+            if SCALAR.match(self.buf, self.pos) is None:
+                raise ValueError("unexpected {0!r} in JSON document".format(char))
+            self.pos = self._match(SCALAR).end()
+
+    def capture(self):
+        self.peek()
+        found, value = self.buffered_value()
+        if found:
+            return value
+        # bigger than the buffer: find its end and parse it in one go
+        self.mark = self.pos
+        self.captured = []
+        self.skip()
+        self.captured.append(self.buf[self.mark:self.pos])
+        self.mark = None
+        return json.loads(''.join(self.captured))
+
+    def value(self, projection):
+        if projection is True:
+            return self.capture()
+        char = self.peek()
+        if char in '{[':
+            # a container that is entirely in the buffer (a task, a
+            # framework's small fields) is built by the C decoder and
+            # projected, only bigger ones are walked here
+            found, value = self.buffered_value()
+            if found:
+                return project(value, projection)
+        if char == '{':
+            return self.object(projection)
+        if char == '[':
+            return self.array(projection)
+        return self.capture()
+
+    # a projection of None walks the container without keeping anything
+    def object(self, projection):
+        result = {}
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return result
+        while True:
+            self.peek()
+            key = self.string()
+            self.expect(':')
+            if projection is not None and key in projection:
+                result[key] = self.value(projection[key])
+            else:
+                self.skip()
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect('}')
+            return result
+
+    def array(self, projection):
+        result = []
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return result
+        while True:
+            if projection is None:
+                self.skip()
+            else:
+                result.append(self.value(projection))
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect(']')
+            return result
@@ -0,0 +1,192 @@
+"""Marathon's apps, and the Mesos tasks they run as
+
+Apps come from /marathon/v2/apps through the shared transport.  Marathon
+filters them itself: `label` takes a label selector (`tier==web`, `canary`,
+`team in (a,b)`), `id` keeps the apps whose id contains a string, and
+`embed` picks what comes along with every app (apps.counts, apps.tasks,
+apps.deployments, apps.readiness, apps.lastTaskFailure, apps.taskStats).
+Large trees of apps can be fetched one top-level group at a time, the
+groups concurrently, see get_apps_by_group.
+
+Marathon names the Mesos tasks of an app after the app's id:
+
+    /prod/web -> prod_web.<uuid>
+                 prod_web.marathon-<uuid>
+                 prod_web.instance-<uuid>._app.<n>
+
+so AppTasks indexes the tasks of Marathon's framework in state.json by app
+id in one pass, and every app finds its tasks with one lookup.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from dcos_monitor.transport import master_url, transport
+
+# what print_marathon_apps (and record) ask Marathon to send along
+DEFAULT_EMBED = ('apps.counts',)
+EMBEDS = ('apps.counts', 'apps.tasks', 'apps.deployments', 'apps.readiness', 'apps.lastTaskFailure',
+          'apps.taskStats')
+
+# the parts of state.json AppTasks reads
+APP_TASK_FIELDS = {
+    'frameworks': {
+        'id': True,
+        'name': True,
+        'tasks': {
+            'id': True,
+            'slave_id': True,
+            'state': True,
+            'statuses': {'state': True, 'healthy': True},
+        },
+    },
+}
+
+TASK_ID = re.compile(r'^(?P<app>.+?)\.(?:marathon-|instance-)?'
+                     r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}(?:\._app\.\d+)?$')
+
+
+def marathon_url(hostname, path, params=()):
+    url = master_url(hostname, '/marathon' + path, port=None)
+    if params:
+        url += '?' + urlencode(params)
+    return url
+
+
+def auth_headers(token):
+    return {'authorization': "token={token}".format(token=token)} if token else None
+
+
+# [(name, value), ...] of a /v2/apps request, embeds in the order given
+def apps_params(embed=DEFAULT_EMBED, label=None, app_id=None):
+    params = [('embed', e) for e in embed]
+    if label:
+        params.append(('label', label))
+    if app_id:
+        params.append(('id', app_id))
+    return params
+
+
+def get_apps(hostname, token=None, embed=DEFAULT_EMBED, label=None, app_id=None, timeout=None):
+    """the apps Marathon lists at /v2/apps for these filters"""
+    url = marathon_url(hostname, '/v2/apps', apps_params(embed, label, app_id))
+    return transport.get_json(url, timeout=timeout, headers=auth_headers(token))['apps']
+
+
+def get_info(hostname, token=None, timeout=None):
+    """/v2/info, which has the id of Marathon's framework"""
+    return transport.get_json(marathon_url(hostname, '/v2/info'), timeout=timeout, headers=auth_headers(token))
+
+
+def get_apps_by_group(hostname, token=None, embed=DEFAULT_EMBED, label=None, max_concurrency=8, timeout=None):
+    """the apps of get_apps, asked for one top-level group at a time
+
+    The group tree (without apps) and the apps at the top level are listed
+    first, then the apps of every top-level group are fetched concurrently
+    with the same filters.  /v2/groups has no label filter, the selector is
+    applied to the top-level apps here.  The `id` filter matches anywhere in
+    an app's id, apps that came back for another group are dropped.
+    """
+    max_concurrency = max(1, max_concurrency)
+    headers = auth_headers(token)
+    top_params = [('embed', 'group.apps')] + [('embed', 'group.' + e) for e in embed]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        tree = pool.submit(transport.get_json, marathon_url(hostname, '/v2/groups', [('embed', 'group.groups')]),
+                           timeout=timeout, headers=headers)
+        top = pool.submit(transport.get_json, marathon_url(hostname, '/v2/groups', top_params),
+                          timeout=timeout, headers=headers)
+        groups = [group['id'].rstrip('/') + '/' for group in tree.result().get('groups') or ()]
+        apps = {app['id']: app for app in top.result().get('apps') or ()
+                if not label or label_matches(app.get('labels') or {}, label)}
+
+    transport.reserve(max_concurrency)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        fetches = [(prefix, pool.submit(get_apps, hostname, token, embed, label, prefix, timeout))
+                   for prefix in groups]
+        for prefix, future in fetches:
+            for app in future.result():
+                if app['id'].startswith(prefix):
+                    apps[app['id']] = app
+    return list(apps.values())
+
+
+# key, key==value, key!=value, key in (a,b) and key notin (a,b), separated
+# by commas, all of which have to hold
+SELECTOR = re.compile(r'\s*(?P<key>[^\s,=!()]+)\s*'
+                      r'(?:(?P<op>==|!=)\s*(?P<value>[^\s,()]*)|(?P<set>in|notin)\s*\((?P<values>[^)]*)\))?\s*(?:,|$)')
+
+
+def label_matches(labels, selector):
+    """whether labels ({key: value}) match a Marathon label selector, like
+    Marathon every requirement only holds for labels that have the key"""
+    position = 0
+    while position < len(selector):
+        match = SELECTOR.match(selector, position)
+        if match is None:
+            raise ValueError("invalid label selector: {0!r}".format(selector))
+        position = match.end()
+        value = labels.get(match.group('key'))
+        if value is None:
+            return False
+        if match.group('op') is not None and (value == match.group('value')) != (match.group('op') == '=='):
+            return False
+        if match.group('set') is not None:
+            values = [item.strip() for item in match.group('values').split(',')]
+            if (value in values) != (match.group('set') == 'in'):
+                return False
+    return True
+
+
+# /prod/web for a task id of its app, None for tasks not named like Marathon's
+def task_app_id(task_id):
+    match = TASK_ID.match(task_id)
+    return '/' + match.group('app').replace('_', '/') if match else None
+
+
+# the framework Marathon runs as: the one /v2/info names, or one called `name`
+def marathon_framework(frameworks, info=None, name='marathon'):
+    framework_id = (info or {}).get('frameworkId')
+    name = (info or {}).get('name') or name
+    for framework in frameworks:
+        if framework['id'] == framework_id:
+            return framework
+    for framework in frameworks:
+        if framework.get('name') == name:
+            return framework
+    return None
+
+
+# health a Mesos task last reported, None when it has no health checks
+def mesos_health(task):
+    for status in reversed(task.get('statuses') or ()):
+        if 'healthy' in status:
+            return status['healthy']
+    return None
+
+
+# health of a task Marathon embedded in an app, None without results
+def marathon_health(task):
+    results = task.get('healthCheckResults')
+    if not results:
+        return None
+    return all(result.get('alive') for result in results)
+
+
+class AppTasks(object):
+    """tasks of a framework by the id of the Marathon app they belong to
+
+    apps            app id -> [task, ...]
+    """
+
+    def __init__(self, framework):
+        self.apps = {}
+        for task in (framework or {}).get('tasks') or ():
+            app_id = task_app_id(task['id'])
+            if app_id is not None:
+                self.apps.setdefault(app_id, []).append(task)
+
+    def __len__(self):
+        return len(self.apps)
+
+    def tasks(self, app_id):
+        return self.apps.get(app_id, [])
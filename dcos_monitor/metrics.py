@@ -0,0 +1,115 @@
+"""the numbers the reports compute, as Prometheus/OpenMetrics gauges
+"""
+from dcos_monitor.agent_table import gather_cluster_stats
+from dcos_monitor.sampler import calculate_container_stats
+
+RESOURCES = ['cpus', 'mem', 'disk', 'gpus']
+# RoleStats labels -> resource names
+ROLE_RESOURCES = {'CPU': 'cpus', 'Mem': 'mem', 'Disk': 'disk', 'GPU': 'gpus'}
+
+
+class MetricFamily(object):
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.samples = []
+
+    def add(self, labels, value):
+        self.samples.append((labels, value))
+        return self
+
+
+def cluster_metrics(slaves):
+    allocated, percentage, total = gather_cluster_stats(slaves)
+    families = [
+        MetricFamily('dcos_cluster_resources', 'Total resources of all agents (cores / MB)'),
+        MetricFamily('dcos_cluster_resources_allocated', 'Resources allocated on all agents (cores / MB)'),
+        MetricFamily('dcos_cluster_resources_allocated_percent', 'Allocated share of the cluster resources'),
+    ]
+    for resource in RESOURCES:
+        labels = {'resource': resource}
+        families[0].add(labels, total[resource])
+        families[1].add(labels, allocated[resource])
+        families[2].add(labels, percentage[resource])
+    return families
+
+
+def role_metrics(role_stats):
+    family = MetricFamily('dcos_role_resources', 'Resources reserved for / allocated to a role (cores / MB)')
+    for role in sorted(role_stats.role_stats):
+        for label, stats in sorted(role_stats.role_stats[role].items()):
+            for btype in ('reserved', 'allocated'):
+                if btype in stats:
+                    family.add({'role': role, 'resource': ROLE_RESOURCES[label], 'type': btype},
+                               stats[btype].get('total', 0.0))
+    return [family]
+
+
+def agent_metrics(slaves):
+    capacity = MetricFamily('dcos_agent_resources_capacity', 'Total resources of an agent (cores / MB)')
+    used = MetricFamily('dcos_agent_resources_used', 'Resources in use on an agent (cores / MB)')
+    for slave in slaves['slaves']:
+        for resource in RESOURCES:
+            labels = {'agent_id': slave['id'], 'hostname': slave['hostname'], 'resource': resource}
+            capacity.add(labels, slave['resources'].get(resource, 0.0))
+            used.add(labels, slave['used_resources'].get(resource, 0.0))
+    return [capacity, used]
+
+
+# samples as returned by collector.collect_statistics
+def container_metrics(samples):
+    families = {
+        'cpus_used': MetricFamily('dcos_container_cpus_used', 'CPU cores used by a container over the sample window'),
+        'cpus_allocated': MetricFamily('dcos_container_cpus_limit', 'CPU cores allocated to a container'),
+        'cpus_utilization': MetricFamily('dcos_container_cpus_utilization_percent', 'CPU used / allocated'),
+        'memory_used': MetricFamily('dcos_container_mem_rss_bytes', 'Resident memory of a container'),
+        'memory_allocated': MetricFamily('dcos_container_mem_limit_bytes', 'Memory limit of a container'),
+        'memory_utilization': MetricFamily('dcos_container_mem_utilization_percent', 'Memory used / allocated'),
+    }
+    for hostname in sorted(samples):
+        if samples[hostname] is None:
+            continue
+        data_start = samples[hostname][0]
+        data_end = samples[hostname][-1]
+        for executor in sorted(data_end):
+            container = data_end[executor]
+            labels = {'hostname': hostname, 'executor_id': executor,
+                      'framework_id': container.get('framework_id', '')}
+            single_data_point = executor not in data_start or data_start is data_end
+            start = container if single_data_point else data_start[executor]
+            stats = calculate_container_stats(start['statistics'], container['statistics'])
+            for key, family in families.items():
+                # CPU usage needs two samples, taken at different times
+                if stats[key] is None or single_data_point and key in ('cpus_used', 'cpus_utilization'):
+                    continue
+                family.add(labels, stats[key])
+    return [families[key] for key in ('cpus_used', 'cpus_allocated', 'cpus_utilization',
+                                      'memory_used', 'memory_allocated', 'memory_utilization')]
+
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value):
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+# text exposition format (version 0.0.4)
+def render(families):
+    lines = []
+    for family in families:
+        lines.append("# HELP {0} {1}".format(family.name, family.help_text))
+        lines.append("# TYPE {0} gauge".format(family.name))
+        for labels, value in family.samples:
+            if labels:
+                label_text = ','.join('{0}="{1}"'.format(k, escape_label_value(labels[k])) for k in sorted(labels))
+                lines.append("{0}{{{1}}} {2}".format(family.name, label_text, format_value(value)))
+            else:
+                lines.append("{0} {1}".format(family.name, format_value(value)))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,226 @@
+"""memory-lean form of the /slaves and /state.json payloads
+
+Parsed JSON repeats the same role names, ids, hostnames, resource names and
+label keys on every agent and task, and every object is a dict of its own.
+compact() rebuilds a payload with its strings interned (shared between
+objects, and between payloads of several clusters or snapshots) and every
+object turned into a slotted record: one class per set of keys, whose
+instances only hold the values.  What the object was is in the record's
+type, picked by the field it came from:
+
+    {'slaves': [Agent, ...]}
+    {'frameworks': [Framework{'tasks': [Task{'statuses': [TaskStatus, ...]}, ...]}, ...]}
+    ... {'ranges': {'range': [ResourceRange, ...]}, 'reservation': Reservation} ...
+
+Records read like the dicts they replace (record['id'], record.get('role'),
+'labels' in record, items(), ...), so the reports don't need to know which
+form they were handed, but they can't be changed.  The top-level document
+stays a dict.  plain() turns records back into dicts for json.dumps.
+"""
+import gc
+import threading
+from operator import attrgetter
+from sys import intern
+
+# objects with more keys (or once there are this many shapes) stay dicts,
+# they are maps keyed by something like a role or an id rather than records
+MAX_FIELDS = 64
+MAX_SHAPES = 4096
+
+
+class Record(object):
+    """one JSON object, its keys are in its class"""
+    __slots__ = ()
+    # the keys, in payload order
+    _fields = ()
+    # key -> attrgetter of the slot holding its value
+    _getters = {}
+    # record type of the objects under each key
+    _kinds = []
+
+    def __getitem__(self, key):
+        return self._getters[key](self)
+
+    def get(self, key, default=None):
+        getter = self._getters.get(key)
+        return default if getter is None else getter(self)
+
+    def __contains__(self, key):
+        return key in self._getters
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def keys(self):
+        return list(self._fields)
+
+    def values(self):
+        return [getattr(self, slot) for slot in self.__slots__]
+
+    def items(self):
+        return list(zip(self._fields, self.values()))
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = dict(other.items())
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{0}({1!r})".format(type(self).__name__, dict(self.items()))
+
+
+class Agent(Record):
+    __slots__ = ()
+
+
+class Framework(Record):
+    __slots__ = ()
+
+
+class Task(Record):
+    __slots__ = ()
+
+
+class TaskStatus(Record):
+    __slots__ = ()
+
+
+class Reservation(Record):
+    __slots__ = ()
+
+
+class ResourceRange(Record):
+    __slots__ = ()
+
+
+# record type of the objects in (or under) a field
+KINDS = {
+    'slaves': Agent,
+    'frameworks': Framework,
+    'completed_frameworks': Framework,
+    'unregistered_frameworks': Framework,
+    'tasks': Task,
+    'completed_tasks': Task,
+    'unreachable_tasks': Task,
+    'statuses': TaskStatus,
+    'reservation': Reservation,
+    'reservations': Reservation,
+    'range': ResourceRange,
+}
+
+
+# values _compact rebuilds, strings are interned and anything else is kept
+CONTAINERS = frozenset([list, dict])
+
+
+def _slots(count):
+    return tuple('_{0}'.format(i) for i in range(count))
+
+
+# (kind, keys) -> record class
+_shapes = {}
+_shapes_lock = threading.Lock()
+
+
+def record_class(kind, fields):
+    """the record class of `kind` objects with exactly `fields`, None when
+    objects like that are better left as dicts"""
+    cls = _shapes.get((kind, fields))
+    if cls is not None or not fields or len(fields) > MAX_FIELDS:
+        return cls
+    with _shapes_lock:
+        cls = _shapes.get((kind, fields))
+        if cls is None and len(_shapes) < MAX_SHAPES:
+            slots = _slots(len(fields))
+            # the constructor sets every slot, like namedtuple's it is generated
+            source = "def __init__(self, {0}):\n    {1}\n".format(
+                ', '.join(slots), '\n    '.join("self.{0} = {0}".format(slot) for slot in slots))
+            namespace = {}
+            exec(source, namespace)
+            fields = tuple(map(intern, fields))
+            cls = type(kind.__name__, (kind,), {
+                '__slots__': slots,
+                '__init__': namespace['__init__'],
+                '_fields': fields,
+                '_getters': {field: attrgetter(slot) for field, slot in zip(fields, slots)},
+                '_kinds': [KINDS.get(field, Record) for field in fields],
+            })
+            _shapes[(kind, fields)] = cls
+    return cls
+
+
+def _compact(value, kind, records):
+    value_type = type(value)
+    if value_type is str:
+        return intern(value)
+    if value_type is list:
+        return [intern(item) if type(item) is str else
+                _compact(item, kind, records) if type(item) in CONTAINERS else item for item in value]
+    if value_type is not dict:
+        # numbers, booleans, None and records that are compact already
+        return value
+
+    fields = tuple(value)
+    cls = (_shapes.get((kind, fields)) or record_class(kind, fields)) if records else None
+    kinds = cls._kinds if cls is not None else [KINDS.get(field, Record) for field in fields]
+    values = [intern(item) if type(item) is str else
+              _compact(item, item_kind, records) if type(item) in CONTAINERS else item
+              for item, item_kind in zip(value.values(), kinds)]
+    if cls is None:
+        return dict(zip(map(intern, fields), values))
+    return cls(*values)
+
+
+# compact() calls running at the same time (the clusters of a fleet are
+# loaded on threads of their own), the collector is switched back on when
+# the last of them is done, and only if it was on before the first
+_paused_lock = threading.Lock()
+_paused = 0
+_collecting = False
+
+
+def _pause_collection():
+    global _paused, _collecting
+    with _paused_lock:
+        if _paused == 0:
+            _collecting = gc.isenabled()
+            gc.disable()
+        _paused += 1
+
+
+def _resume_collection():
+    global _paused
+    with _paused_lock:
+        _paused -= 1
+        if _paused == 0 and _collecting:
+            gc.enable()
+
+
+def compact(document, records=True):
+    """`document` with its strings interned and, unless records is False, its
+    objects below the top level turned into records"""
+    # nothing built here can be part of a cycle, collecting while millions of
+    # records are made only slows it down
+    _pause_collection()
+    try:
+        if type(document) is not dict:
+            return _compact(document, Record, records)
+        return {intern(field): _compact(value, KINDS.get(field, Record), records)
+                for field, value in document.items()}
+    finally:
+        _resume_collection()
+
+
+def plain(value):
+    """a record as a dict, for json.dumps(..., default=plain)"""
+    if isinstance(value, Record):
+        return dict(value.items())
+    raise TypeError("{0!r} is not JSON serializable".format(value))
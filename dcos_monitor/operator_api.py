@@ -0,0 +1,210 @@
+"""client for the event stream of the Mesos v1 operator API
+
+A SUBSCRIBE call (POST /api/v1 {"type": "SUBSCRIBE"}) is answered with a
+never ending RecordIO stream, every record is "<length>\\n<JSON event>":
+
+    SUBSCRIBED          the whole cluster (agents, frameworks, executors,
+                        tasks) as the first event
+    TASK_ADDED          a task was launched
+    TASK_UPDATED        a task changed state
+    AGENT_ADDED         an agent registered
+    AGENT_REMOVED       an agent went away
+    FRAMEWORK_ADDED, FRAMEWORK_UPDATED, FRAMEWORK_REMOVED, HEARTBEAT
+
+v1 messages differ from what /slaves and /state.json return (ids are
+{"value": ..}, attributes and resources are lists), the *_v0 functions
+convert them so the reports can read them like polled data, see
+cluster_model.py.
+"""
+import json
+
+from dcos_monitor.transport import master_url, transport
+
+CHUNK_SIZE = 1 << 16
+# the master sends a HEARTBEAT every 15 seconds
+READ_TIMEOUT = 60
+
+SCALARS = ('cpus', 'mem', 'disk', 'gpus')
+
+
+# the records of a RecordIO stream given as an iterable of byte chunks
+def read_records(chunks):
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer.extend(chunk)
+        while True:
+            newline = buffer.find(b'\n')
+            if newline < 0:
+                break
+            end = newline + 1 + int(buffer[:newline])
+            if len(buffer) < end:
+                break
+            yield bytes(buffer[newline + 1:end])
+            del buffer[:end]
+    if buffer.strip():
+        raise ValueError("RecordIO stream ended in the middle of a record")
+
+
+def read_file(fp):
+    return read_records(iter(lambda: fp.read(CHUNK_SIZE), b''))
+
+
+def encode_record(event):
+    body = json.dumps(event).encode('utf-8')
+    return str(len(body)).encode('ascii') + b'\n' + body
+
+
+# events of a SUBSCRIBE call to `master`, until the connection drops
+def subscribe(master, connect_timeout=None, read_timeout=READ_TIMEOUT):
+    response = transport.post(master_url(master, '/api/v1'),
+                              timeout=(connect_timeout or transport.connect_timeout, read_timeout),
+                              json={'type': 'SUBSCRIBE'},
+                              headers={'Accept': 'application/json'},
+                              stream=True)
+    try:
+        response.raise_for_status()
+        for record in read_records(response.iter_content(chunk_size=None)):
+            yield json.loads(record.decode('utf-8'))
+    finally:
+        response.close()
+
+
+#
+# v1 -> v0
+#
+
+def value(message_id):
+    return message_id['value'] if message_id else None
+
+
+# [{'begin': 1, 'end': 3}, {'begin': 4, 'end': 5}] -> '[1-5]'
+def ranges_string(ranges):
+    merged = []
+    for r in sorted(ranges, key=lambda r: r['begin']):
+        if merged and r['begin'] <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], r['end'])
+        else:
+            merged.append([r['begin'], r['end']])
+    return '[' + ', '.join('{0}-{1}'.format(begin, end) for begin, end in merged) + ']'
+
+
+# v1 Resource -> v0 *_resources_full item: the role it is reserved to (or
+# '*') in `role`, a dynamic reservation in `reservation`
+def resource_v0(item):
+    item = dict(item)
+    reservations = item.get('reservations')
+    if 'role' not in item:
+        item['role'] = reservations[-1]['role'] if reservations else '*'
+    if reservations and 'reservation' not in item and reservations[-1].get('type') == 'DYNAMIC':
+        item['reservation'] = {field: reservations[-1][field]
+                               for field in ('principal', 'labels') if field in reservations[-1]}
+    return item
+
+
+# v0 resource items -> {'cpus': 1.0, ..., 'ports': '[31000-32000]'}
+def resources_dict(items):
+    amounts = dict.fromkeys(SCALARS, 0.0)
+    ranges = {}
+    for item in items:
+        if item['type'] == 'SCALAR':
+            amounts[item['name']] = amounts.get(item['name'], 0.0) + item['scalar']['value']
+        elif item['type'] == 'RANGES':
+            ranges.setdefault(item['name'], []).extend(item['ranges']['range'])
+    for name, rs in ranges.items():
+        amounts[name] = ranges_string(rs)
+    return amounts
+
+
+def attribute_value(attribute):
+    kind = attribute['type']
+    if kind == 'SCALAR':
+        return attribute['scalar']['value']
+    if kind == 'RANGES':
+        return ranges_string(attribute['ranges']['range'])
+    if kind == 'SET':
+        return '{' + ','.join(attribute['set']['item']) + '}'
+    return attribute['text']['value']
+
+
+def agent_v0(agent):
+    info = agent['agent_info']
+    total = [resource_v0(item) for item in agent.get('total_resources', info.get('resources', []))]
+    offered = [resource_v0(item) for item in agent.get('offered_resources', [])]
+    allocated = [resource_v0(item) for item in agent.get('allocated_resources', [])]
+
+    reserved_full = {}
+    unreserved_full = []
+    for item in total:
+        if item['role'] == '*':
+            unreserved_full.append(item)
+        else:
+            reserved_full.setdefault(item['role'], []).append(item)
+
+    return {
+        'id': value(info['id']),
+        'hostname': info['hostname'],
+        'port': info.get('port', 5051),
+        'pid': agent.get('pid'),
+        'active': agent.get('active', True),
+        'version': agent.get('version'),
+        'registered_time': agent.get('registered_time', {}).get('nanoseconds', 0) / 1e9,
+        'capabilities': [c['type'] for c in agent.get('capabilities', [])],
+        'attributes': {a['name']: attribute_value(a) for a in info.get('attributes', [])},
+        'resources': resources_dict(total),
+        'reserved_resources': {role: resources_dict(items) for role, items in reserved_full.items()},
+        'reserved_resources_full': reserved_full,
+        'unreserved_resources': resources_dict(unreserved_full),
+        'unreserved_resources_full': unreserved_full,
+        'offered_resources': resources_dict(offered),
+        'offered_resources_full': offered,
+        'used_resources': resources_dict(allocated),
+        'used_resources_full': allocated,
+    }
+
+
+def framework_v0(framework):
+    info = framework['framework_info']
+    roles = info.get('roles') or [info.get('role', '*')]
+    return {
+        'id': value(info['id']),
+        'name': info['name'],
+        'user': info.get('user'),
+        'role': info.get('role', roles[0]),
+        'roles': roles,
+        'principal': info.get('principal'),
+        'hostname': info.get('hostname'),
+        'webui_url': info.get('webui_url'),
+        'capabilities': [c['type'] for c in info.get('capabilities', [])],
+        'active': framework.get('active', True),
+        'connected': framework.get('connected', True),
+        'recovered': framework.get('recovered', False),
+        'registered_time': framework.get('registered_time', {}).get('nanoseconds', 0) / 1e9,
+    }
+
+
+def status_v0(status):
+    record = {field: status[field] for field in ('state', 'timestamp', 'healthy', 'container_status')
+              if field in status}
+    if 'labels' in status:
+        record['labels'] = status['labels'].get('labels', [])
+    return record
+
+
+def task_v0(task):
+    resources = [resource_v0(item) for item in task.get('resources', [])]
+    record = {
+        'id': value(task['task_id']),
+        'name': task['name'],
+        'framework_id': value(task['framework_id']),
+        'executor_id': value(task.get('executor_id')) or '',
+        'slave_id': value(task['agent_id']),
+        'state': task['state'],
+        'role': resources[0]['role'] if resources else '*',
+        'resources': resources_dict(resources),
+        'statuses': [status_v0(status) for status in task.get('statuses', [])],
+        'labels': task.get('labels', {}).get('labels', []),
+    }
+    for field in ('discovery', 'container', 'user'):
+        if field in task:
+            record[field] = task[field]
+    return record
@@ -0,0 +1,218 @@
+"""what-if placement of Marathon-style app specs on the agents of /slaves
+
+FreeResources works out, once per /slaves payload, what every agent has
+left of each resource: unreserved, and reserved for each role, from
+reserved_resources_full, used_resources_full and the port ranges.  They are
+kept as columns (one array per resource, a row per agent) like
+agent_table.py does, and the columns of the roles a spec accepts are added
+up once per set of roles.  Fitting a spec is then a handful of whole-column
+operations:
+
+    instances an agent can take = min over resources of (free // needed)
+
+run through map() over the columns rather than a Python loop per agent, so
+a few hundred specs a second can be tried against thousands of agents.
+
+Only resources are looked at: constraints, attributes and what is currently
+offered to other frameworks are not.
+"""
+from array import array
+from collections import namedtuple
+from itertools import repeat
+from operator import add, floordiv
+
+from dcos_monitor.aggregation import ClusterResources
+from dcos_monitor.ports import AgentPorts
+
+RESOURCES = ('cpus', 'mem', 'disk', 'gpus', 'ports')
+SCALARS = ('cpus', 'mem', 'disk', 'gpus')
+UNRESERVED = '*'
+
+# Mesos keeps scalars to three decimals, 1.0 // 0.1 would otherwise be 9
+EPSILON = 0.0005
+
+# the parts of slave_data FreeResources reads
+FREE_RESOURCES_FIELDS = {
+    'slaves': {
+        'id': True,
+        'hostname': True,
+        'resources': True,
+        'used_resources': True,
+        'reserved_resources_full': True,
+        'used_resources_full': True,
+    },
+}
+
+# the defaults Marathon gives an app
+DEFAULTS = {'cpus': 1.0, 'mem': 128.0, 'disk': 0.0, 'gpus': 0.0}
+
+
+class AppSpec(namedtuple('AppSpec', ['app_id', 'cpus', 'mem', 'disk', 'gpus', 'ports', 'roles', 'instances'])):
+    """what one instance of an app needs, the roles whose resources it may
+    use and how many instances are wanted"""
+
+    @classmethod
+    def from_marathon(cls, app):
+        """the spec of a Marathon app definition"""
+        roles = app.get('acceptedResourceRoles') or [UNRESERVED]
+        return cls(app.get('id'),
+                   float(app.get('cpus', DEFAULTS['cpus'])), float(app.get('mem', DEFAULTS['mem'])),
+                   float(app.get('disk', DEFAULTS['disk'])), float(app.get('gpus', DEFAULTS['gpus'])),
+                   port_count(app), tuple(roles), int(app.get('instances', 1)))
+
+    def needs(self):
+        return {'cpus': self.cpus, 'mem': self.mem, 'disk': self.disk, 'gpus': self.gpus, 'ports': self.ports}
+
+
+# host ports an instance of a Marathon app takes, apps listing none take none
+def port_count(app):
+    if app.get('portDefinitions') is not None:
+        return len(app['portDefinitions'])
+    if app.get('ports') is not None:
+        return len(app['ports'])
+    container = app.get('container') or {}
+    mappings = container.get('portMappings')
+    if mappings is None:
+        mappings = (container.get('docker') or {}).get('portMappings')
+    return sum(1 for mapping in mappings or () if mapping.get('hostPort') is not None)
+
+
+# the app definitions in a parsed Marathon document: an app, a list of
+# them, or a group with 'apps' and nested 'groups'
+def marathon_apps(document):
+    if isinstance(document, list):
+        for item in document:
+            for app in marathon_apps(item):
+                yield app
+        return
+    if 'apps' in document or 'groups' in document:
+        for app in document.get('apps') or ():
+            yield app
+        for group in document.get('groups') or ():
+            for app in marathon_apps(group):
+                yield app
+        return
+    yield document
+
+
+class Fit(object):
+    """where a spec fits
+
+    counts      instances each agent can take, in the order of the agents
+    headroom    resource -> instances the cluster could take if only that
+                resource counted, the smallest one is what limits the spec
+    free        resource -> what the agents have free in the accepted roles
+    """
+
+    def __init__(self, spec, counts, headroom, free):
+        self.spec = spec
+        self.counts = counts
+        self.headroom = headroom
+        self.free = free
+        self.total = int(sum(counts))
+        self.agents = len(counts) - counts.count(0.0)
+
+    @property
+    def fits(self):
+        return self.total >= self.spec.instances
+
+    # resources the cluster-wide headroom is smallest for
+    def limited_by(self):
+        least = min(self.headroom.values())
+        return [resource for resource in RESOURCES if self.headroom.get(resource) == least]
+
+
+class FreeResources(object):
+    """free resources of every agent, unreserved and by role
+
+    unreserved      resource -> array of what each agent has free unreserved
+    reserved        role -> {row: {resource: free}} for the agents with a
+                    reservation for that role
+    """
+
+    def __init__(self, slaves, resources=None):
+        resources = ClusterResources(slaves) if resources is None else resources
+        self.ids = [slave['id'] for slave in slaves]
+        self.hostnames = [slave['hostname'] for slave in slaves]
+        self.unreserved = {resource: array('d') for resource in RESOURCES}
+        self.reserved = {}
+        for row, slave in enumerate(slaves):
+            free = agent_free(slave, resources.agent(slave), AgentPorts(slave))
+            unreserved = free.pop(UNRESERVED)
+            for resource in RESOURCES:
+                self.unreserved[resource].append(unreserved[resource])
+            for role, amounts in free.items():
+                self.reserved.setdefault(role, {})[row] = amounts
+        # frozenset of roles -> resource -> array of free amounts, and the
+        # cluster-wide sums of those
+        self._pools = {}
+        self._totals = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def roles(self):
+        return sorted(self.reserved)
+
+    def pool(self, roles):
+        """resource -> array of what each agent has free in `roles` together,
+        EPSILON added"""
+        key = frozenset(roles)
+        pool = self._pools.get(key)
+        if pool is None:
+            if UNRESERVED in key:
+                pool = {resource: array('d', self.unreserved[resource]) for resource in RESOURCES}
+            else:
+                pool = {resource: array('d', bytes(8 * len(self))) for resource in RESOURCES}
+            for role in key:
+                for row, amounts in self.reserved.get(role, {}).items():
+                    for resource, amount in amounts.items():
+                        pool[resource][row] += amount
+            for resource in RESOURCES:
+                pool[resource] = array('d', map(add, pool[resource], repeat(EPSILON, len(self))))
+            self._pools[key] = pool
+            self._totals[key] = {resource: round(sum(pool[resource]) - EPSILON * len(self), 3)
+                                 for resource in RESOURCES}
+        return pool
+
+    def fit(self, spec):
+        """the Fit of `spec`"""
+        pool = self.pool(spec.roles)
+        needs = spec.needs()
+        columns = []
+        headroom = {}
+        for resource in RESOURCES:
+            if needs[resource] <= 0:
+                continue
+            column = list(map(floordiv, pool[resource], repeat(needs[resource], len(self))))
+            headroom[resource] = int(sum(column))
+            columns.append(column)
+        if not columns:
+            raise ValueError("{0} does not ask for any resources".format(spec.app_id or 'the app'))
+        counts = columns[0] if len(columns) == 1 else list(map(min, *columns))
+        return Fit(spec, counts, headroom, dict(self._totals[frozenset(spec.roles)]))
+
+
+# role -> resource -> free amount of one agent, UNRESERVED for what isn't
+# reserved; whatever is allocated to a role beyond its reservation on the
+# agent (or without one) comes out of the unreserved resources
+def agent_free(slave, agent, ports):
+    free = {}
+    totals = slave['resources']
+    for resource in SCALARS:
+        reserved = agent.reserved.amounts.get(resource, {})
+        allocated = agent.allocated.amounts.get(resource, {})
+        unreserved = totals.get(resource, 0.0) - sum(reserved.values())
+        for role, amount in allocated.items():
+            unreserved -= max(amount - reserved.get(role, 0.0), 0.0)
+        free.setdefault(UNRESERVED, {})[resource] = max(unreserved, 0.0)
+        for role, amount in reserved.items():
+            free.setdefault(role, {})[resource] = max(amount - allocated.get(role, 0.0), 0.0)
+
+    reserved_ports = None
+    for role, reserved in ports.reserved.items():
+        free.setdefault(role, {})['ports'] = float(reserved.difference(ports.used).count())
+        reserved_ports = reserved if reserved_ports is None else reserved_ports.union(reserved)
+    unreserved_ports = ports.free if reserved_ports is None else ports.free.difference(reserved_ports)
+    free.setdefault(UNRESERVED, {})['ports'] = float(unreserved_ports.count())
+    return free
@@ -0,0 +1,146 @@
+"""fetch state_data from the cheapest master endpoints that have what a command reads
+
+/state.json carries every agent, framework and task of the cluster and is
+expensive for a busy master to serialize.  Most commands read a few fields
+of the frameworks and their tasks, which the master also serves as:
+
+    /state-summary      frameworks without their tasks, with task counts
+    /frameworks         frameworks with all their fields and tasks
+    /tasks              tasks of all frameworks, paged with limit and offset
+
+plan() picks the endpoints for a command's projection and fetch_state()
+stitches their answers into the /state.json shape (frameworks with their
+`tasks`, `unreachable_tasks` and `completed_tasks`), projected the same way
+jsonstream would have projected /state.json.  Anything the endpoints can't
+provide, a command without a projection, and masters that don't answer the
+endpoints fall back to /state.json.
+"""
+import math
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from dcos_monitor import jsonstream
+from dcos_monitor.transport import master_url, transport
+
+# framework fields /state-summary has
+SUMMARY_FIELDS = frozenset(['id', 'name', 'pid', 'hostname', 'webui_url', 'active', 'connected',
+                            'recovered', 'capabilities', 'used_resources', 'offered_resources'])
+# per state task counts of a framework in /state-summary
+TASK_COUNTS = ('TASK_STAGING', 'TASK_STARTING', 'TASK_RUNNING', 'TASK_KILLING', 'TASK_FINISHED',
+               'TASK_KILLED', 'TASK_FAILED', 'TASK_LOST', 'TASK_ERROR', 'TASK_UNREACHABLE')
+# the framework fields /state.json lists tasks in
+TASK_LISTS = ('tasks', 'unreachable_tasks', 'completed_tasks')
+TERMINAL_STATES = frozenset(['TASK_FINISHED', 'TASK_FAILED', 'TASK_KILLED', 'TASK_LOST', 'TASK_ERROR',
+                             'TASK_DROPPED', 'TASK_GONE', 'TASK_GONE_BY_OPERATOR'])
+
+PAGE_SIZE = 1000
+MAX_WORKERS = 8
+
+# frameworks      '/state-summary' or '/frameworks'
+# framework       projection of a framework without its task lists
+# tasks           {task list: projection} of the task lists to page /tasks for
+Plan = namedtuple('Plan', ['frameworks', 'framework', 'tasks'])
+
+
+# the Plan for a state_data projection, None when only /state.json will do
+def plan(projection):
+    if not projection or set(projection) != {'frameworks'}:
+        return None
+    frameworks = projection['frameworks']
+    if frameworks is True:
+        return Plan('/frameworks', True, {})
+
+    framework = {field: sub for field, sub in frameworks.items() if field not in TASK_LISTS}
+    tasks = {field: sub for field, sub in frameworks.items() if field in TASK_LISTS}
+    if set(framework) <= SUMMARY_FIELDS:
+        return Plan('/state-summary', framework, tasks)
+    # /frameworks lists the tasks along with the frameworks
+    return Plan('/frameworks', frameworks, {})
+
+
+# which of TASK_LISTS /state.json would list a task in
+def task_list(task):
+    if task.get('state') == 'TASK_UNREACHABLE':
+        return 'unreachable_tasks'
+    if task.get('state') in TERMINAL_STATES:
+        return 'completed_tasks'
+    return 'tasks'
+
+
+def fetch_state(master, projection=None, timeout=None, planned=True, page_size=PAGE_SIZE,
+                max_workers=MAX_WORKERS, log=None):
+    steps = plan(projection) if planned else None
+    if steps is not None:
+        try:
+            return fetch_planned(master, steps, timeout, page_size, max_workers)
+        except (requests.exceptions.HTTPError, ValueError, KeyError) as e:
+            # older masters don't have all the endpoints
+            if log is not None:
+                log.debug("{0}: falling back to /state.json ({1})".format(master, e))
+    return transport.get_json(master_url(master, '/state.json'), timeout=timeout, projection=projection)
+
+
+def fetch_planned(master, steps, timeout, page_size=PAGE_SIZE, max_workers=MAX_WORKERS):
+    if steps.frameworks == '/frameworks':
+        frameworks = transport.get_json(master_url(master, '/frameworks'), timeout=timeout,
+                                        projection={'frameworks': steps.framework})
+        return {'frameworks': frameworks['frameworks']}
+
+    counts = {count: True for count in TASK_COUNTS} if steps.tasks else {}
+    summary = transport.get_json(master_url(master, '/state-summary'), timeout=timeout,
+                                 projection={'frameworks': jsonstream.merge(steps.framework, {'id': True}, counts)})
+    frameworks = [jsonstream.project(framework, steps.framework) for framework in summary['frameworks']]
+    if not steps.tasks:
+        return {'frameworks': frameworks}
+
+    expected = sum(framework.get(count, 0) for framework in summary['frameworks'] for count in TASK_COUNTS)
+    tasks = fetch_tasks(master, jsonstream.merge(*steps.tasks.values()), expected, timeout, page_size, max_workers)
+
+    by_id = {}
+    for summarized, framework in zip(summary['frameworks'], frameworks):
+        for field in steps.tasks:
+            framework[field] = []
+        by_id[summarized['id']] = framework
+    for task in tasks:
+        framework = by_id.get(task['framework_id'])
+        field = task_list(task)
+        if framework is not None and field in steps.tasks:
+            framework[field].append(jsonstream.project(task, steps.tasks[field]))
+    return {'frameworks': frameworks}
+
+
+# All tasks, `page_size` at a time.  The first page shows how many tasks the
+# master sends per page (it may cap the limit), the rest of the pages the
+# summary's task counts call for are then fetched at once, and more after
+# them until one comes back short in case tasks were launched in the
+# meantime.  Tasks moving between pages while they are fetched show up once.
+def fetch_tasks(master, projection, expected, timeout=None, page_size=PAGE_SIZE, max_workers=MAX_WORKERS):
+    projection = {'tasks': jsonstream.merge(projection, {'id': True, 'framework_id': True, 'state': True})}
+
+    def page(offset):
+        url = master_url(master, '/tasks?order=asc&limit={0}&offset={1}'.format(page_size, offset))
+        return transport.get_json(url, timeout=timeout, projection=projection)['tasks']
+
+    results = [page(0)]
+    per_page = len(results[0])
+    if per_page == 0 or per_page < page_size and per_page >= expected:
+        return results[0]
+
+    pages = int(math.ceil(expected / float(per_page)))
+    if pages > 1:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, pages - 1))) as pool:
+            results += list(pool.map(page, [n * per_page for n in range(1, pages)]))
+    while len(results[-1]) == per_page:
+        results.append(page(len(results) * per_page))
+
+    seen = set()
+    tasks = []
+    for result in results:
+        for task in result:
+            key = (task['framework_id'], task['id'])
+            if key not in seen:
+                seen.add(key)
+                tasks.append(task)
+    return tasks
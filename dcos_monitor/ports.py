@@ -0,0 +1,154 @@
+"""parsed port ranges and a cluster-wide index over them
+
+Port sets are kept as sorted, merged, inclusive (begin, end) intervals with
+the begins in a separate list, so "is port N in here" is a bisect instead of
+expanding ranges into individual ports.
+"""
+from bisect import bisect_right
+
+
+class PortSet(object):
+
+    def __init__(self, intervals=()):
+        merged = []
+        for begin, end in sorted(intervals):
+            if merged and begin <= merged[-1][1] + 1:
+                if end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((begin, end))
+        self.intervals = merged
+        self.begins = [begin for begin, _ in merged]
+
+    # "[1025-2180, 2182-3887]" as found in the 'resources' blocks of /slaves
+    @classmethod
+    def parse(cls, text):
+        intervals = []
+        for port_range in (text or '').strip().strip('[]').split(','):
+            port_range = port_range.strip()
+            if not port_range:
+                continue
+            begin, _, end = port_range.partition('-')
+            intervals.append((int(begin), int(end or begin)))
+        return cls(intervals)
+
+    # [{'begin': 1025, 'end': 2180}, ...] as found in the *_resources_full blocks
+    @classmethod
+    def from_ranges(cls, ranges):
+        return cls((r['begin'], r['end']) for r in ranges)
+
+    def __contains__(self, port):
+        i = bisect_right(self.begins, port) - 1
+        return i >= 0 and self.intervals[i][1] >= port
+
+    def __iter__(self):
+        return iter(self.intervals)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __eq__(self, other):
+        return isinstance(other, PortSet) and self.intervals == other.intervals
+
+    def __repr__(self):
+        return "PortSet({0})".format(self)
+
+    def __str__(self):
+        return "[{0}]".format(', '.join("{0}-{1}".format(b, e) for b, e in self.intervals))
+
+    def count(self):
+        return sum(end - begin + 1 for begin, end in self.intervals)
+
+    def union(self, other):
+        return PortSet(self.intervals + other.intervals)
+
+    def difference(self, other):
+        result = []
+        others = other.intervals
+        j = 0
+        for begin, end in self.intervals:
+            while j < len(others) and others[j][1] < begin:
+                j += 1
+            k = j
+            while begin <= end and k < len(others) and others[k][0] <= end:
+                if others[k][0] > begin:
+                    result.append((begin, others[k][0] - 1))
+                begin = max(begin, others[k][1] + 1)
+                k += 1
+            if begin <= end:
+                result.append((begin, end))
+        return PortSet(result)
+
+    def longest_block(self):
+        return max([end - begin + 1 for begin, end in self.intervals] or [0])
+
+    # first port of a free run of `size` contiguous ports, or None
+    def find_block(self, size):
+        for begin, end in self.intervals:
+            if end - begin + 1 >= size:
+                return begin
+        return None
+
+
+def resources_by_role(resources_full, name='ports'):
+    by_role = {}
+    for item in resources_full:
+        if item['name'] == name and item['type'] == 'RANGES':
+            by_role.setdefault(item['role'], []).extend(item['ranges']['range'])
+    return {role: PortSet.from_ranges(ranges) for role, ranges in by_role.items()}
+
+
+class AgentPorts(object):
+    """total, reserved, allocated and free ports of one agent"""
+
+    def __init__(self, slave):
+        self.agent_id = slave['id']
+        self.hostname = slave['hostname']
+        self.total = PortSet.parse(slave['resources'].get('ports'))
+        self.used = PortSet.parse(slave['used_resources'].get('ports'))
+
+        reserved_full = []
+        for role in slave.get('reserved_resources_full', {}):
+            reserved_full += slave['reserved_resources_full'][role]
+        self.reserved = resources_by_role(reserved_full)
+        self.allocated = resources_by_role(slave.get('used_resources_full', []))
+
+        self.free = self.total.difference(self.used)
+        self.longest_free_block = self.free.longest_block()
+
+    # roles holding `port` on this agent
+    def holders(self, port):
+        return sorted(role for role, ports in self.allocated.items() if port in ports)
+
+    # roles `port` is reserved for on this agent
+    def reserved_for(self, port):
+        return sorted(role for role, ports in self.reserved.items() if port in ports)
+
+
+class PortIndex(object):
+    """port sets of every agent in a cluster"""
+
+    def __init__(self, slaves):
+        self.agents = [AgentPorts(slave) for slave in slaves]
+
+    def agents_with_free(self, port):
+        return [agent for agent in self.agents if port in agent.free]
+
+    # [(agent, [role, ...]), ...] for the agents where `port` is allocated
+    def holders(self, port):
+        found = []
+        for agent in self.agents:
+            if port in agent.used:
+                found.append((agent, agent.holders(port)))
+        return found
+
+    # up to `count` (agent, first port) pairs for agents with `size`
+    # contiguous free ports
+    def find_blocks(self, size, count):
+        found = []
+        for agent in self.agents:
+            if agent.longest_free_block >= size:
+                found.append((agent, agent.free.find_block(size)))
+                if len(found) == count:
+                    break
+        return found
@@ -0,0 +1,196 @@
+"""renderers the reports are written through
+
+Commands compute records (plain dicts) and hand them to a renderer, which
+decides what they look like:
+
+    text      the classic reports, every kind of record is formatted by a
+              function the command supplies, lines are written out in chunks
+    json      one document with a list of records per kind, written at the end
+    ndjson    one line per record, written and flushed as soon as it comes in
+    csv       one row per record (nested fields flattened), with a new header
+              whenever the kind of record changes
+
+Records keep maps with open-ended keys (roles, reservations) as lists of
+dicts so every record of a kind has the same fields.  A record can carry
+lists of child records (the containers of an agent, the VIPs of a
+framework), text and json keep them nested, ndjson and csv emit each child
+as a record of its own right after its parent.  Values taken from the
+payloads (port ranges, ...) may be model.py records, they are written like
+the dicts they stand for.
+"""
+import csv
+import json
+import sys
+
+from dcos_monitor.model import Record, plain
+
+FORMATS = ('text', 'json', 'ndjson', 'csv')
+
+
+def make_renderer(output, formatters, stream=None):
+    if output == 'text':
+        return TextRenderer(formatters, stream)
+    if output == 'json':
+        return JSONRenderer(stream)
+    if output == 'ndjson':
+        return NDJSONRenderer(stream)
+    if output == 'csv':
+        return CSVRenderer(stream)
+    raise ValueError("unknown output format {0}".format(output))
+
+
+class Renderer(object):
+
+    def __init__(self, stream=None):
+        self.stream = sys.stdout if stream is None else stream
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # `nested` maps fields holding child records to the kind of those records
+    def emit(self, kind, record, nested=None):
+        raise NotImplementedError
+
+    # a section title, only the text report has those
+    def heading(self, title, blank=True):
+        pass
+
+    def close(self):
+        pass
+
+
+class TextRenderer(Renderer):
+
+    # lines kept before they are written out
+    CHUNK = 4096
+
+    def __init__(self, formatters, stream=None):
+        super(TextRenderer, self).__init__(stream)
+        self.formatters = formatters
+        self.lines = []
+
+    def emit(self, kind, record, nested=None):
+        self.formatters[kind](self, record)
+
+    def heading(self, title, blank=True):
+        self.separator()
+        self.line(title)
+        self.separator()
+        if blank:
+            self.line()
+
+    # same as print(' ' * indent + text)
+    def line(self, text='', indent=0):
+        self.lines.append(' ' * indent + text if indent else text)
+        if len(self.lines) >= self.CHUNK:
+            self.flush()
+
+    # same as util.print_separator
+    def separator(self, length=80, k='=', spaces=0):
+        self.line(k * length, spaces)
+
+    def flush(self):
+        if self.lines:
+            self.stream.write('\n'.join(self.lines))
+            self.stream.write('\n')
+            self.lines = []
+
+    def close(self):
+        self.flush()
+
+
+class JSONRenderer(Renderer):
+
+    def __init__(self, stream=None):
+        super(JSONRenderer, self).__init__(stream)
+        self.records = {}
+
+    def emit(self, kind, record, nested=None):
+        self.records.setdefault(kind, []).append(record)
+
+    def close(self):
+        json.dump(self.records, self.stream, indent=2, default=plain)
+        self.stream.write('\n')
+
+
+class Labelled(Renderer):
+    """passes records on to another renderer with some fields added to them
+    (and to their children), e.g. the cluster in a multi-cluster report"""
+
+    def __init__(self, renderer, **fields):
+        self.renderer = renderer
+        self.fields = fields
+
+    def emit(self, kind, record, nested=None):
+        record = self.label(record)
+        for field in nested or ():
+            if record.get(field):
+                record[field] = [self.label(child) for child in record[field]]
+        self.renderer.emit(kind, record, nested)
+
+    def heading(self, title, blank=True):
+        self.renderer.heading(title, blank)
+
+    def label(self, record):
+        labelled = dict(self.fields)
+        labelled.update(record)
+        return labelled
+
+
+# (kind, record) for a record without its children, then for each child
+def split(kind, record, nested):
+    if not nested:
+        yield kind, record
+        return
+    yield kind, {field: value for field, value in record.items() if field not in nested}
+    for field, child_kind in nested.items():
+        for child in record.get(field) or []:
+            yield child_kind, child
+
+
+class NDJSONRenderer(Renderer):
+
+    def emit(self, kind, record, nested=None):
+        for kind, record in split(kind, record, nested):
+            line = {'type': kind}
+            line.update(record)
+            self.stream.write(json.dumps(line, default=plain))
+            self.stream.write('\n')
+        self.stream.flush()
+
+
+# {'a': {'b': 1}, 'c': [1, 2]} -> {'a.b': 1, 'c': '[1, 2]'}
+def flatten(record, prefix=''):
+    row = {}
+    for field, value in record.items():
+        if isinstance(value, (dict, Record)):
+            row.update(flatten(value, prefix + field + '.'))
+        elif isinstance(value, list):
+            row[prefix + field] = json.dumps(value, default=plain)
+        else:
+            row[prefix + field] = value
+    return row
+
+
+class CSVRenderer(Renderer):
+
+    def __init__(self, stream=None):
+        super(CSVRenderer, self).__init__(stream)
+        self.writer = csv.writer(self.stream)
+        self.kind = None
+        self.columns = None
+
+    def emit(self, kind, record, nested=None):
+        for kind, record in split(kind, record, nested):
+            row = flatten(record)
+            if kind != self.kind or any(column not in self.columns for column in row):
+                if self.kind is not None:
+                    self.writer.writerow([])
+                self.kind = kind
+                self.columns = ['type'] + list(row)
+                self.writer.writerow(self.columns)
+            row['type'] = kind
+            self.writer.writerow([row.get(column, '') for column in self.columns])
@@ -0,0 +1,200 @@
+"""container statistics over a window of samples
+
+collect_statistics keeps every /monitor/statistics.json an agent returns,
+which is fine for the two samples the classic report compares.  A Sampler
+instead keeps the handful of counters the window report reads in a ring
+buffer of doubles per executor, `capacity` samples deep, and summarizes
+them as min / avg / p95 / max:
+
+    cpus_used           CPU time used per second between two samples
+    memory_used         resident memory at every sample (bytes)
+    net_rx_rate         received / sent bytes per second
+    net_tx_rate
+    disk_read_rate      read / written bytes per second (blkio statistics)
+    disk_write_rate
+
+Containers that start or go away in the middle of the window are summarized
+over the samples they were in and flagged as such.
+"""
+import math
+from array import array
+
+# what is kept of a sample, in this order
+FIELDS = ('timestamp', 'cpus_time_secs', 'cpus_limit', 'mem_rss_bytes', 'mem_limit_bytes',
+          'net_rx_bytes', 'net_tx_bytes', 'disk_read_bytes', 'disk_write_bytes')
+WIDTH = len(FIELDS)
+TIMESTAMP, CPUS_TIME, CPUS_LIMIT, MEM_RSS, MEM_LIMIT, NET_RX, NET_TX, DISK_READ, DISK_WRITE = range(WIDTH)
+
+# counters turned into per second rates: record field -> sample field
+RATES = [('cpus_used', CPUS_TIME), ('net_rx_rate', NET_RX), ('net_tx_rate', NET_TX),
+         ('disk_read_rate', DISK_READ), ('disk_write_rate', DISK_WRITE)]
+# the record fields with a min / avg / p95 / max summary
+WINDOW_FIELDS = ['cpus_used', 'memory_used', 'net_rx_rate', 'net_tx_rate', 'disk_read_rate', 'disk_write_rate']
+
+NAN = float('nan')
+
+
+def number(statistics, field):
+    value = statistics.get(field)
+    return NAN if value is None else float(value)
+
+
+# (read, written) bytes of a container's blkio statistics, the entry without
+# a device is the total over all devices
+def disk_bytes(statistics):
+    blkio = statistics.get('blkio_statistics') or {}
+    for kind in ('throttling', 'cfq_recursive', 'cfq'):
+        entries = blkio.get(kind) or []
+        totals = [entry for entry in entries if 'device' not in entry] or entries
+        if not totals:
+            continue
+        read = written = 0.0
+        for entry in totals:
+            for value in entry.get('io_service_bytes', []):
+                op = value.get('op', '').upper()
+                if op == 'READ':
+                    read += value.get('value', 0)
+                elif op == 'WRITE':
+                    written += value.get('value', 0)
+        return read, written
+    return NAN, NAN
+
+
+def sample_row(statistics):
+    read, written = disk_bytes(statistics)
+    return (number(statistics, 'timestamp'),
+            number(statistics, 'cpus_user_time_secs') + number(statistics, 'cpus_system_time_secs'),
+            number(statistics, 'cpus_limit'),
+            number(statistics, 'mem_rss_bytes'),
+            number(statistics, 'mem_limit_bytes'),
+            number(statistics, 'net_rx_bytes'),
+            number(statistics, 'net_tx_bytes'),
+            read,
+            written)
+
+
+# usage and limits of a container between two samples, what the classic
+# report, top and the exporter show; the CPU fields are None when both
+# samples were taken at the same time
+def calculate_container_stats(start, end):
+    stats = {}
+
+    timestamp_delta = end['timestamp'] - start['timestamp']
+
+    stats['memory_allocated'] = end['mem_limit_bytes']
+    stats['memory_used'] = end['mem_rss_bytes']
+    stats['memory_utilization'] = 100.0 * end['mem_rss_bytes'] / end['mem_limit_bytes']
+
+    cpus_time_delta = (end['cpus_system_time_secs'] + end['cpus_user_time_secs']
+                       - start['cpus_system_time_secs'] - start['cpus_user_time_secs'])
+    stats['cpus_allocated'] = end['cpus_limit']
+    # samples taken at the same time say nothing about the CPU usage
+    if timestamp_delta <= 0:
+        stats['cpus_used'] = None
+        stats['cpus_utilization'] = None
+        return stats
+    if(abs(cpus_time_delta) < 1e-12):
+        cpus_time_delta = 0
+    stats['cpus_used'] = float(cpus_time_delta / timestamp_delta)
+    stats['cpus_utilization'] = 100 * stats['cpus_used'] / stats['cpus_allocated']
+
+    return stats
+
+
+# nearest rank percentile of sorted values
+def percentile(ordered, p):
+    return ordered[max(0, int(math.ceil(p / 100.0 * len(ordered))) - 1)]
+
+
+def summarize(values):
+    ordered = sorted(value for value in values if not math.isnan(value))
+    if not ordered:
+        return None
+    return {'min': ordered[0], 'avg': sum(ordered) / len(ordered),
+            'p95': percentile(ordered, 95), 'max': ordered[-1]}
+
+
+class ContainerWindow(object):
+    """the last `capacity` samples of one container"""
+
+    __slots__ = ('capacity', 'count', 'first', 'last', 'values')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # samples added, the last `capacity` of them are kept
+        self.count = 0
+        # first and last sample number the container was in
+        self.first = None
+        self.last = None
+        self.values = array('d', [NAN]) * (capacity * WIDTH)
+
+    def add(self, n, statistics):
+        start = (self.count % self.capacity) * WIDTH
+        self.values[start:start + WIDTH] = array('d', sample_row(statistics))
+        self.count += 1
+        self.first = n if self.first is None else min(self.first, n)
+        self.last = n if self.last is None else max(self.last, n)
+
+    # the kept samples, oldest first (requests may come back out of order)
+    def rows(self):
+        kept = min(self.count, self.capacity)
+        rows = [self.values[i * WIDTH:(i + 1) * WIDTH] for i in range(kept)]
+        rows.sort(key=lambda row: row[TIMESTAMP])
+        return rows
+
+    def summary(self):
+        rows = self.rows()
+        rates = {field: [] for field, _ in RATES}
+        for before, after in zip(rows, rows[1:]):
+            elapsed = after[TIMESTAMP] - before[TIMESTAMP]
+            if not elapsed > 0:
+                continue
+            for field, column in RATES:
+                delta = after[column] - before[column]
+                # a restarted container starts its counters over
+                if delta >= 0:
+                    rates[field].append(delta / elapsed)
+
+        last = rows[-1]
+        record = {field: summarize(values) for field, values in rates.items()}
+        record['memory_used'] = summarize(row[MEM_RSS] for row in rows)
+        record['cpus_allocated'] = None if math.isnan(last[CPUS_LIMIT]) else last[CPUS_LIMIT]
+        record['memory_allocated'] = None if math.isnan(last[MEM_LIMIT]) else last[MEM_LIMIT]
+        record['samples'] = len(rows)
+        return record
+
+
+class Sampler(object):
+    """windows of the containers of every agent polled"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # hostname -> {executor id: ContainerWindow}, in the order containers showed up
+        self.agents = {}
+        # hostname -> (first, last) sample number the agent answered
+        self.answered = {}
+
+    # sample number `n` of an agent, its /monitor/statistics.json
+    def add(self, hostname, n, containers):
+        windows = self.agents.setdefault(hostname, {})
+        first, last = self.answered.get(hostname, (n, n))
+        self.answered[hostname] = (min(first, n), max(last, n))
+        for container in containers:
+            executor = container['executor_id']
+            if executor not in windows:
+                windows[executor] = ContainerWindow(self.capacity)
+            windows[executor].add(n, container.get('statistics', {}))
+
+    # one record per container of an agent, None if the agent never answered
+    def container_records(self, slave):
+        hostname = slave['hostname']
+        if hostname not in self.answered:
+            return None
+        first, last = self.answered[hostname]
+        records = []
+        for executor, window in self.agents[hostname].items():
+            record = {'agent_id': slave['id'], 'hostname': hostname, 'executor_id': executor,
+                      'appeared': window.first > first, 'disappeared': window.last < last}
+            record.update(window.summary())
+            records.append(record)
+        return records
@@ -0,0 +1,101 @@
+"""pre-parsed snapshot files, a faster stand-in for saved /slaves and /state.json
+
+`dcos_monitor convert` turns a JSON file into a snapshot that
+--slave_data_file and --state_data_file load without parsing any JSON.  Like
+the entries of cache.py the values are stored with marshal, each top-level
+field of the document as its own section behind a section table:
+
+    FORMAT  (magic and marshal version, one line)
+    table length (4 bytes, little endian)
+    table   (marshal of [[field, offset, length], ...], offsets past the table)
+    sections
+
+The file is memory-mapped and only the sections a projection asks for are
+unmarshalled, a command reading `frameworks` never touches the rest.
+"""
+import marshal
+import mmap
+import os
+import struct
+
+from dcos_monitor import jsonstream
+from dcos_monitor.model import compact
+
+MAGIC = b'DCOSMONS'
+FORMAT = MAGIC + str(marshal.version).encode('ascii') + b'\n'
+TABLE_LENGTH = struct.Struct('<I')
+
+
+def is_snapshot(path):
+    with open(path, 'rb') as snapshot_file:
+        return snapshot_file.read(len(MAGIC)) == MAGIC
+
+
+def write(data, path):
+    """write the parsed JSON document `data` (an object) to `path`"""
+    if not isinstance(data, dict):
+        raise ValueError("only JSON objects can be converted, got a {0}".format(type(data).__name__))
+
+    sections = [(field, marshal.dumps(value)) for field, value in data.items()]
+    table = []
+    offset = 0
+    for field, section in sections:
+        table.append([field, offset, len(section)])
+        offset += len(section)
+    table = marshal.dumps(table)
+
+    # write next to the target and rename it into place, like cache.py does
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as snapshot_file:
+            snapshot_file.write(FORMAT)
+            snapshot_file.write(TABLE_LENGTH.pack(len(table)))
+            snapshot_file.write(table)
+            for _, section in sections:
+                snapshot_file.write(section)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def load(path, projection=None):
+    """the document in the snapshot at `path`, keeping only `projection`"""
+    with open(path, 'rb') as snapshot_file:
+        with mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ) as snapshot:
+            header = snapshot.readline()
+            if not header.startswith(MAGIC):
+                raise ValueError("{0} is not a dcos_monitor snapshot".format(path))
+            version = header[len(MAGIC):].strip()
+            if not version.isdigit() or int(version) > marshal.version:
+                raise ValueError("{0} was written by a newer Python, convert it again".format(path))
+
+            table_length, = TABLE_LENGTH.unpack(snapshot.read(TABLE_LENGTH.size))
+            table = marshal.loads(snapshot.read(table_length))
+            start = snapshot.tell()
+
+            whole = projection is None or projection is True
+            data = {}
+            for field, offset, length in table:
+                if not whole and field not in projection:
+                    continue
+                value = marshal.loads(snapshot[start + offset:start + offset + length])
+                data[field] = value if whole else jsonstream.project(value, projection[field])
+            return data
+
+
+def load_file(path, projection=None):
+    """a --slave_data_file or --state_data_file, snapshot or plain JSON"""
+    if is_snapshot(path):
+        return load(path, projection)
+    with open(path) as json_file:
+        return jsonstream.load(json_file, projection)
+
+
+def convert(source, destination):
+    """write the JSON file (or older snapshot) `source` as a snapshot to `destination`"""
+    data = load_file(source)
+    # strings shared in memory are written once, and shared again when loaded
+    write(compact(data, records=False), destination)
+    return data
@@ -0,0 +1,134 @@
+"""lookups over the frameworks and tasks in state.json, built in one pass
+"""
+
+VIP_DOMAIN = "l4lb.thisdcos.directory"
+
+# the parts of state.json a TaskIndex reads (see jsonstream)
+TASK_INDEX_FIELDS = {
+    'frameworks': {
+        'id': True,
+        'name': True,
+        'tasks': {
+            'id': True,
+            'slave_id': True,
+            'state': True,
+            'discovery': True,
+            'statuses': {'state': True, 'container_status': True},
+        },
+    },
+}
+
+
+# (status, ip) of the first TASK_RUNNING status of a task, (None, None) if
+# it never got there
+def running_status(task):
+    for status in task.get('statuses', []):
+        if status.get('state') == 'TASK_RUNNING':
+            try:
+                ip = status['container_status']['network_infos'][0]['ip_addresses'][0]['ip_address']
+            except (KeyError, IndexError):
+                ip = None
+            return status, ip
+    return None, None
+
+
+# (vip, port number) for every VIP label on a task's discovery ports
+def task_vips(task):
+    for port in task.get('discovery', {}).get('ports', {}).get('ports', []):
+        # Who the hell came up with this structure?
+        for label in port.get('labels', {}).get('labels', []):
+            if 'VIP' in label['key']:
+                vip = label['value']
+                if vip[0] == '/':
+                    vip = vip[1:]
+                yield vip, port['number']
+
+
+# "name:port" as found in the VIP label -> name.framework.l4lb.thisdcos.directory:port
+def vip_address(vip, framework_name):
+    name, _, port = vip.rpartition(':')
+    return "{0}.{1}.{2}:{3}".format(name, framework_name, VIP_DOMAIN, port)
+
+
+# {vip: [(ip, port), ...]} for the running tasks in a list of tasks
+def aggregate_tasks_by_vip(tasks):
+    vips = {}
+    for task in tasks:
+        if task['state'] != 'TASK_RUNNING':
+            continue
+        ip = None
+        for vip, port in task_vips(task):
+            if ip is None:
+                # Need to get ip addess.  Again, terrible structure.
+                ip = running_status(task)[1]
+            vips.setdefault(vip, []).append((ip, port))
+    return vips
+
+
+class TaskIndex(object):
+    """frameworks, tasks and VIPs of a state.json, indexed by id
+
+    framework_ids       framework ids in state.json order
+    frameworks          framework id -> framework record
+    framework_tasks     framework id -> [task, ...]
+    tasks               task id -> task
+    running             task id -> (TASK_RUNNING status, ip) for running tasks
+    agent_tasks         agent id -> [task, ...]
+    framework_vips      framework id -> {vip: [(ip, port), ...]}
+    """
+
+    def __init__(self, state_data):
+        self.framework_ids = []
+        self.frameworks = {}
+        self.framework_tasks = {}
+        self.tasks = {}
+        self.running = {}
+        self.agent_tasks = {}
+        self.framework_vips = {}
+        # any spelling of a VIP -> [(framework id, vip), ...]
+        self.vip_names = {}
+
+        for framework in state_data.get('frameworks', []):
+            self.add_framework(framework)
+
+    def add_framework(self, framework):
+        framework_id = framework['id']
+        self.framework_ids.append(framework_id)
+        self.frameworks[framework_id] = framework
+        tasks = self.framework_tasks.setdefault(framework_id, [])
+        vips = self.framework_vips.setdefault(framework_id, {})
+
+        for task in framework.get('tasks', []):
+            tasks.append(task)
+            if 'id' in task:
+                self.tasks[task['id']] = task
+            if 'slave_id' in task:
+                self.agent_tasks.setdefault(task['slave_id'], []).append(task)
+            if task['state'] != 'TASK_RUNNING':
+                continue
+
+            status, ip = running_status(task)
+            if 'id' in task:
+                self.running[task['id']] = (status, ip)
+            for vip, port in task_vips(task):
+                if vip not in vips:
+                    vips[vip] = []
+                    self._add_vip_names(framework_id, framework.get('name', ''), vip)
+                vips[vip].append((ip, port))
+
+    def _add_vip_names(self, framework_id, framework_name, vip):
+        address = vip_address(vip, framework_name)
+        names = set([vip, vip.rpartition(':')[0], address, address.rpartition(':')[0]])
+        for name in names:
+            self.vip_names.setdefault(name, []).append((framework_id, vip))
+
+    # [(framework, vip, address, backends), ...] for a VIP given as in its
+    # label or fully qualified, with or without the port
+    def lookup_vip(self, name):
+        name = name.lstrip('/')
+        found = []
+        for framework_id, vip in self.vip_names.get(name, []):
+            framework = self.frameworks[framework_id]
+            found.append((framework, vip, vip_address(vip, framework.get('name', '')),
+                          self.framework_vips[framework_id][vip]))
+        return found
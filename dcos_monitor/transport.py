@@ -0,0 +1,255 @@
+"""the HTTP transport every request to masters, agents and Marathon goes through
+
+One requests session is shared by all threads.  Its adapter keeps a pool of
+up to `pool_size` connections per host (for up to `hosts` hosts), so
+repeated polls of the same agent or master reuse their connection.  Every
+request has a connect and a read timeout, GETs are retried with jittered
+exponential backoff on connection errors, timeouts and 502/503/504, bodies
+are requested gzipped, and the bytes on the wire and the time taken are
+counted per host.
+
+requests (and with it urllib3) is only imported when the first request is
+made, commands that never go out on the network start without it.
+"""
+import collections
+import logging
+import random
+import threading
+import time
+
+from dcos_monitor import jsonstream
+
+# statuses worth asking again for, the master or a proxy in front of it is busy
+RETRY_STATUSES = (502, 503, 504)
+
+
+# (errors worth retrying, connection errors that won't go away by asking again)
+def retry_errors():
+    import requests
+    from requests.packages.urllib3.exceptions import ProtocolError, ReadTimeoutError
+    # a body streamed into jsonstream raises urllib3's errors rather than requests' ones
+    return ((requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+             requests.exceptions.ChunkedEncodingError, ProtocolError, ReadTimeoutError),
+            (requests.exceptions.SSLError, requests.exceptions.ProxyError))
+
+# masters listen on 5050 unless a master is given as hostname:port
+MASTER_PORT = 5050
+
+
+# `path` on a master, on `port` unless the master is given as hostname:port;
+# port None is HTTP's own, where DC/OS's admin router serves /marathon
+def master_url(hostname, path, port=MASTER_PORT):
+    if hostname is None:
+        import socket
+        hostname = socket.gethostname()
+    if ':' not in hostname and port is not None:
+        hostname = "{0}:{1}".format(hostname, port)
+    return "http://{hostname}{path}".format(hostname=hostname, path=path)
+
+
+class HostStats(object):
+    """requests made to one host:port"""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        # compressed bytes as they came off the wire
+        self.bytes = 0
+        self.seconds = 0.0
+        self.slowest = 0.0
+
+
+class Transport(object):
+
+    def __init__(self, connect_timeout=5, read_timeout=30, retries=2, backoff=0.5,
+                 pool_size=32, hosts=256, log=None):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.log = log or logging.getLogger(__name__)
+        self.stats = collections.defaultdict(HostStats)
+        self._lock = threading.Lock()
+        self.pool_size = 0
+        self.hosts = 0
+        # see use_adapter, None is requests' HTTPAdapter
+        self.adapter_class = None
+        self.adapter_kwargs = {}
+        self._session = None
+        self.reserve(pool_size, hosts)
+
+    # the requests session, made on first use
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.packages.urllib3.exceptions import InsecureRequestWarning
+
+                # Disable auth InsecureRequestWarning
+                requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+                session = requests.Session()
+                # Hack to get working in proxy environment (basically ignores proxy)
+                session.trust_env = False
+                session.headers['Accept-Encoding'] = 'gzip'
+                self._mount(session)
+                self._session = session
+            return self._session
+
+    def configure(self, connect_timeout=None, read_timeout=None, retries=None, log=None):
+        if connect_timeout is not None:
+            self.connect_timeout = connect_timeout
+        if read_timeout is not None:
+            self.read_timeout = read_timeout
+        if retries is not None:
+            self.retries = retries
+        if log is not None:
+            self.log = log
+
+    # make room for `pool_size` concurrent requests to each of `hosts` hosts
+    def reserve(self, pool_size, hosts=None):
+        hosts = max(hosts or 0, self.hosts)
+        if pool_size <= self.pool_size and hosts <= self.hosts:
+            return
+        self.pool_size = max(pool_size, self.pool_size)
+        self.hosts = hosts
+        if self._session is not None:
+            self._mount(self._session)
+
+    # send every request through another HTTPAdapter, e.g. the ones of
+    # archive.py that record responses or replay them
+    def use_adapter(self, adapter_class, **kwargs):
+        self.adapter_class = adapter_class
+        self.adapter_kwargs = kwargs
+        if self._session is not None:
+            self._mount(self._session)
+
+    # requests are answered without going out on the network
+    @property
+    def offline(self):
+        return getattr(self.adapter_class, 'offline', False)
+
+    def _mount(self, session):
+        adapter_class = self.adapter_class
+        if adapter_class is None:
+            from requests.adapters import HTTPAdapter as adapter_class
+        adapter = adapter_class(pool_connections=self.hosts, pool_maxsize=self.pool_size, **self.adapter_kwargs)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+    # a number sets the read timeout (and caps the connect timeout)
+    def timeouts(self, timeout=None):
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        if isinstance(timeout, tuple):
+            return timeout
+        return (min(self.connect_timeout, timeout), timeout)
+
+    # read(response) of a GET of `url`, retried up to `retries` times.  The
+    # response is streamed so read can parse it as it comes in.
+    def get(self, url, read=None, timeout=None, retries=None, headers=None):
+        retries = self.retries if retries is None else retries
+        if read is None:
+            read = lambda response: response.content
+        host = self.host(url)
+        retried, not_retried = retry_errors()
+
+        attempt = 0
+        while True:
+            started = time.time()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeouts(timeout), stream=True)
+                try:
+                    if response.status_code in RETRY_STATUSES and attempt < retries:
+                        raise Retry("{0} {1}".format(response.status_code, response.reason))
+                    response.raise_for_status()
+                    result = read(response)
+                finally:
+                    response.close()
+            except (Retry,) + retried as e:
+                self.count(host, started, error=True)
+                if attempt >= retries or isinstance(e, not_retried):
+                    raise
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                self.log.debug("GET {0} failed ({1}), retrying in {2:.2f}s".format(url, e, delay))
+                attempt += 1
+                with self._lock:
+                    self.stats[host].retries += 1
+                time.sleep(delay)
+                continue
+            except Exception:
+                self.count(host, started, error=True)
+                raise
+
+            size = self.count(host, started, response=response)
+            self.log.debug("GET {0} -> {1}, {2} bytes in {3:.3f}s".format(
+                url, response.status_code, size, time.time() - started))
+            return result
+
+    def get_json(self, url, timeout=None, projection=None, retries=None, headers=None):
+        return self.get(url, lambda response: read_json(response, projection),
+                        timeout=timeout, retries=retries, headers=headers)
+
+    # not retried, a POST may not be safe to send twice
+    def post(self, url, timeout=None, **kwargs):
+        host = self.host(url)
+        started = time.time()
+        try:
+            response = self.session.post(url, timeout=self.timeouts(timeout), **kwargs)
+        except Exception:
+            self.count(host, started, error=True)
+            raise
+        self.count(host, started, response=response)
+        return response
+
+    def host(self, url):
+        from requests.packages.urllib3.util import parse_url
+        parsed = parse_url(url)
+        return "{0}:{1}".format(parsed.host, parsed.port or (443 if parsed.scheme == 'https' else 80))
+
+    # record a request, returns the bytes it read off the wire
+    def count(self, host, started, response=None, error=False):
+        elapsed = time.time() - started
+        size = 0
+        if response is not None:
+            try:
+                size = response.raw.tell()
+            except Exception:
+                size = len(response.content or b'')
+        with self._lock:
+            stats = self.stats[host]
+            stats.requests += 1
+            stats.errors += int(error)
+            stats.bytes += size
+            stats.seconds += elapsed
+            stats.slowest = max(stats.slowest, elapsed)
+        return size
+
+    # one line per host: requests, errors, retries, bytes and latency
+    def summary(self):
+        with self._lock:
+            stats = sorted(self.stats.items())
+        lines = []
+        for host, s in stats:
+            lines.append("{0}: {1} requests ({2} failed, {3} retries), {4} bytes, "
+                         "{5:.3f}s avg, {6:.3f}s max".format(
+                             host, s.requests, s.errors, s.retries, s.bytes,
+                             s.seconds / s.requests if s.requests else 0, s.slowest))
+        return lines
+
+
+class Retry(Exception):
+    pass
+
+
+def read_json(response, projection=None):
+    if projection is None:
+        return response.json()
+    # stream the body through the parser and only keep the projected fields
+    response.raw.decode_content = True
+    return jsonstream.load(response.raw, projection)
+
+
+# the transport of this process, see cli.cli for its options
+transport = Transport()
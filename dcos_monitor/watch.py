@@ -0,0 +1,96 @@
+"""support for --watch: keep polling the master and only recompute what changed
+"""
+import contextlib
+import io
+import json
+import sys
+import time
+import click
+from dcos_monitor.model import plain
+
+# the parts of an agent record the reports read, anything else changing
+# (offers, reregistration times, ...) doesn't invalidate an agent
+WATCHED_FIELDS = ('hostname', 'active', 'attributes', 'resources', 'used_resources',
+                  'reserved_resources_full', 'used_resources_full')
+
+
+def fingerprint(slave):
+    return hash(json.dumps([slave.get(field) for field in WATCHED_FIELDS], sort_keys=True, default=plain))
+
+
+class AgentWatcher(object):
+    """remembers compute(slave) per agent between polls and only calls it
+    again for agents whose record changed
+    """
+
+    def __init__(self, compute):
+        self.compute = compute
+        # agent id -> (fingerprint, result)
+        self.known = {}
+
+    # returns (ids of new/changed agents, ids of agents that went away)
+    def update(self, slaves):
+        changed = []
+        seen = set()
+        for slave in slaves:
+            seen.add(slave['id'])
+            current = fingerprint(slave)
+            known = self.known.get(slave['id'])
+            if known is None or known[0] != current:
+                self.known[slave['id']] = (current, self.compute(slave))
+                changed.append(slave['id'])
+
+        removed = [agent_id for agent_id in self.known if agent_id not in seen]
+        for agent_id in removed:
+            del self.known[agent_id]
+        return changed, removed
+
+    def result(self, agent_id):
+        return self.known[agent_id][1]
+
+
+# run func and return everything it printed
+def capture_output(func, *args, **kwargs):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        func(*args, **kwargs)
+    return output.getvalue()
+
+
+# Call redraw(slaves) with freshly polled agents every `interval` seconds
+# until interrupted.  Watching wants live data, so the snapshot cache is
+# bypassed.  A refresh that fails ends the run with status 1, as a one-shot
+# report that can't fetch its data does.
+def poll(ctx, interval, redraw):
+    ctx.cache = None
+    try:
+        while True:
+            started = time.time()
+            try:
+                slaves = ctx.reload('slave_data')['slaves']
+            except SystemExit:
+                # the fetchers log why they gave up
+                exit(1)
+            except Exception as e:
+                ctx.log.error("refreshing slave_data failed: {0}: {1}".format(type(e).__name__, e))
+                exit(1)
+            redraw(slaves)
+            sys.stdout.flush()
+            time.sleep(max(0, interval - (time.time() - started)))
+    except KeyboardInterrupt:
+        pass
+
+
+# On a terminal redraw the whole screen like watch(1) does, when piped only
+# the changed sections are written.
+def full_redraw():
+    return sys.stdout.isatty()
+
+
+def print_header(interval, changed, removed, total):
+    if full_redraw():
+        click.clear()
+    print("Every {interval}s: {now}    [{changed} of {total} agents changed, {removed} removed]".format(
+        interval=interval, now=time.strftime('%Y-%m-%d %H:%M:%S'),
+        changed=len(changed), removed=len(removed), total=total))
+    print("")
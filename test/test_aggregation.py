@@ -0,0 +1,140 @@
+"""reservation aggregation on the /slaves fixture with an unlabelled and a
+refined dynamic reservation added, and the print_full_status and role_data
+reports over it"""
+import json
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from dcos_monitor.aggregation import AgentResources, ClusterResources, reservation_label, reservation_name
+from dcos_monitor.cli import cli
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+AGENT = '10.0.3.124'
+
+
+def scalar(name, value, role, **reservation):
+    item = {'name': name, 'type': 'SCALAR', 'scalar': {'value': value}, 'role': role}
+    item.update(reservation)
+    return item
+
+
+def ports(begin, end, role, **reservation):
+    item = {'name': 'ports', 'type': 'RANGES', 'ranges': {'range': [{'begin': begin, 'end': end}]}, 'role': role}
+    item.update(reservation)
+    return item
+
+
+def labels(value):
+    return {'labels': [{'key': 'resource_id', 'value': value}]}
+
+
+# an unlabelled dynamic reservation (old field), a labelled one and a refined
+# one that only lists the stack of reservations
+RESERVED = {
+    'web': [
+        scalar('cpus', 0.5, 'web', reservation={'principal': 'web-principal'}),
+        scalar('mem', 256.0, 'web', reservation={'principal': 'web-principal', 'labels': labels('web-mem')}),
+        ports(20000, 20009, 'web', reservation={'principal': 'web-principal'}),
+    ],
+    'web/batch': [
+        scalar('cpus', 1.0, 'web/batch', reservations=[
+            {'role': 'web', 'type': 'DYNAMIC', 'principal': 'web-principal'},
+            {'role': 'web/batch', 'type': 'DYNAMIC', 'principal': 'batch-principal', 'labels': labels('batch-cpus')}]),
+        ports(21000, 21004, 'web/batch', reservations=[
+            {'role': 'web', 'type': 'DYNAMIC', 'principal': 'web-principal'},
+            {'role': 'web/batch', 'type': 'DYNAMIC', 'principal': 'batch-principal'}]),
+    ],
+}
+
+
+@pytest.fixture(scope='module')
+def slave_data():
+    with open(os.path.join(HERE, 'dev-mom_prod-mom_slave.json')) as f:
+        data = json.load(f)
+    slave = next(s for s in data['slaves'] if s['hostname'] == AGENT)
+    slave['reserved_resources_full'] = RESERVED
+    return data
+
+
+@pytest.fixture(scope='module')
+def slave_data_file(slave_data, tmp_path_factory):
+    path = tmp_path_factory.mktemp('aggregation') / 'slave.json'
+    path.write_text(json.dumps(slave_data))
+    return str(path)
+
+
+def agent(slave_data, hostname=AGENT):
+    return next(s for s in slave_data['slaves'] if s['hostname'] == hostname)
+
+
+def test_reservation_label():
+    assert reservation_label(RESERVED['web'][0]) is None
+    assert reservation_label(RESERVED['web'][1]) == 'web-mem'
+    assert reservation_label(RESERVED['web/batch'][0]) == 'batch-cpus'
+    assert reservation_label(RESERVED['web/batch'][1]) is None
+    assert reservation_label({'reservations': [{'role': 'slave_public', 'type': 'STATIC'}]}) is None
+    assert reservation_label({}) is None
+    assert reservation_name(None, 'web-principal') == 'web-principal'
+    assert reservation_name(None, None) == '-'
+    assert reservation_name('web-mem', 'web-principal') == 'web-mem'
+
+
+def test_reserved_breakdown(slave_data):
+    reserved = AgentResources(agent(slave_data)).reserved
+    assert reserved.amounts == {'cpus': {'web': 0.5, 'web/batch': 1.0}, 'mem': {'web': 256.0}}
+    assert reserved.ranges == {'ports': {'web': [{'begin': 20000, 'end': 20009}],
+                                         'web/batch': [{'begin': 21000, 'end': 21004}]}}
+    assert reserved.roles('cpus') == ['web', 'web/batch']
+    assert [(r.resource, r.role, r.resource_id, r.principal) for r in reserved.reservations] == [
+        ('cpus', 'web', None, 'web-principal'),
+        ('mem', 'web', 'web-mem', 'web-principal'),
+        ('ports', 'web', None, 'web-principal'),
+        ('cpus', 'web/batch', 'batch-cpus', 'batch-principal'),
+        ('ports', 'web/batch', None, 'batch-principal'),
+    ]
+    assert [r.amount for r in reserved.reservations_of('cpus', 'web/batch')] == [1.0]
+
+
+def test_static_reservations_are_not_listed(slave_data):
+    public = AgentResources(agent(slave_data, '10.0.6.22'))
+    assert public.reserved.roles('cpus') == ['slave_public']
+    assert public.reserved.reservations == []
+
+
+def test_cluster_resources_aggregate_each_agent_once(slave_data):
+    resources = ClusterResources(slave_data['slaves'])
+    first = list(resources)
+    assert len(first) == len(slave_data['slaves'])
+    assert all(a is b for a, b in zip(first, resources))
+
+
+def run(*args):
+    result = CliRunner().invoke(cli, list(args), catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_print_full_status(slave_data_file):
+    state_data_file = os.path.join(HERE, 'dev-mom_prod-mom_state.json')
+    output = run('--slave_data_file', slave_data_file, '--state_data_file', state_data_file, 'print_full_status')
+    assert "web-principal" in output
+    assert "batch-cpus" in output
+    assert "batch-principal" in output
+    records = [json.loads(line) for line in run('--slave_data_file', slave_data_file, '--state_data_file',
+                                                   state_data_file, '--output', 'ndjson',
+                                                   'print_full_status').splitlines()]
+    record = next(r for r in records if r.get('type') == 'agent' and r.get('hostname') == AGENT)
+    assert [r['resource_id'] for r in record['reservations']] == [None, 'web-mem', 'batch-cpus']
+    assert [r['principal'] for r in record['ports']['reservations']] == ['web-principal', 'batch-principal']
+
+
+def test_role_data(slave_data_file):
+    output = run('--slave_data_file', slave_data_file, 'role_data')
+    assert "web/batch" in output
+    records = [json.loads(line) for line in run('--slave_data_file', slave_data_file,
+                                                   '--output', 'ndjson', 'role_data').splitlines()]
+    roles = {r['role']: r for r in records if r.get('type') == 'role'}
+    cpus = next(r for r in roles['web/batch']['resources'] if r['resource'] == 'CPU')
+    assert cpus['reserved'] == 1.0
@@ -0,0 +1,96 @@
+"""record a run against the fake master into an archive and replay it: the
+reports come out the same offline, recorded samples are answered in order
+and anything that wasn't recorded is a 404"""
+import json
+import os
+import threading
+import zipfile
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+from click.testing import CliRunner
+
+from benchmarks.fake_master import FakeMaster, make_handler
+from dcos_monitor.archive import MANIFEST, Archive, ArchiveWriter, ReplayAdapter
+from dcos_monitor.cli import cli
+from dcos_monitor.transport import transport
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STATISTICS = 'http://10.0.3.124:5051/monitor/statistics.json'
+
+
+@pytest.fixture(autouse=True)
+def restore_adapter():
+    yield
+    transport.use_adapter(None)
+
+
+@pytest.fixture
+def master():
+    with open(os.path.join(HERE, 'dev-mom_prod-mom_slave.json')) as f:
+        slaves = json.load(f)
+    with open(os.path.join(HERE, 'dev-mom_prod-mom_state.json')) as f:
+        state = json.load(f)
+    fake = FakeMaster(slaves, state)
+
+    class Handler(make_handler(fake)):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield '127.0.0.1:{0}'.format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def run(*args):
+    result = CliRunner().invoke(cli, list(args), catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_round_trip(master, tmp_path):
+    archive = str(tmp_path / 'run.zip')
+    run('--master', master, '--no-cache', 'record', archive, '--no-container-stats')
+
+    with zipfile.ZipFile(archive) as recorded:
+        manifest = json.loads(recorded.read(MANIFEST).decode('utf-8'))
+    assert manifest['master'] == master
+    urls = {entry['url'].split('?')[0] for entry in manifest['entries']}
+    assert urls == {'http://{0}{1}'.format(master, path)
+                    for path in ('/slaves', '/state.json', '/marathon/v2/apps', '/marathon/v2/info')}
+    transport.use_adapter(None)
+
+    for command in (['role_data'], ['vip'], ['print_full_status'], ['print_marathon_apps']):
+        live = run('--master', master, '--no-cache', '--full-state', '--output', 'json', *command)
+        replayed = run('--replay', archive, '--output', 'json', *command)
+        assert json.loads(replayed) == json.loads(live), command
+        assert any(json.loads(live).values()), command
+
+
+def test_recorded_samples_are_answered_in_order(tmp_path):
+    path = str(tmp_path / 'samples.zip')
+    with ArchiveWriter(path, '10.0.6.89') as writer:
+        for n in range(2):
+            writer.add(STATISTICS, 200, json.dumps([{'executor_id': 'web.1', 'n': n}]).encode('utf-8'), 0.0, 0.1)
+    transport.use_adapter(ReplayAdapter, archive=Archive(path))
+    assert transport.offline
+    assert [transport.get_json(STATISTICS)[0]['n'] for _ in range(3)] == [0, 1, 1]
+    with pytest.raises(requests.exceptions.HTTPError):
+        transport.get_json('http://10.0.6.89:5050/slaves', retries=0)
+
+
+def test_archives_of_another_kind(tmp_path):
+    path = tmp_path / 'other.zip'
+    with zipfile.ZipFile(str(path), 'w') as other:
+        other.writestr('data.json', '{}')
+    with pytest.raises(ValueError):
+        Archive(str(path))
+
+    result = CliRunner().invoke(cli, ['--replay', str(path), 'role_data'])
+    assert result.exit_code == 2
+    assert 'has no manifest.json' in result.output
+    result = CliRunner().invoke(cli, ['--replay', str(path), '--master', '10.0.6.89', 'role_data'])
+    assert result.exit_code == 2
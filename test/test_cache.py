@@ -0,0 +1,127 @@
+"""SnapshotCache: what keys an entry, when it expires, and entries that
+can't be read or written; and the Context fetches it saves"""
+import os
+
+import pytest
+
+from dcos_monitor import cache as cache_module
+from dcos_monitor.cache import FORMAT, SnapshotCache
+from dcos_monitor.cli import Context
+
+MASTER = '10.0.6.89'
+DATA = {'slaves': [{'id': 'S1', 'hostname': '10.0.1.1', 'resources': {'cpus': 4.0}}]}
+PROJECTION = {'frameworks': {'id': True, 'tasks': {'id': True}}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() of the cache module, moved on with clock.now"""
+    class Clock(object):
+        now = 1000000.0
+    monkeypatch.setattr(cache_module.time, 'time', lambda: Clock.now)
+    return Clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return SnapshotCache(str(tmp_path / 'cache'), ttl=60)
+
+
+def test_round_trip(cache):
+    assert cache.load(MASTER, '/slaves') is None
+    cache.store(MASTER, '/slaves', DATA)
+    assert cache.load(MASTER, '/slaves') == DATA
+
+
+def test_key(cache):
+    cache.store(MASTER, '/state.json', DATA, PROJECTION, 'planned')
+    assert cache.load(MASTER, '/state.json', PROJECTION, 'planned') == DATA
+    # the projection is compared as a document, not by the order of its keys
+    reordered = {'frameworks': {'tasks': {'id': True}, 'id': True}}
+    assert cache.load(MASTER, '/state.json', reordered, 'planned') == DATA
+
+    assert cache.load(MASTER, '/state.json', PROJECTION, 'full') is None
+    assert cache.load(MASTER, '/state.json', PROJECTION) is None
+    assert cache.load(MASTER, '/state.json', None, 'planned') is None
+    assert cache.load(MASTER, '/slaves', PROJECTION, 'planned') is None
+    assert cache.load('10.0.6.90', '/state.json', PROJECTION, 'planned') is None
+
+    paths = {cache.path(MASTER, '/state.json', PROJECTION, mode) for mode in (None, 'planned', 'full')}
+    assert len(paths) == 3
+    assert all(os.path.basename(path).startswith('10.0.6.89_state.json_') for path in paths)
+
+
+def test_expiry(cache, clock):
+    cache.store(MASTER, '/slaves', DATA)
+    clock.now += 59
+    assert cache.load(MASTER, '/slaves') == DATA
+    clock.now += 2
+    assert cache.load(MASTER, '/slaves') is None
+
+    # --max-staleness overrides the ttl either way
+    cache.max_staleness = 120
+    assert cache.load(MASTER, '/slaves') == DATA
+    cache.max_staleness = 10
+    clock.now -= 50
+    assert cache.load(MASTER, '/slaves') is None
+    clock.now -= 2
+    assert cache.load(MASTER, '/slaves') == DATA
+
+
+def test_entries_of_another_format_are_misses(cache):
+    cache.store(MASTER, '/slaves', DATA)
+    path = cache.path(MASTER, '/slaves')
+    with open(path, 'rb') as f:
+        assert f.read(len(FORMAT)) == FORMAT
+    with open(path, 'r+b') as f:
+        f.write(b'X')
+    assert cache.load(MASTER, '/slaves') is None
+
+    with open(path, 'wb') as f:
+        f.write(FORMAT + b'truncated')
+    assert cache.load(MASTER, '/slaves') is None
+
+
+def test_store_replaces_atomically(cache):
+    cache.store(MASTER, '/slaves', DATA)
+    cache.store(MASTER, '/slaves', {'slaves': []})
+    assert cache.load(MASTER, '/slaves') == {'slaves': []}
+    assert [name for name in os.listdir(cache.directory) if name.endswith('.tmp')] == []
+
+
+def test_unwritable_directory_is_ignored(tmp_path, clock):
+    blocker = tmp_path / 'file'
+    blocker.write_text('not a directory')
+    cache = SnapshotCache(str(blocker / 'cache'), ttl=60)
+    cache.store(MASTER, '/slaves', DATA)
+    assert cache.load(MASTER, '/slaves') is None
+
+
+def context(cache, full_state=False):
+    ctx = Context()
+    ctx.cache = cache
+    ctx.full_state = full_state
+    ctx.projections = {'state_data': PROJECTION}
+    return ctx
+
+
+def test_context_fetches_once_per_mode(cache):
+    fetched = []
+
+    def fetch(source):
+        fetched.append(source)
+        return {'frameworks': [{'id': source, 'tasks': []}]}
+
+    planned = context(cache)
+    assert planned._cached(MASTER, 'state_data', lambda: fetch('planned'))['frameworks'][0]['id'] == 'planned'
+    assert planned._cached(MASTER, 'state_data', lambda: fetch('again'))['frameworks'][0]['id'] == 'planned'
+
+    # --full-state is not served what the planner pieced together
+    full = context(cache, full_state=True)
+    assert full._cached(MASTER, 'state_data', lambda: fetch('full'))['frameworks'][0]['id'] == 'full'
+    assert planned._cached(MASTER, 'state_data', lambda: fetch('again'))['frameworks'][0]['id'] == 'planned'
+    assert fetched == ['planned', 'full']
+
+    # slave_data is fetched the same way either way
+    assert full._cached(MASTER, 'slave_data', lambda: DATA) == DATA
+    assert planned._cached(MASTER, 'slave_data', lambda: fetch('slaves')) == DATA
@@ -0,0 +1,158 @@
+"""ClusterModel fed the RecordIO stream benchmarks.record_events writes,
+compared with the /slaves and /state.json fixtures it was made from"""
+import io
+import json
+import os
+
+import pytest
+
+from benchmarks.fake_master import subscribed_event, v1_id
+from dcos_monitor import operator_api
+from dcos_monitor.cluster_model import ClusterModel
+from dcos_monitor.planner import TASK_LISTS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# what the v1 messages carry over to /slaves and to the tasks of /state.json
+SLAVE_FIELDS = ('id', 'hostname', 'port', 'pid', 'active', 'version', 'registered_time', 'capabilities',
+                'attributes', 'resources', 'reserved_resources', 'reserved_resources_full',
+                'unreserved_resources', 'unreserved_resources_full', 'offered_resources', 'used_resources')
+TASK_FIELDS = ('id', 'name', 'framework_id', 'executor_id', 'slave_id', 'state', 'resources', 'statuses',
+               'labels', 'discovery', 'container')
+
+
+def load(name):
+    with open(os.path.join(HERE, name)) as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope='module')
+def polled():
+    return load('dev-mom_prod-mom_slave.json'), load('dev-mom_prod-mom_state.json')
+
+
+# events as record_events writes them
+def recordio(events):
+    return b''.join(operator_api.encode_record(event) for event in events)
+
+
+# the model after the events of a recorded stream
+def replay(stream, chunk_size=operator_api.CHUNK_SIZE):
+    model = ClusterModel()
+    fp = io.BytesIO(stream)
+    for record in operator_api.read_records(iter(lambda: fp.read(chunk_size), b'')):
+        model.apply(json.loads(record.decode('utf-8')))
+    return model
+
+
+def test_read_records_across_chunk_boundaries():
+    events = [{'type': 'HEARTBEAT'}, {'type': 'TASK_UPDATED', 'task_updated': {'state': 'TASK_RUNNING'}},
+              {'type': 'AGENT_REMOVED', 'agent_removed': {'agent_id': {'value': 'Sé\n1'}}}]
+    stream = recordio(events)
+    for chunk_size in range(1, len(stream) + 1):
+        chunks = [stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size)]
+        assert [json.loads(r.decode('utf-8')) for r in operator_api.read_records(chunks)] == events
+
+
+def test_read_records_truncated():
+    stream = recordio([{'type': 'HEARTBEAT'}])
+    with pytest.raises(ValueError):
+        list(operator_api.read_records([stream[:-1]]))
+    assert list(operator_api.read_records([b''])) == []
+
+
+def test_read_file():
+    events = [{'type': 'HEARTBEAT'}] * 3
+    records = operator_api.read_file(io.BytesIO(recordio(events)))
+    assert [json.loads(r.decode('utf-8')) for r in records] == events
+
+
+def test_ranges_string_merges_adjacent_and_overlapping():
+    ranges = [{'begin': 8, 'end': 9}, {'begin': 1, 'end': 3}, {'begin': 4, 'end': 5}, {'begin': 2, 'end': 2}]
+    assert operator_api.ranges_string(ranges) == '[1-5, 8-9]'
+    assert operator_api.ranges_string([]) == '[]'
+
+
+def test_resource_v0_takes_role_of_dynamic_reservation():
+    item = {'name': 'cpus', 'type': 'SCALAR', 'scalar': {'value': 1.0},
+            'reservations': [{'type': 'DYNAMIC', 'role': 'db', 'principal': 'ops'}]}
+    converted = operator_api.resource_v0(item)
+    assert converted['role'] == 'db'
+    assert converted['reservation'] == {'principal': 'ops'}
+    assert 'role' not in item
+    assert operator_api.resource_v0({'name': 'mem', 'type': 'SCALAR', 'scalar': {'value': 1.0}})['role'] == '*'
+
+
+def test_attribute_value():
+    assert operator_api.attribute_value({'type': 'SCALAR', 'scalar': {'value': 2.0}}) == 2.0
+    assert operator_api.attribute_value({'type': 'TEXT', 'text': {'value': 'rack-1'}}) == 'rack-1'
+    assert operator_api.attribute_value({'type': 'SET', 'set': {'item': ['a', 'b']}}) == '{a,b}'
+    assert operator_api.attribute_value({'type': 'RANGES',
+                                         'ranges': {'range': [{'begin': 1, 'end': 2}]}}) == '[1-2]'
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096, operator_api.CHUNK_SIZE])
+def test_snapshot_matches_polled_slaves(polled, chunk_size):
+    slaves, state = polled
+    model = replay(recordio([subscribed_event(slaves, state)]), chunk_size)
+    assert model.ready.is_set()
+    assert len(model.slave_data['slaves']) == len(slaves['slaves'])
+    for converted, slave in zip(model.slave_data['slaves'], slaves['slaves']):
+        for field in SLAVE_FIELDS:
+            assert converted[field] == slave[field], (slave['id'], field)
+
+
+def test_snapshot_matches_polled_state(polled):
+    slaves, state = polled
+    model = replay(recordio([subscribed_event(slaves, state)]))
+    frameworks = model.state_data['frameworks']
+    assert [(f['id'], f['name']) for f in frameworks] == [(f['id'], f['name']) for f in state['frameworks']]
+    for converted, framework in zip(frameworks, state['frameworks']):
+        for field in TASK_LISTS:
+            assert len(converted[field]) == len(framework.get(field, [])), (framework['id'], field)
+            for task, polled_task in zip(converted[field], framework.get(field, [])):
+                for name in TASK_FIELDS:
+                    assert task.get(name) == polled_task.get(name), (polled_task['id'], name)
+
+
+def test_task_events_update_allocation(polled):
+    slaves, state = polled
+    slave = slaves['slaves'][0]
+    framework = next(f for f in state['frameworks'] if f['tasks'])
+    task_id = framework['tasks'][0]['id'] + '-new'
+    launched = {'type': 'TASK_ADDED', 'task_added': {'task': {
+        'name': 'new', 'task_id': v1_id(task_id), 'framework_id': v1_id(framework['id']),
+        'agent_id': v1_id(slave['id']), 'state': 'TASK_STAGING',
+        'resources': [{'name': 'cpus', 'type': 'SCALAR', 'scalar': {'value': 0.25}, 'role': '*'}]}}}
+    finished = {'type': 'TASK_UPDATED', 'task_updated': {
+        'framework_id': v1_id(framework['id']), 'state': 'TASK_FINISHED',
+        'status': {'task_id': v1_id(task_id), 'agent_id': v1_id(slave['id']), 'state': 'TASK_FINISHED'}}}
+    before = slave['used_resources']['cpus']
+
+    model = replay(recordio([subscribed_event(slaves, state), launched]))
+    assert model.slave_data['slaves'][0]['used_resources']['cpus'] == pytest.approx(before + 0.25)
+    staged = [t for f in model.state_data['frameworks'] for t in f['tasks'] if t['id'] == task_id]
+    assert [t['state'] for t in staged] == ['TASK_STAGING']
+
+    model.apply(finished)
+    assert model.slave_data['slaves'][0]['used_resources']['cpus'] == pytest.approx(before)
+    completed = [t for f in model.state_data['frameworks'] for t in f['completed_tasks'] if t['id'] == task_id]
+    assert [t['statuses'][-1]['state'] for t in completed] == ['TASK_FINISHED']
+    # the document read before the update is left as it was
+    assert [(t['state'], len(t['statuses'])) for t in staged] == [('TASK_STAGING', 0)]
+
+
+def test_agent_and_framework_removed(polled):
+    slaves, state = polled
+    agent_id = slaves['slaves'][0]['id']
+    framework = state['frameworks'][0]
+    model = replay(recordio([
+        subscribed_event(slaves, state),
+        {'type': 'AGENT_REMOVED', 'agent_removed': {'agent_id': v1_id(agent_id)}},
+        {'type': 'FRAMEWORK_REMOVED', 'framework_removed': {'framework_info': {'id': v1_id(framework['id'])}}},
+        {'type': 'HEARTBEAT'},
+    ]))
+    assert agent_id not in [s['id'] for s in model.slave_data['slaves']]
+    assert len(model.slave_data['slaves']) == len(slaves['slaves']) - 1
+    assert framework['id'] not in [f['id'] for f in model.state_data['frameworks']]
+    assert model.version == 4
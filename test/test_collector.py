@@ -0,0 +1,102 @@
+"""poll_statistics against stubbed agents: every agent keeps its own
+schedule however slowly it answers, at most max_concurrency requests are in
+flight, and finished() is called for an agent as soon as its entry is final"""
+import threading
+import time
+
+import pytest
+
+from dcos_monitor import collector
+from dcos_monitor.collector import collect_statistics, poll_statistics, sample_statistics
+
+INTERVAL = 0.1
+
+
+class Agents(object):
+    """get_statistics of agents that take `delay` seconds to answer and
+    fail the polls listed in `failing`"""
+
+    def __init__(self, delay=None, failing=None):
+        self.delay = delay or {}
+        self.failing = failing or {}
+        self.requests = {}
+        self.in_flight = self.most_in_flight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, hostname, timeout=None):
+        with self.lock:
+            n = len(self.requests.setdefault(hostname, []))
+            self.requests[hostname].append(time.time())
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        time.sleep(self.delay.get(hostname, 0))
+        with self.lock:
+            self.in_flight -= 1
+        if n in self.failing.get(hostname, ()):
+            return None
+        return [{'executor_id': 'web.1', 'statistics': {'timestamp': time.time(), 'cpus_user_time_secs': float(n),
+                                                        'cpus_system_time_secs': 0.0, 'cpus_limit': 1.0,
+                                                        'mem_rss_bytes': 10.0, 'mem_limit_bytes': 100.0}}]
+
+
+@pytest.fixture
+def agents(monkeypatch):
+    def install(**kwargs):
+        stub = Agents(**kwargs)
+        monkeypatch.setattr(collector, 'get_statistics', stub)
+        return stub
+    return install
+
+
+def gaps(times):
+    return [later - earlier for earlier, later in zip(times, times[1:])]
+
+
+def test_samples_keep_their_schedule(agents):
+    # the slow agent answers after the next sample is due, it is asked anyway
+    stub = agents(delay={'slow': 1.5 * INTERVAL})
+    taken = []
+    poll_statistics(['fast', 'slow'], INTERVAL, 3, lambda hostname, n, stats: taken.append((hostname, n)))
+    assert sorted(taken) == [(hostname, n) for hostname in ('fast', 'slow') for n in range(3)]
+    for hostname in ('fast', 'slow'):
+        assert [round(gap / INTERVAL) for gap in gaps(stub.requests[hostname])] == [1, 1]
+
+
+def test_max_concurrency(agents):
+    stub = agents(delay={hostname: INTERVAL / 4 for hostname in 'abcdef'})
+    results = collect_statistics(list('abcdef'), INTERVAL, samples=2, max_concurrency=2)
+    assert stub.most_in_flight == 2
+    assert sorted(results) == list('abcdef')
+    assert all(len(samples) == 2 for samples in results.values())
+
+
+def test_failed_agents(agents):
+    stub = agents(failing={'down': (0,), 'flaky': (1,)})
+    finished = []
+    results = collect_statistics(['up', 'down', 'flaky'], INTERVAL, samples=3,
+                                 finished=lambda hostname, results: finished.append((hostname, time.time())))
+    # an agent that misses its first poll isn't asked again
+    assert len(stub.requests['down']) == 1
+    assert results['down'] is None
+    assert [sample['web.1']['statistics']['cpus_user_time_secs'] for sample in results['flaky']] == [0.0, 2.0]
+    assert len(results['up']) == 3
+
+    # each agent is reported once, the failed one without waiting for the others
+    assert sorted(hostname for hostname, _ in finished) == ['down', 'flaky', 'up']
+    assert finished[0][0] == 'down'
+    assert finished[-1][1] - finished[0][1] >= 1.5 * INTERVAL
+
+
+def test_sample_statistics_finished(agents):
+    agents()
+    reported = []
+
+    # the agent's samples are all in the sampler when it is reported
+    def finished(hostname, sampler):
+        window = sampler.agents[hostname]['web.1']
+        reported.append((hostname, sampler.answered[hostname], window.count))
+
+    sampler = sample_statistics(['a', 'b'], INTERVAL, 2, finished=finished)
+    assert sorted(reported) == [('a', (0, 1), 2), ('b', (0, 1), 2)]
+    record, = sampler.container_records({'id': 'S1', 'hostname': 'a'})
+    assert record['samples'] == 2
@@ -0,0 +1,158 @@
+"""the exporter's exposition text on the /slaves fixture, what scrapers see
+after a failed poll, and the metric families it is built from"""
+import json
+import logging
+import os
+import threading
+from urllib.request import urlopen
+
+import pytest
+
+from dcos_monitor import metrics
+from dcos_monitor.cmds import cmd_exporter
+from dcos_monitor.cmds.cmd_exporter import Exporter, make_server
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class Stop(BaseException):
+    pass
+
+
+class FakeContext(object):
+    """what Exporter reads of the command context, reload() returns
+    `polls` in turn and raises the ones that are exceptions"""
+
+    def __init__(self, slave_data, polls=()):
+        self.slave_data = slave_data
+        self.log = logging.getLogger('test_exporter')
+        self.polls = list(polls)
+
+    def reload(self, dataset):
+        assert dataset == 'slave_data'
+        poll = self.polls.pop(0)
+        if isinstance(poll, BaseException):
+            raise poll
+        return poll
+
+
+@pytest.fixture(scope='module')
+def slave_data():
+    with open(os.path.join(HERE, 'dev-mom_prod-mom_slave.json')) as f:
+        return json.load(f)
+
+
+def samples(text):
+    """{name: {label text: value}} of the exposition text"""
+    found = {}
+    for line in text.splitlines():
+        if line.startswith('#'):
+            continue
+        series, value = line.rsplit(' ', 1)
+        name, _, labels = series.partition('{')
+        found.setdefault(name, {})[labels.rstrip('}')] = float(value)
+    return found
+
+
+def run(exporter, polls, monkeypatch):
+    """run the exporter's poll loop for `polls` polls"""
+    texts = []
+
+    def sleep(seconds):
+        texts.append(exporter.text.decode('utf-8'))
+        if len(texts) == polls:
+            raise Stop()
+
+    monkeypatch.setattr(cmd_exporter.time, 'sleep', sleep)
+    with pytest.raises(Stop):
+        exporter.run()
+    return texts
+
+
+def exporter(ctx):
+    return Exporter(ctx, interval=30, container_stats=False, wait=1, max_concurrency=4, agent_timeout=1)
+
+
+def test_render():
+    families = [metrics.MetricFamily('a', 'first').add({}, 1),
+                metrics.MetricFamily('b', 'second').add({'y': 'q"\\\n', 'x': 1}, float('nan'))]
+    assert metrics.render(families) == (
+        '# HELP a first\n'
+        '# TYPE a gauge\n'
+        'a 1.0\n'
+        '# HELP b second\n'
+        '# TYPE b gauge\n'
+        'b{x="1",y="q\\"\\\\\\n"} NaN\n')
+    assert metrics.format_value(float('inf')) == '+Inf'
+    assert metrics.format_value(float('-inf')) == '-Inf'
+
+
+def test_resource_families(slave_data):
+    names = [family.name for family in metrics.cluster_metrics(slave_data) + metrics.agent_metrics(slave_data)]
+    assert names == ['dcos_cluster_resources', 'dcos_cluster_resources_allocated',
+                     'dcos_cluster_resources_allocated_percent', 'dcos_agent_resources_capacity',
+                     'dcos_agent_resources_used']
+    assert not [name for name in names if name.endswith('_total')]
+
+
+def test_container_metrics():
+    def container(ts, cpu):
+        return {'executor_id': 'web.1', 'framework_id': 'F1',
+                'statistics': {'timestamp': ts, 'cpus_user_time_secs': cpu, 'cpus_system_time_secs': 0.0,
+                               'cpus_limit': 2.0, 'mem_rss_bytes': 50.0, 'mem_limit_bytes': 200.0}}
+    polled = {'a': [{'web.1': container(10.0, 1.0)}, {'web.1': container(12.0, 2.0)}], 'b': None}
+    families = {family.name: family.samples for family in metrics.container_metrics(polled)}
+    labels = {'hostname': 'a', 'executor_id': 'web.1', 'framework_id': 'F1'}
+    assert families['dcos_container_cpus_used'] == [(labels, 0.5)]
+    assert families['dcos_container_cpus_utilization_percent'] == [(labels, 25.0)]
+    assert families['dcos_container_mem_utilization_percent'] == [(labels, 25.0)]
+
+    # a single sample has no CPU usage
+    families = {family.name: family.samples for family in metrics.container_metrics({'a': polled['a'][:1]})}
+    assert families['dcos_container_cpus_used'] == []
+    assert families['dcos_container_mem_rss_bytes'] == [(labels, 50.0)]
+
+
+def test_before_the_first_poll(slave_data):
+    text = samples(exporter(FakeContext(slave_data)).text.decode('utf-8'))
+    assert text == {'dcos_exporter_up': {'': 0.0}, 'dcos_exporter_poll_errors': {'': 0.0}}
+
+
+def test_poll(slave_data, monkeypatch):
+    text, = run(exporter(FakeContext(slave_data)), 1, monkeypatch)
+    found = samples(text)
+    assert found['dcos_exporter_up'] == {'': 1.0}
+    assert found['dcos_exporter_poll_errors'] == {'': 0.0}
+    assert found['dcos_cluster_resources']['resource="cpus"'] == 20.0
+    assert found['dcos_role_resources']['resource="cpus",role="slave_public",type="reserved"'] == 4.0
+    assert len(found['dcos_agent_resources_capacity']) == 4 * len(slave_data['slaves'])
+    assert 'dcos_exporter_last_poll_timestamp_seconds' in found
+
+
+@pytest.mark.parametrize('failure', [SystemExit(1), ValueError('bad payload')])
+def test_failed_poll(slave_data, monkeypatch, failure):
+    ctx = FakeContext(slave_data, [failure, slave_data])
+    first, failed, recovered = run(exporter(ctx), 3, monkeypatch)
+    assert samples(first)['dcos_exporter_up'] == {'': 1.0}
+    # nothing of the last successful poll is left
+    assert samples(failed) == {'dcos_exporter_up': {'': 0.0}, 'dcos_exporter_poll_errors': {'': 1.0}}
+    found = samples(recovered)
+    assert found['dcos_exporter_up'] == {'': 1.0}
+    assert found['dcos_exporter_poll_errors'] == {'': 1.0}
+    assert 'dcos_cluster_resources' in found
+
+
+def test_scrapes_are_served_the_rendered_text(slave_data):
+    ctx = FakeContext(slave_data)
+    exported = exporter(ctx)
+    exported.text = b'dcos_exporter_up 1.0\n'
+    server = make_server('127.0.0.1', 0, exported, ctx.log)
+    try:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+        with urlopen(url + '/metrics') as response:
+            assert response.headers['Content-Type'] == cmd_exporter.CONTENT_TYPE
+            assert response.read() == b'dcos_exporter_up 1.0\n'
+    finally:
+        server.shutdown()
+        server.server_close()
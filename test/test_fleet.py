@@ -0,0 +1,77 @@
+"""fleet.py: clusters from --master and --clusters-file, and fetch_clusters
+leaving out the clusters that fail or don't answer in time"""
+import logging
+import threading
+import time
+
+import pytest
+
+from dcos_monitor.fleet import Cluster, cluster_title, collect_clusters, fetch_clusters, parse_cluster
+
+LOG = logging.getLogger('test_fleet')
+
+
+def test_parse_cluster():
+    assert parse_cluster('prod=10.0.6.89') == Cluster('prod', '10.0.6.89')
+    assert parse_cluster(' 10.0.6.89:5050 ') == Cluster('10.0.6.89:5050', '10.0.6.89:5050')
+
+
+def test_collect_clusters(tmp_path):
+    clusters_file = tmp_path / 'clusters'
+    clusters_file.write_text("# name      master\n"
+                             "prod        10.0.6.89\n"
+                             "\n"
+                             "staging     10.1.6.12:5050   # eu\n"
+                             "10.2.6.40\n")
+    clusters = collect_clusters(['prod=10.0.6.89,10.3.0.1', 'dev=10.4.0.1'], str(clusters_file))
+    assert clusters == [Cluster('prod', '10.0.6.89'), Cluster('10.3.0.1', '10.3.0.1'), Cluster('dev', '10.4.0.1'),
+                        Cluster('staging', '10.1.6.12:5050'), Cluster('10.2.6.40', '10.2.6.40')]
+
+
+def test_cluster_title():
+    assert cluster_title(Cluster('prod', '10.0.6.89')) == 'Cluster prod (10.0.6.89)'
+    assert cluster_title(Cluster('10.0.6.89', '10.0.6.89')) == 'Cluster 10.0.6.89'
+
+
+@pytest.fixture
+def hung():
+    """set to let the fetches that hang return"""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_fetch_clusters(hung, caplog):
+    clusters = [Cluster('slow', 'a'), Cluster('prod', 'b'), Cluster('broken', 'c'), Cluster('gone', 'd'),
+                Cluster('dev', 'e')]
+
+    def fetch(cluster):
+        if cluster.name == 'slow':
+            hung.wait(10)
+        elif cluster.name == 'broken':
+            raise ValueError('bad payload')
+        elif cluster.name == 'gone':
+            # what the fetchers do after logging a connection error
+            raise SystemExit(1)
+        return cluster.master.upper()
+
+    started = time.time()
+    with caplog.at_level(logging.ERROR, logger='test_fleet'):
+        results = fetch_clusters(clusters, fetch, 0.2, LOG)
+    # the slow cluster doesn't hold up the report
+    assert time.time() - started < 2
+    assert results == [(clusters[1], 'B'), (clusters[4], 'E')]
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages == ['slow: no answer from a within 0.2s, skipping it',
+                        'broken: unable to fetch from c: bad payload',
+                        'gone: unable to fetch from d: 1']
+
+
+def test_fetch_clusters_without_timeout():
+    clusters = [Cluster('prod', 'b'), Cluster('dev', 'e')]
+
+    def fetch(cluster):
+        time.sleep(0.05)
+        return cluster.name
+
+    assert fetch_clusters(clusters, fetch, None, LOG) == [(clusters[0], 'prod'), (clusters[1], 'dev')]
@@ -0,0 +1,105 @@
+"""HistoryStore: downsampling into the tiers and the count-weighted averages
+queries return over them"""
+import pytest
+
+from dcos_monitor.history import DAY, HOUR, MINUTE, HistoryStore, parse_duration
+from dcos_monitor.metrics import MetricFamily
+
+NOW = 1000 * DAY
+NAME = 'dcos_role_resources'
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.sqlite'))
+    yield store
+    store.close()
+
+
+def append(store, ts, value, role='web'):
+    store.append(ts, [MetricFamily(NAME, '').add({'role': role, 'resource': 'cpus'}, value)])
+
+
+def points(store, resolution):
+    return store.db.execute("SELECT ts, value, min, max, count FROM points WHERE resolution = ? ORDER BY ts",
+                            (resolution,)).fetchall()
+
+
+def test_parse_duration():
+    assert parse_duration('90s') == 90
+    assert parse_duration('15m') == 15 * MINUTE
+    assert parse_duration(' 6H ') == 6 * HOUR
+    assert parse_duration('2w') == 14 * DAY
+    assert parse_duration('30') == 30
+
+
+def test_recent_points_are_kept_as_polled(store):
+    for i in range(10):
+        append(store, NOW - i * MINUTE, i)
+    store.downsample(NOW)
+    assert len(points(store, 0)) == 10
+    assert points(store, 5 * MINUTE) == []
+
+
+def test_downsample_into_five_minute_buckets(store):
+    start = NOW - 2 * DAY
+    for i in range(10):
+        append(store, start + i * MINUTE, i)
+    store.downsample(NOW)
+    assert points(store, 0) == []
+    assert points(store, 5 * MINUTE) == [(start, 2.0, 0.0, 4.0, 5), (start + 5 * MINUTE, 7.0, 5.0, 9.0, 5)]
+
+
+def test_coarser_tiers_weigh_by_count(store):
+    # an hour 10 days ago polled every minute for its first 5 minutes and
+    # only once after that
+    start = NOW - 10 * DAY
+    for i in range(5):
+        append(store, start + i * MINUTE, 10)
+    append(store, start + 30 * MINUTE, 40)
+    store.downsample(NOW)
+    assert points(store, 0) == points(store, 5 * MINUTE) == []
+    assert points(store, HOUR) == [(start, (5 * 10 + 40) / 6.0, 10.0, 40.0, 6)]
+
+    # and after 90 days into a day that keeps the counts
+    store.downsample(NOW + 81 * DAY)
+    assert points(store, HOUR) == []
+    assert points(store, DAY) == [(start, 15.0, 10.0, 40.0, 6)]
+
+
+def test_late_points_merge_into_existing_buckets(store):
+    start = NOW - 2 * DAY
+    for i in range(4):
+        append(store, start + i * MINUTE, 2)
+    store.downsample(NOW)
+    append(store, start + 4 * MINUTE, 12)
+    store.downsample(NOW)
+    assert points(store, 5 * MINUTE) == [(start, (4 * 2 + 12) / 5.0, 2.0, 12.0, 5)]
+
+
+def test_query_weighs_downsampled_points(store):
+    # one 5 minute bucket standing for 5 polls next to one raw poll
+    start = NOW - DAY - HOUR
+    for i in range(5):
+        append(store, start + i * MINUTE, 1)
+    store.downsample(NOW)
+    append(store, start + 10 * MINUTE, 7)
+    rows = store.query(NAME, start, start + HOUR, step=HOUR)
+    assert rows == [('', start, (5 * 1 + 7) / 6.0, 1.0, 7.0, 6)]
+
+
+def test_query_groups_and_combines_series(store):
+    start = NOW - HOUR
+    for i in range(3):
+        ts = start + i * MINUTE
+        append(store, ts, 1 + i, role='web')
+        append(store, ts, 10, role='db')
+    rows = store.query(NAME, start, NOW, step=HOUR, group_by='role')
+    assert [(group, avg, low, high, polls) for group, _, avg, low, high, polls in rows] == \
+        [('db', 10.0, 10.0, 10.0, 3), ('web', 2.0, 1.0, 3.0, 3)]
+    (_, _, avg, low, high, polls), = store.query(NAME, start, NOW, step=HOUR)
+    assert (avg, low, high, polls) == (12.0, 11.0, 13.0, 3)
+    (_, _, avg, _, _, _), = store.query(NAME, start, NOW, step=HOUR, combine='max')
+    assert avg == 10.0
+    assert store.query(NAME, start, NOW, where={'role': 'web'})[0][2] == 2.0
+    assert store.metrics() == [(NAME, 2, ['resource', 'role'])]
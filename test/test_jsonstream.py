@@ -0,0 +1,154 @@
+"""jsonstream.load against json.load: nesting, escapes, values cut by the
+end of a read, text and binary files, and random documents"""
+import io
+import json
+import random
+
+import pytest
+
+from dcos_monitor import jsonstream
+from dcos_monitor.task_index import TASK_INDEX_FIELDS
+
+
+class ShortReads(object):
+    """a file object that never returns more than `size` characters or bytes"""
+
+    def __init__(self, data, size):
+        self.fp = io.BytesIO(data) if isinstance(data, bytes) else io.StringIO(data)
+        self.size = size
+
+    def read(self, size=-1):
+        return self.fp.read(self.size if size < 0 else min(size, self.size))
+
+
+# what load keeps of `text` with reads of every size in `sizes`, all must agree
+def load_all(text, projection, sizes=(1, 2, 3, 7, 64, jsonstream.CHUNK_SIZE)):
+    results = []
+    for data in (text, text.encode('utf-8')):
+        for size in sizes:
+            results.append(jsonstream.load(ShortReads(data, size), projection))
+    for result in results[1:]:
+        assert result == results[0]
+    return results[0]
+
+
+def check(document, projection, sizes=(1, 2, 3, 7, 64, jsonstream.CHUNK_SIZE)):
+    text = json.dumps(document, ensure_ascii=False)
+    assert load_all(text, projection, sizes) == jsonstream.project(json.loads(text), projection)
+
+
+def test_no_projection_is_json_load():
+    text = '{"a": [1, 2.5, -3e2, true, false, null, "x"]}'
+    assert jsonstream.load(io.StringIO(text)) == json.loads(text)
+    assert jsonstream.load(io.BytesIO(text.encode('utf-8'))) == json.loads(text)
+
+
+def test_nesting():
+    document = {'frameworks': [{'id': 'f{0}'.format(i), 'flags': {'a': [[[{'b': i}]]]},
+                                'tasks': [{'id': 't{0}'.format(j), 'state': 'TASK_RUNNING',
+                                           'statuses': [{'state': 'TASK_RUNNING', 'x': {'y': [j] * j}}]}
+                                          for j in range(5)]}
+                               for i in range(3)],
+                'completed_frameworks': [{'tasks': [[], {}, [[]], [{}]]}]}
+    check(document, {'frameworks': {'id': True, 'tasks': {'statuses': {'state': True}}}})
+    check(document, {'frameworks': {'flags': {'a': True}}, 'completed_frameworks': True})
+    check(document, {'frameworks': {'missing': True}})
+    check([[1, [2, [3]]], {'a': {'a': {'a': 1}}}], {'a': {'a': True}})
+
+
+def test_scalars_and_empty_containers():
+    check({'a': 0, 'b': -0.5, 'c': 1e-7, 'd': None, 'e': True, 'f': False, 'g': [], 'h': {}, 'i': ''},
+          {'a': True, 'c': True, 'e': True, 'g': True, 'h': True, 'i': True})
+    assert load_all('[]', {'a': True}) == []
+    assert load_all('  {}  ', {'a': True}) == {}
+    assert load_all('"top"', {'a': True}) == 'top'
+    assert load_all('12345678901234567890', {'a': True}) == 12345678901234567890
+
+
+def test_escapes():
+    keys = ['"quoted"', 'back\\slash', 'tab\t', 'unié', '\\"', '😀', 'a\u0000b']
+    document = {key: {'value': key * 3, 'skipped': key} for key in keys}
+    check(document, {key: {'value': True} for key in keys})
+    check(document, {keys[0]: True})
+    text = '{"a\\u0062": "\\u00e9\\n\\ud83d\\ude00", "s": "\\\\\\"}", "c": 1}'
+    assert load_all(text, {'ab': True, 'c': True}) == {'ab': 'é\n\U0001f600', 'c': 1}
+    assert load_all(text, {'s': True}) == {'s': '\\"}'}
+
+
+def test_values_cut_by_reads():
+    long_string = 'x' * 300 + '\\"' + 'y' * 300
+    number = '1' * 200
+    text = '{"skip": "' + long_string + '", "n": ' + number + ', "keep": "' + long_string + '", "m": [' + number + ']}'
+    projection = {'n': True, 'keep': True, 'm': True}
+    assert load_all(text, projection) == jsonstream.project(json.loads(text), projection)
+    # values bigger than a whole chunk
+    big = {'skip': ['z' * 100] * 2000, 'keep': [{'i': i, 's': 'é' * (i % 7)} for i in range(3000)]}
+    check(big, {'keep': {'i': True}}, sizes=(997, 4096, jsonstream.CHUNK_SIZE))
+    check(big, {'keep': True}, sizes=(997, 4096, jsonstream.CHUNK_SIZE))
+
+
+def test_multibyte_characters_split_across_reads():
+    text = json.dumps({'a': 'é€😀' * 50, 'b': ['€'] * 20}, ensure_ascii=False)
+    data = text.encode('utf-8')
+    for size in range(1, 9):
+        assert jsonstream.load(ShortReads(data, size), {'a': True, 'b': True}) == json.loads(text)
+
+
+@pytest.mark.parametrize('text', ['{"a": 1', '{"a": [1, 2}', '{"a" 1}', '[1, 2] 3', '{"a": tru}', '', '{"a": "x'])
+def test_malformed(text):
+    with pytest.raises(ValueError):
+        jsonstream.load(io.StringIO(text), {'a': True})
+
+
+def test_merge_and_project():
+    merged = jsonstream.merge({'a': {'b': True}}, {'a': {'c': True}, 'd': True})
+    assert merged == {'a': {'b': True, 'c': True}, 'd': True}
+    assert jsonstream.merge({'a': {'b': True}}, True) is True
+    assert jsonstream.project({'a': [{'b': 1, 'c': 2}], 'e': 3}, merged) == {'a': [{'b': 1, 'c': 2}]}
+
+
+def test_task_index_fields_on_fixture():
+    with open('test/dev-mom_prod-mom_state.json', 'rb') as fp:
+        text = fp.read().decode('utf-8')
+    assert load_all(text, TASK_INDEX_FIELDS, sizes=(257, 1000, jsonstream.CHUNK_SIZE)) == \
+        jsonstream.project(json.loads(text), TASK_INDEX_FIELDS)
+
+
+#
+# random documents and projections, compared with json
+#
+
+KEYS = ['a', 'b', 'id', 'tasks', 'é', 'q"k', '']
+
+
+def random_value(rng, depth):
+    kind = rng.randrange(9 if depth < 5 else 6)
+    if kind == 0:
+        return rng.choice([None, True, False])
+    if kind == 1:
+        return rng.randint(-10 ** 20, 10 ** 20)
+    if kind == 2:
+        return rng.uniform(-1e6, 1e6)
+    if kind in (3, 4, 5):
+        return ''.join(rng.choice('ab "\\\n\té€😀\u0001/') for _ in range(rng.randrange(20)))
+    if kind in (6, 7):
+        return {rng.choice(KEYS): random_value(rng, depth + 1) for _ in range(rng.randrange(6))}
+    return [random_value(rng, depth + 1) for _ in range(rng.randrange(6))]
+
+
+def random_projection(rng, depth=0):
+    if depth > 3 or rng.random() < 0.3:
+        return True
+    return {key: random_projection(rng, depth + 1) for key in rng.sample(KEYS, rng.randrange(1, 4))}
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_fuzz(seed):
+    rng = random.Random(seed)
+    document = {key: random_value(rng, 0) for key in rng.sample(KEYS, rng.randrange(1, len(KEYS)))}
+    projection = random_projection(rng)
+    if projection is True:
+        projection = {KEYS[0]: True}
+    text = json.dumps(document, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 1]))
+    sizes = (rng.randrange(1, 16), rng.randrange(16, 512))
+    assert load_all(text, projection, sizes) == jsonstream.project(json.loads(text), projection)
@@ -0,0 +1,125 @@
+"""get_apps_by_group against the fake master's Marathon, checked against
+get_apps and counted request by request, label selectors, and the tasks
+of Marathon's framework indexed by app"""
+import threading
+from urllib.parse import urlparse
+
+import pytest
+
+from benchmarks.fake_master import FakeMaster
+from dcos_monitor import marathon
+from dcos_monitor.marathon import (AppTasks, get_apps, get_apps_by_group, label_matches, marathon_framework,
+                                   marathon_health, marathon_url, mesos_health, task_app_id)
+
+UUID = '0c7d2b5e-0a6f-11e7-9b4a-70b3d5800001'
+APPS = {
+    '/top': 'slave_public',
+    '/other': '*',
+    '/prod/web': 'slave_public',
+    '/prod/db': '*',
+    '/prod/api/v2': '*',
+    '/staging/web': 'slave_public',
+}
+
+
+def task(app_id, n, state='TASK_RUNNING'):
+    return {'id': '{0}.{1}{2}'.format(app_id[1:].replace('/', '_'), UUID[:-1], n), 'name': app_id[1:],
+            'framework_id': 'F-marathon', 'slave_id': 'S{0}'.format(n), 'state': state, 'role': APPS[app_id],
+            'resources': {'cpus': 0.5, 'mem': 64.0},
+            'statuses': [{'state': 'TASK_STARTING'}, {'state': state, 'healthy': n % 2 == 0}]}
+
+
+@pytest.fixture
+def master(monkeypatch):
+    tasks = [task(app_id, n) for app_id in APPS for n in range(2)]
+    state = {'frameworks': [{'id': 'F-marathon', 'name': 'marathon', 'tasks': tasks},
+                            {'id': 'F-other', 'name': 'other', 'tasks': []}]}
+    master = FakeMaster({'slaves': []}, state)
+    master.urls = []
+    lock = threading.Lock()
+
+    def get_json(url, timeout=None, headers=None):
+        with lock:
+            master.urls.append(url)
+        assert url.startswith('http://leader/marathon/')
+        parsed = urlparse(url)
+        return master.answer(parsed.path + '?' + parsed.query)
+
+    monkeypatch.setattr(marathon.transport, 'get_json', get_json)
+    return master
+
+
+def ids(apps):
+    return sorted(app['id'] for app in apps)
+
+
+def test_marathon_url():
+    assert marathon_url('leader', '/v2/apps', [('embed', 'apps.counts'), ('label', 'a==b')]) == \
+        'http://leader/marathon/v2/apps?embed=apps.counts&label=a%3D%3Db'
+    assert marathon_url('127.0.0.1:8080', '/v2/info') == 'http://127.0.0.1:8080/marathon/v2/info'
+
+
+def test_by_group_matches_get_apps(master):
+    assert ids(get_apps_by_group('leader')) == ids(get_apps('leader')) == sorted(APPS)
+
+
+def test_by_group_fetches_top_level_groups_only(master):
+    get_apps_by_group('leader', max_concurrency=4)
+    paths = sorted(url[len('http://leader/marathon'):] for url in master.urls)
+    assert paths == ['/v2/apps?embed=apps.counts&id=%2Fprod%2F',
+                     '/v2/apps?embed=apps.counts&id=%2Fstaging%2F',
+                     '/v2/groups?embed=group.apps&embed=group.apps.counts',
+                     '/v2/groups?embed=group.groups']
+
+
+def test_by_group_filters_top_level_apps_by_label(master):
+    public = get_apps_by_group('leader', label='tier==public')
+    assert ids(public) == ids(get_apps('leader', label='tier==public')) == ['/prod/web', '/staging/web', '/top']
+    assert ids(get_apps_by_group('leader', label='tier in (private)')) == ['/other', '/prod/api/v2', '/prod/db']
+
+
+def test_by_group_embeds_into_top_level_apps(master):
+    apps = {app['id']: app for app in get_apps_by_group('leader', embed=('apps.counts', 'apps.tasks'))}
+    assert [len(apps[app_id]['tasks']) for app_id in sorted(apps)] == [2] * len(APPS)
+    assert apps['/top']['tasksRunning'] == 2
+    assert not any(get_apps_by_group('leader', embed=())[0]['tasks'])
+
+
+def test_label_matches():
+    labels = {'tier': 'web', 'team': 'a', 'canary': ''}
+    assert label_matches(labels, 'tier==web')
+    assert label_matches(labels, 'canary')
+    assert label_matches(labels, 'tier!=db')
+    assert not label_matches(labels, 'tier!=web')
+    assert label_matches(labels, 'team in (a, b)')
+    assert not label_matches(labels, 'team notin (a,b)')
+    assert label_matches(labels, ' tier==web , team in (a,b), canary ')
+    assert not label_matches(labels, 'tier==web,missing')
+    # like Marathon's, a requirement needs the key
+    assert not label_matches(labels, 'missing!=x')
+    assert not label_matches(labels, 'missing notin (x)')
+    with pytest.raises(ValueError):
+        label_matches(labels, 'tier==(')
+
+
+def test_task_app_id():
+    assert task_app_id('prod_web.' + UUID) == '/prod/web'
+    assert task_app_id('prod_web.marathon-' + UUID) == '/prod/web'
+    assert task_app_id('prod_web.instance-' + UUID + '._app.3') == '/prod/web'
+    assert task_app_id('kafka-0-broker__' + UUID) is None
+
+
+def test_app_tasks(master):
+    frameworks = master.documents['/state.json']['frameworks']
+    framework = marathon_framework(frameworks, {'frameworkId': 'F-marathon'})
+    assert framework['id'] == 'F-marathon'
+    assert marathon_framework(frameworks)['id'] == 'F-marathon'
+    assert marathon_framework(frameworks, {'frameworkId': 'F-gone', 'name': 'nope'}) is None
+    tasks = AppTasks(framework)
+    assert len(tasks) == len(APPS)
+    assert [t['slave_id'] for t in tasks.tasks('/prod/api/v2')] == ['S0', 'S1']
+    assert tasks.tasks('/missing') == []
+    assert [mesos_health(t) for t in tasks.tasks('/top')] == [True, False]
+    assert mesos_health({'statuses': [{'state': 'TASK_RUNNING'}]}) is None
+    assert marathon_health({'healthCheckResults': [{'alive': True}, {'alive': False}]}) is False
+    assert marathon_health({}) is None
@@ -0,0 +1,98 @@
+"""compact() records read like the dicts they replace, and the garbage
+collector is left as it was however many compact() calls overlap"""
+import gc
+import json
+import os
+import threading
+
+import pytest
+
+from dcos_monitor import model
+from dcos_monitor.model import Agent, Record, compact, plain
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope='module')
+def slave_data():
+    with open(os.path.join(HERE, 'dev-mom_prod-mom_slave.json')) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def collecting():
+    enabled = gc.isenabled()
+    gc.enable()
+    yield
+    if not enabled:
+        gc.disable()
+
+
+def test_records_read_like_dicts(slave_data):
+    compacted = compact(slave_data)
+    assert type(compacted) is dict
+    slave = compacted['slaves'][0]
+    assert isinstance(slave, Agent)
+    assert slave['hostname'] == slave_data['slaves'][0]['hostname']
+    assert slave.get('missing', 'default') == 'default'
+    assert 'resources' in slave and 'missing' not in slave
+    assert list(slave) == list(slave_data['slaves'][0])
+    assert json.loads(json.dumps(compacted, default=plain)) == slave_data
+    assert compacted['slaves'] == slave_data['slaves']
+    with pytest.raises(TypeError):
+        slave['hostname'] = 'elsewhere'
+
+
+def test_strings_are_shared(slave_data):
+    first, second = compact(slave_data), compact(json.loads(json.dumps(slave_data)))
+    assert first['slaves'][0]['id'] is second['slaves'][0]['id']
+    # records of the same shape share a class
+    assert type(first['slaves'][0]) is type(second['slaves'][0])
+
+
+def test_without_records(slave_data):
+    compacted = compact(slave_data, records=False)
+    assert type(compacted['slaves'][0]) is dict
+    assert not isinstance(compacted['slaves'][0]['resources'], Record)
+
+
+def test_collector_is_switched_back_on(slave_data, collecting):
+    compact(slave_data)
+    assert gc.isenabled()
+
+
+def test_overlapping_calls_keep_the_collector_off_until_the_last(collecting):
+    model._pause_collection()
+    model._pause_collection()
+    assert not gc.isenabled()
+    model._resume_collection()
+    # the other call is still running
+    assert not gc.isenabled()
+    model._resume_collection()
+    assert gc.isenabled()
+
+
+def test_collector_that_was_off_stays_off(slave_data, collecting):
+    gc.disable()
+    compact(slave_data)
+    assert not gc.isenabled()
+
+
+def test_concurrent_calls(slave_data, collecting):
+    errors = []
+
+    def run():
+        try:
+            for _ in range(20):
+                compact(slave_data)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert gc.isenabled()
+    assert model._paused == 0
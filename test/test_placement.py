@@ -0,0 +1,111 @@
+"""FreeResources.fit on the /slaves fixture, checked agent by agent against
+what each agent has free"""
+import json
+import os
+
+import pytest
+
+from dcos_monitor.placement import RESOURCES, UNRESERVED, AppSpec, FreeResources, marathon_apps, port_count
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope='module')
+def slaves():
+    with open(os.path.join(HERE, 'dev-mom_prod-mom_slave.json')) as f:
+        return json.load(f)['slaves']
+
+
+@pytest.fixture(scope='module')
+def free(slaves):
+    return FreeResources(slaves)
+
+
+def spec(cpus=1.0, mem=128.0, disk=0.0, gpus=0.0, ports=0, roles=(UNRESERVED,), instances=1):
+    return AppSpec('/app', cpus, mem, disk, gpus, ports, tuple(roles), instances)
+
+
+def row(free, hostname):
+    return free.hostnames.index(hostname)
+
+
+def test_free_resources(free):
+    assert len(free) == 5
+    assert free.roles() == ['slave_public']
+    # 4 CPUs, 0.35 used
+    assert free.unreserved['cpus'][row(free, '10.0.3.124')] == pytest.approx(3.65)
+    # everything allocated
+    assert free.unreserved['cpus'][row(free, '10.0.0.242')] == 0.0
+    assert free.unreserved['ports'][row(free, '10.0.0.242')] == 30969 - 2
+    # the public agent is reserved for slave_public as a whole
+    public = row(free, '10.0.6.22')
+    assert [free.unreserved[resource][public] for resource in RESOURCES] == [0.0] * len(RESOURCES)
+    assert free.reserved['slave_public'][public]['mem'] == 15026.0 - 2048.0
+    assert free.reserved['slave_public'][public]['ports'] == 31998 - 12
+
+
+def test_fit_unreserved(free):
+    fit = free.fit(spec(cpus=1.0, mem=1024.0, ports=2, instances=7))
+    assert fit.counts[row(free, '10.0.3.124')] == 3
+    assert fit.counts[row(free, '10.0.1.206')] == 3
+    assert fit.total == 6
+    assert fit.agents == 2
+    assert not fit.fits
+    assert fit.limited_by() == ['cpus']
+    assert fit.headroom['cpus'] == 6
+    assert fit.headroom['mem'] == 13 + 13 + 14 + 14
+    assert 'disk' not in fit.headroom
+    assert fit.free['cpus'] == pytest.approx(7.3)
+
+
+def test_fit_by_role(free):
+    public = row(free, '10.0.6.22')
+    fit = free.fit(spec(cpus=0.0, mem=1000.0, roles=['slave_public']))
+    assert fit.counts[public] == 12
+    assert fit.total == 12
+    assert free.fit(spec(cpus=0.5, roles=['slave_public'])).total == 0
+    assert free.fit(spec(cpus=0.0, mem=1000.0, roles=['unknown'])).total == 0
+
+    both = free.fit(spec(cpus=0.0, mem=1000.0, roles=[UNRESERVED, 'slave_public']))
+    alone = free.fit(spec(cpus=0.0, mem=1000.0))
+    assert both.total == alone.total + 12
+    assert both.free['mem'] == alone.free['mem'] + 15026.0 - 2048.0
+
+
+def test_fit_matches_agent_by_agent(free):
+    for candidate in [spec(cpus=0.05, mem=32.0), spec(cpus=0.25, mem=4096.0, ports=1000),
+                      spec(cpus=0.0, mem=0.0, disk=50000.0), spec(cpus=0.1, mem=64.0, roles=[UNRESERVED, 'slave_public'])]:
+        fit = free.fit(candidate)
+        pool = free.pool(candidate.roles)
+        needs = candidate.needs()
+        for i in range(len(free)):
+            expected = min(int(round(pool[resource][i] - 0.0005, 3) / needs[resource] + 1e-9)
+                           for resource in RESOURCES if needs[resource] > 0)
+            assert fit.counts[i] == expected, (candidate, free.hostnames[i])
+
+
+def test_scalars_are_not_cut_by_float_division(free):
+    # 3.65 // 0.05 is 72.0 in floating point
+    assert free.fit(spec(cpus=0.05, mem=0.0)).counts[row(free, '10.0.3.124')] == 73
+
+
+def test_nothing_asked_for(free):
+    with pytest.raises(ValueError):
+        free.fit(spec(cpus=0.0, mem=0.0))
+
+
+def test_app_spec_from_marathon():
+    app = {'id': '/prod/web', 'cpus': 0.5, 'mem': 256, 'instances': 3, 'acceptedResourceRoles': ['slave_public'],
+           'container': {'docker': {'portMappings': [{'hostPort': 0}, {'containerPort': 80}]}}}
+    assert AppSpec.from_marathon(app) == AppSpec('/prod/web', 0.5, 256.0, 0.0, 0.0, 1, ('slave_public',), 3)
+    assert AppSpec.from_marathon({'id': '/x'}) == AppSpec('/x', 1.0, 128.0, 0.0, 0.0, 0, (UNRESERVED,), 1)
+    assert port_count({'portDefinitions': [{}, {}], 'ports': [1]}) == 2
+    assert port_count({'ports': [0, 0, 0]}) == 3
+
+
+def test_marathon_apps():
+    group = {'id': '/', 'apps': [{'id': '/a'}], 'groups': [{'id': '/g', 'apps': [{'id': '/g/b'}],
+                                                             'groups': [{'apps': [{'id': '/g/h/c'}]}]}]}
+    assert [app['id'] for app in marathon_apps(group)] == ['/a', '/g/b', '/g/h/c']
+    assert [app['id'] for app in marathon_apps([{'id': '/x'}, group])] == ['/x', '/a', '/g/b', '/g/h/c']
+    assert [app['id'] for app in marathon_apps({'id': '/y'})] == ['/y']
@@ -0,0 +1,122 @@
+"""fetch_state against the fake master: the planned endpoints, paged /tasks
+included, give what /state.json projected gives, and --full-state reports
+the same as the default"""
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+from click.testing import CliRunner
+
+from benchmarks import synthetic
+from benchmarks.fake_master import FakeMaster, make_handler
+from dcos_monitor import jsonstream
+from dcos_monitor.cli import cli
+from dcos_monitor.planner import Plan, fetch_state, plan
+from dcos_monitor.task_index import TASK_INDEX_FIELDS
+
+TASKS = 250
+PROJECTIONS = [
+    TASK_INDEX_FIELDS,
+    # every task list, from /state-summary and /tasks
+    {'frameworks': {'id': True, 'name': True, 'tasks': {'id': True, 'state': True},
+                    'unreachable_tasks': {'id': True}, 'completed_tasks': {'id': True, 'state': True}}},
+    # frameworks only, /state-summary alone
+    {'frameworks': {'id': True, 'name': True, 'active': True}},
+    # a framework field /state-summary doesn't have, /frameworks
+    {'frameworks': {'id': True, 'role': True, 'tasks': {'id': True}}},
+]
+
+
+@pytest.fixture(scope='module')
+def cluster():
+    cluster = synthetic.generate(agents=30, tasks=TASKS)
+    state = cluster.state_data
+    # some tasks /state.json lists apart
+    framework = state['frameworks'][0]
+    for task in framework['tasks'][:10]:
+        task['state'] = 'TASK_FINISHED'
+    for task in framework['tasks'][10:13]:
+        task['state'] = 'TASK_UNREACHABLE'
+    framework['completed_tasks'] = framework['tasks'][:10]
+    framework['unreachable_tasks'] = framework['tasks'][10:13]
+    framework['tasks'] = framework['tasks'][13:]
+    return cluster
+
+
+def serve(cluster, **kwargs):
+    master = FakeMaster(cluster.slave_data, cluster.state_data, **kwargs)
+    master.paths = []
+
+    class Handler(make_handler(master)):
+        def do_GET(self):
+            master.paths.append(self.path)
+            super(Handler, self).do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    server.master = master
+    server.address = '127.0.0.1:{0}'.format(server.server_address[1])
+    return server
+
+
+@pytest.fixture(params=[None, 40], ids=['pages-as-asked', 'page-limit'])
+def server(request, cluster):
+    server = serve(cluster, page_limit=request.param)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_plan():
+    assert plan(None) is None
+    assert plan({'frameworks': True, 'slaves': True}) is None
+    assert plan({'frameworks': True}) == Plan('/frameworks', True, {})
+    assert plan(TASK_INDEX_FIELDS).frameworks == '/state-summary'
+    assert plan(PROJECTIONS[3]).frameworks == '/frameworks'
+
+
+@pytest.mark.parametrize('projection', PROJECTIONS)
+def test_planned_matches_state_json(server, projection):
+    planned = fetch_state(server.address, projection, page_size=100)
+    full = fetch_state(server.address, projection, planned=False)
+    assert full == jsonstream.project(server.master.documents['/state.json'], projection)
+    assert planned == full
+
+
+def test_tasks_are_paged(server):
+    fetch_state(server.address, TASK_INDEX_FIELDS, page_size=100)
+    paths = [path.split('?')[0] for path in server.master.paths]
+    per_page = server.master.page_limit or 100
+    assert paths.count('/state-summary') == 1
+    assert paths.count('/tasks') == TASKS // per_page + 1
+    assert '/state.json' not in paths
+
+
+def test_old_masters_fall_back_to_state_json(cluster):
+    server = serve(cluster, endpoints=False)
+    try:
+        state = fetch_state(server.address, TASK_INDEX_FIELDS)
+        assert state == jsonstream.project(cluster.state_data, TASK_INDEX_FIELDS)
+        assert server.master.paths == ['/state-summary', '/state.json']
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_full_state_reports_the_same(server):
+    def vip(*args):
+        result = CliRunner().invoke(cli, ['--master', server.address, '--no-cache', '--output', 'json'] +
+                                    list(args) + ['vip'], catch_exceptions=False)
+        assert result.exit_code == 0, result.output
+        return json.loads(result.output)
+
+    planned = vip()
+    assert planned['vip']
+    assert not [path for path in server.master.paths if path.startswith('/state.json')]
+    del server.master.paths[:]
+    assert vip('--full-state') == planned
+    assert [path.split('?')[0] for path in server.master.paths] == ['/state.json']
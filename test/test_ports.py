@@ -0,0 +1,142 @@
+"""PortSet interval arithmetic checked against plain sets of ports,
+PortIndex on the /slaves fixture and the ports command's options"""
+import json
+import os
+import random
+
+import pytest
+from click.testing import CliRunner
+
+from dcos_monitor.cli import cli
+from dcos_monitor.ports import AgentPorts, PortIndex, PortSet
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def ports_of(port_set):
+    return {port for begin, end in port_set for port in range(begin, end + 1)}
+
+
+def random_port_set(rng, top=200):
+    intervals = []
+    for _ in range(rng.randrange(8)):
+        begin = rng.randrange(top)
+        intervals.append((begin, begin + rng.randrange(15)))
+    return PortSet(intervals)
+
+
+@pytest.fixture(scope='module')
+def slaves():
+    with open(os.path.join(HERE, 'dev-mom_prod-mom_slave.json')) as f:
+        return json.load(f)['slaves']
+
+
+def test_ranges_are_sorted_and_merged():
+    ports = PortSet([(10, 12), (1, 3), (4, 5), (2, 2), (7, 8), (8, 9)])
+    assert ports.intervals == [(1, 5), (7, 12)]
+    assert ports.begins == [1, 7]
+    assert len(ports) == 2
+    assert ports.count() == 11
+
+
+def test_parse():
+    assert PortSet.parse('[1025-2180, 2182-3887]').intervals == [(1025, 2180), (2182, 3887)]
+    assert PortSet.parse('[9610-9610, 80]').intervals == [(80, 80), (9610, 9610)]
+    assert PortSet.parse('[2-3, 1-1]') == PortSet([(1, 3)])
+    assert PortSet.parse('[]').intervals == []
+    assert PortSet.parse(None).intervals == []
+    assert str(PortSet.parse(' [5-6,1-2] ')) == '[1-2, 5-6]'
+
+
+def test_from_ranges():
+    ranges = [{'begin': 31000, 'end': 31005}, {'begin': 30000, 'end': 30999}]
+    assert PortSet.from_ranges(ranges).intervals == [(30000, 31005)]
+
+
+def test_contains():
+    ports = PortSet([(10, 12), (20, 20)])
+    assert [port for port in range(25) if port in ports] == [10, 11, 12, 20]
+    assert 1 not in PortSet()
+
+
+def test_difference():
+    ports = PortSet([(1, 10), (20, 30)])
+    assert ports.difference(PortSet([(3, 4), (8, 22), (30, 40)])).intervals == [(1, 2), (5, 7), (23, 29)]
+    assert ports.difference(PortSet()).intervals == ports.intervals
+    assert ports.difference(PortSet([(0, 100)])).intervals == []
+    assert PortSet().difference(ports).intervals == []
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_set_operations_match_sets(seed):
+    rng = random.Random(seed)
+    a, b = random_port_set(rng), random_port_set(rng)
+    assert ports_of(a.difference(b)) == ports_of(a) - ports_of(b)
+    assert ports_of(a.union(b)) == ports_of(a) | ports_of(b)
+    assert a.count() == len(ports_of(a))
+    # results stay merged: no two intervals touch
+    for result in (a.difference(b), a.union(b)):
+        assert all(end + 1 < begin for (_, end), (begin, _) in zip(result.intervals, result.intervals[1:]))
+    assert all((port in a) == (port in ports_of(a)) for port in range(-1, 220))
+
+
+def test_blocks():
+    ports = PortSet([(1, 2), (10, 14), (20, 22)])
+    assert ports.longest_block() == 5
+    assert ports.find_block(3) == 10
+    assert ports.find_block(1) == 1
+    assert ports.find_block(6) is None
+    assert PortSet().longest_block() == 0
+
+
+def test_agent_ports(slaves):
+    slave = next(s for s in slaves if s['hostname'] == '10.0.3.124')
+    agent = AgentPorts(slave)
+    assert agent.used.intervals == [(9610, 9610), (16775, 16775)]
+    assert agent.free == agent.total.difference(agent.used)
+    assert 9610 not in agent.free and 9611 in agent.free
+    assert agent.holders(9610) == ['*']
+    assert agent.holders(9611) == []
+    assert agent.longest_free_block == 32000 - 16776 + 1
+
+
+def test_port_index(slaves):
+    index = PortIndex(slaves)
+    assert len(index.agents) == len(slaves)
+    for agent in index.agents:
+        assert agent.free.count() == agent.total.count() - agent.used.count()
+
+    holders = index.holders(9610)
+    assert [(agent.hostname, roles) for agent, roles in holders] == [('10.0.3.124', ['*'])]
+    with_free = index.agents_with_free(9610)
+    assert len(with_free) == len([s for s in slaves if 9610 in PortSet.parse(s['resources'].get('ports'))]) - 1
+    assert '10.0.3.124' not in [agent.hostname for agent in with_free]
+
+    blocks = index.find_blocks(100, 2)
+    assert len(blocks) == 2
+    for agent, first in blocks:
+        assert all(port in agent.free for port in range(first, first + 100))
+    assert index.find_blocks(10 ** 6, 5) == []
+
+
+def ports(*args):
+    slave_data_file = os.path.join(HERE, 'dev-mom_prod-mom_slave.json')
+    return CliRunner().invoke(cli, ['--slave_data_file', slave_data_file, 'ports'] + list(args),
+                              catch_exceptions=False)
+
+
+@pytest.mark.parametrize('args, message', [
+    (['--free', '80', '--block', '10'], "--block can't be combined with --free"),
+    (['--block', '10', '--holder', '80'], "--holder can't be combined with --block"),
+    (['--holder', '80', '--free', '80', '--block', '10'], "--free can't be combined with --holder"),
+])
+def test_one_question_at_a_time(args, message):
+    result = ports(*args)
+    assert result.exit_code == 2
+    assert message in result.output
+
+
+def test_count_is_at_least_one():
+    assert ports('--block', '10', '--count', '0').exit_code == 2
+    result = ports('--block', '10', '--count', '1')
+    assert result.exit_code == 0, result.output
@@ -0,0 +1,85 @@
+"""the json, ndjson and csv renderers: children split out of their parents,
+csv headers per kind, model.py records written like dicts, and Labelled"""
+import csv
+import io
+import json
+
+import pytest
+
+from dcos_monitor.model import compact
+from dcos_monitor.render import (CSVRenderer, JSONRenderer, Labelled, NDJSONRenderer, TextRenderer, flatten,
+                                 make_renderer)
+
+AGENT = {'hostname': '10.0.1.1', 'resources': {'cpus': 4.0, 'mem': 1024.0},
+         'roles': [{'role': '*', 'cpus': 1.0}],
+         'containers': [{'executor_id': 'web.1', 'cpus': 0.5}, {'executor_id': 'db.1', 'cpus': 0.25}]}
+NESTED = {'containers': 'container'}
+
+
+def render(renderer, *emits):
+    stream = io.StringIO()
+    with renderer(stream) as out:
+        for kind, record, nested in emits:
+            out.emit(kind, record, nested=nested)
+    return stream.getvalue()
+
+
+def test_make_renderer():
+    assert isinstance(make_renderer('text', {}), TextRenderer)
+    assert isinstance(make_renderer('csv', {}), CSVRenderer)
+    with pytest.raises(ValueError):
+        make_renderer('yaml', {})
+
+
+def test_json_keeps_children_nested():
+    output = render(JSONRenderer, ('agent', AGENT, NESTED), ('summary', {'agents': 1}, None))
+    assert json.loads(output) == {'agent': [AGENT], 'summary': [{'agents': 1}]}
+
+
+def test_ndjson_emits_children_after_their_parent():
+    lines = [json.loads(line) for line in render(NDJSONRenderer, ('agent', AGENT, NESTED)).splitlines()]
+    assert [line['type'] for line in lines] == ['agent', 'container', 'container']
+    assert 'containers' not in lines[0]
+    assert lines[0]['resources'] == AGENT['resources']
+    assert lines[2] == {'type': 'container', 'executor_id': 'db.1', 'cpus': 0.25}
+
+
+def test_flatten():
+    assert flatten({'a': {'b': 1, 'c': {'d': 2}}, 'e': [1, 2], 'f': None}) == \
+        {'a.b': 1, 'a.c.d': 2, 'e': '[1, 2]', 'f': None}
+
+
+def test_csv_writes_a_header_per_kind():
+    output = render(CSVRenderer, ('agent', AGENT, NESTED), ('agent', dict(AGENT, containers=[]), NESTED),
+                    ('summary', {'agents': 2}, None))
+    rows = list(csv.reader(io.StringIO(output)))
+    assert rows[0] == ['type', 'hostname', 'resources.cpus', 'resources.mem', 'roles']
+    assert rows[1] == ['agent', '10.0.1.1', '4.0', '1024.0', '[{"role": "*", "cpus": 1.0}]']
+    assert rows[2] == []
+    assert rows[3] == ['type', 'executor_id', 'cpus']
+    assert rows[4:6] == [['container', 'web.1', '0.5'], ['container', 'db.1', '0.25']]
+    # back to agents: a new header
+    assert rows[6:9] == [[], rows[0], rows[1]]
+    assert rows[9:] == [[], ['type', 'agents'], ['summary', '2']]
+
+
+def test_csv_new_header_when_columns_grow():
+    output = render(CSVRenderer, ('role', {'role': 'a'}, None), ('role', {'role': 'b', 'cpus': 1.0}, None))
+    assert list(csv.reader(io.StringIO(output))) == [['type', 'role'], ['role', 'a'], [],
+                                                      ['type', 'role', 'cpus'], ['role', 'b', '1.0']]
+
+
+@pytest.mark.parametrize('renderer', [JSONRenderer, NDJSONRenderer, CSVRenderer])
+def test_records_are_written_like_dicts(renderer):
+    compacted = compact({'slaves': [AGENT]})['slaves'][0]
+    assert render(renderer, ('agent', compacted, NESTED)) == render(renderer, ('agent', AGENT, NESTED))
+
+
+def test_labelled():
+    stream = io.StringIO()
+    with NDJSONRenderer(stream) as out:
+        Labelled(out, cluster='prod').emit('agent', AGENT, nested=NESTED)
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line['cluster'] for line in lines] == ['prod'] * 3
+    # the record passed in is left as it was
+    assert 'cluster' not in AGENT and 'cluster' not in AGENT['containers'][0]
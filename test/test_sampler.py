@@ -0,0 +1,112 @@
+"""ContainerWindow and Sampler: the ring buffer wrapping around, samples
+that come back out of order, and the window summaries"""
+import pytest
+
+from dcos_monitor.sampler import ContainerWindow, Sampler, disk_bytes, percentile, summarize
+
+
+def statistics(ts, cpu, rss=100.0, rx=0.0, **extra):
+    stats = {'timestamp': ts, 'cpus_user_time_secs': cpu, 'cpus_system_time_secs': 0.0, 'cpus_limit': 1.1,
+             'mem_rss_bytes': rss, 'mem_limit_bytes': 1000.0, 'net_rx_bytes': rx, 'net_tx_bytes': 0.0}
+    stats.update(extra)
+    return stats
+
+
+def container(executor, ts, cpu, **kwargs):
+    return {'executor_id': executor, 'statistics': statistics(ts, cpu, **kwargs)}
+
+
+def test_window_keeps_the_last_samples():
+    window = ContainerWindow(3)
+    for n in range(7):
+        window.add(n, statistics(100.0 + n, float(n)))
+    assert window.count == 7
+    assert (window.first, window.last) == (0, 6)
+    assert [row[0] for row in window.rows()] == [104.0, 105.0, 106.0]
+
+
+def test_window_not_full_yet():
+    window = ContainerWindow(4)
+    window.add(0, statistics(10.0, 1.0))
+    assert [row[0] for row in window.rows()] == [10.0]
+    record = window.summary()
+    assert record['samples'] == 1
+    assert record['cpus_used'] is None
+    assert record['memory_used'] == {'min': 100.0, 'avg': 100.0, 'p95': 100.0, 'max': 100.0}
+
+
+def test_out_of_order_samples_are_sorted_by_timestamp():
+    window = ContainerWindow(4)
+    # the CPU counter grows by 1 second per second of wall time
+    for n, ts in [(1, 11.0), (0, 10.0), (3, 13.0), (2, 12.0)]:
+        window.add(n, statistics(ts, ts - 10.0))
+    assert [row[0] for row in window.rows()] == [10.0, 11.0, 12.0, 13.0]
+    assert window.summary()['cpus_used'] == {'min': 1.0, 'avg': 1.0, 'p95': 1.0, 'max': 1.0}
+
+
+def test_out_of_order_after_wraparound():
+    window = ContainerWindow(3)
+    for n, ts in [(0, 10.0), (2, 12.0), (1, 11.0), (4, 14.0), (3, 13.0)]:
+        window.add(n, statistics(ts, 2 * (ts - 10.0)))
+    # the last three added, whatever their timestamps
+    assert [row[0] for row in window.rows()] == [11.0, 13.0, 14.0]
+    record = window.summary()
+    assert record['cpus_used'] == {'min': 2.0, 'avg': 2.0, 'p95': 2.0, 'max': 2.0}
+    assert record['samples'] == 3
+
+
+def test_rates_skip_restarts_and_equal_timestamps():
+    window = ContainerWindow(5)
+    for n, (ts, rx) in enumerate([(0.0, 0.0), (2.0, 200.0), (2.0, 300.0), (4.0, 50.0), (5.0, 150.0)]):
+        window.add(n, statistics(ts, 0.0, rx=rx))
+    # 0 -> 2 s: 100/s, the equal timestamps are skipped, the drop to 50 is a
+    # restart, 4 -> 5 s: 100/s
+    assert window.summary()['net_rx_rate'] == {'min': 100.0, 'avg': 100.0, 'p95': 100.0, 'max': 100.0}
+
+
+def test_missing_counters():
+    window = ContainerWindow(2)
+    window.add(0, {'timestamp': 1.0})
+    window.add(1, {'timestamp': 2.0})
+    record = window.summary()
+    assert record['cpus_used'] is None
+    assert record['memory_used'] is None
+    assert record['cpus_allocated'] is None
+    assert record['disk_read_rate'] is None
+
+
+def test_disk_bytes():
+    blkio = {'throttling': [
+        {'device': {'major': 8}, 'io_service_bytes': [{'op': 'Read', 'value': 5}]},
+        {'io_service_bytes': [{'op': 'Read', 'value': 10}, {'op': 'Write', 'value': 20}, {'op': 'Total', 'value': 30}]},
+    ]}
+    assert disk_bytes({'blkio_statistics': blkio}) == (10.0, 20.0)
+    cfq = {'cfq': [{'device': {'major': 8}, 'io_service_bytes': [{'op': 'WRITE', 'value': 7}]}]}
+    assert disk_bytes({'blkio_statistics': cfq}) == (0.0, 7.0)
+    read, written = disk_bytes({})
+    assert read != read and written != written
+
+
+def test_percentile_and_summarize():
+    ordered = list(range(1, 21))
+    assert percentile(ordered, 95) == 19
+    assert percentile(ordered, 100) == 20
+    assert percentile([3.0], 95) == 3.0
+    assert summarize([float('nan'), 1.0, 3.0]) == {'min': 1.0, 'avg': 2.0, 'p95': 3.0, 'max': 3.0}
+    assert summarize([float('nan')]) is None
+
+
+def test_sampler_flags_containers_that_come_and_go():
+    sampler = Sampler(3)
+    sampler.add('a', 1, [container('steady', 11.0, 1.0), container('gone', 11.0, 1.0)])
+    sampler.add('a', 0, [container('steady', 10.0, 0.0), container('gone', 10.0, 0.0)])
+    sampler.add('a', 2, [container('steady', 12.0, 2.0), container('new', 12.0, 0.0)])
+    records = {r['executor_id']: r for r in sampler.container_records({'id': 'S1', 'hostname': 'a'})}
+    assert sorted(records) == ['gone', 'new', 'steady']
+    assert (records['steady']['appeared'], records['steady']['disappeared']) == (False, False)
+    assert (records['gone']['appeared'], records['gone']['disappeared']) == (False, True)
+    assert (records['new']['appeared'], records['new']['disappeared']) == (True, False)
+    assert records['steady']['cpus_used']['avg'] == pytest.approx(1.0)
+    assert records['steady']['samples'] == 3
+    assert records['steady']['agent_id'] == 'S1'
+    assert sampler.container_records({'id': 'S2', 'hostname': 'b'}) is None
@@ -0,0 +1,101 @@
+"""snapshots of the fixtures: converted and loaded back, projected like
+jsonstream projects the JSON, files of another kind refused, and reports
+reading them like the JSON files they were made from"""
+import json
+import marshal
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from dcos_monitor import jsonstream, snapshot
+from dcos_monitor.cli import cli
+from dcos_monitor.task_index import TASK_INDEX_FIELDS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SLAVES = os.path.join(HERE, 'dev-mom_prod-mom_slave.json')
+STATE = os.path.join(HERE, 'dev-mom_prod-mom_state.json')
+
+
+def read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope='module')
+def converted(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('snapshots')
+    paths = {}
+    for name, source in (('slaves', SLAVES), ('state', STATE)):
+        paths[name] = str(directory / name)
+        snapshot.convert(source, paths[name])
+    return paths
+
+
+def test_round_trip(converted):
+    assert snapshot.is_snapshot(converted['state'])
+    assert not snapshot.is_snapshot(STATE)
+    assert snapshot.load(converted['slaves']) == read(SLAVES)
+    assert snapshot.load(converted['state']) == read(STATE)
+    assert [name for name in os.listdir(os.path.dirname(converted['state'])) if name.endswith('.tmp')] == []
+
+
+@pytest.mark.parametrize('projection', [
+    TASK_INDEX_FIELDS,
+    {'frameworks': True},
+    {'slaves': {'hostname': True}, 'missing': True},
+    True,
+    None,
+])
+def test_projection(converted, projection):
+    with open(STATE) as f:
+        expected = jsonstream.load(f, projection)
+    assert snapshot.load(converted['state'], projection) == expected
+    assert snapshot.load_file(converted['state'], projection) == snapshot.load_file(STATE, projection)
+
+
+def test_converting_a_snapshot_again(converted, tmp_path):
+    again = str(tmp_path / 'again')
+    snapshot.convert(converted['slaves'], again)
+    with open(again, 'rb') as a, open(converted['slaves'], 'rb') as b:
+        assert a.read() == b.read()
+
+
+def test_refused(tmp_path):
+    with pytest.raises(ValueError):
+        snapshot.write([1, 2], str(tmp_path / 'list'))
+
+    other = tmp_path / 'other'
+    other.write_bytes(b'DCOSMONX\n')
+    with pytest.raises(ValueError):
+        snapshot.load(str(other))
+    newer = tmp_path / 'newer'
+    newer.write_bytes(snapshot.MAGIC + str(marshal.version + 1).encode('ascii') + b'\n')
+    with pytest.raises(ValueError) as raised:
+        snapshot.load(str(newer))
+    assert 'newer Python' in str(raised.value)
+
+
+def run(*args):
+    result = CliRunner().invoke(cli, list(args), catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_convert_command(tmp_path):
+    destination = str(tmp_path / 'slaves')
+    run('convert', SLAVES, destination)
+    assert snapshot.load(destination) == read(SLAVES)
+
+    listed = tmp_path / 'list.json'
+    listed.write_text('[]')
+    result = CliRunner().invoke(cli, ['convert', str(listed), str(tmp_path / 'list')])
+    assert result.exit_code == 1
+
+
+@pytest.mark.parametrize('command', [['role_data'], ['vip'], ['print_full_status']])
+def test_reports_read_snapshots(converted, command):
+    from_json = run('--slave_data_file', SLAVES, '--state_data_file', STATE, '--output', 'json', *command)
+    from_snapshots = run('--slave_data_file', converted['slaves'], '--state_data_file', converted['state'],
+                         '--output', 'json', *command)
+    assert json.loads(from_snapshots) == json.loads(from_json)
@@ -0,0 +1,85 @@
+"""TaskIndex on the state.json fixture: VIPs looked up by every spelling,
+read from the projected stream as from the whole document, and the vip
+command over it"""
+import json
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from dcos_monitor import jsonstream
+from dcos_monitor.cli import cli
+from dcos_monitor.task_index import TASK_INDEX_FIELDS, TaskIndex, running_status, vip_address
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STATE = os.path.join(HERE, 'dev-mom_prod-mom_state.json')
+MARATHON = 'a4680d73-10c1-4e4c-ad66-bde8a3c9d20a-0001'
+
+
+@pytest.fixture(scope='module')
+def index():
+    with open(STATE) as f:
+        return TaskIndex(json.load(f))
+
+
+def test_vip_address():
+    assert vip_address('prod/web:80', 'marathon') == 'prod/web.marathon.l4lb.thisdcos.directory:80'
+
+
+def test_index(index):
+    assert index.framework_ids[-1] == 'a4680d73-10c1-4e4c-ad66-bde8a3c9d20a-0000'
+    assert len(index.tasks) == len(index.running) == 8
+    assert sum(len(tasks) for tasks in index.agent_tasks.values()) == 8
+    assert sorted(index.framework_vips[MARATHON]) == ['198.168.250.250:9999', 'dev/dev-user-marathon:8443',
+                                                      'prod/prod-user-marathon:9443']
+    assert index.framework_vips['a4680d73-10c1-4e4c-ad66-bde8a3c9d20a-0000'] == {}
+
+
+@pytest.mark.parametrize('name', [
+    'prod/prod-user-marathon:9443',
+    '/prod/prod-user-marathon:9443',
+    'prod/prod-user-marathon',
+    'prod/prod-user-marathon.marathon.l4lb.thisdcos.directory:9443',
+    'prod/prod-user-marathon.marathon.l4lb.thisdcos.directory',
+])
+def test_lookup_vip(index, name):
+    (framework, vip, address, backends), = index.lookup_vip(name)
+    assert framework['id'] == MARATHON
+    assert vip == 'prod/prod-user-marathon:9443'
+    assert address == 'prod/prod-user-marathon.marathon.l4lb.thisdcos.directory:9443'
+    assert backends == [('10.0.0.242', 11912)]
+
+
+def test_lookup_unknown_vip(index):
+    assert index.lookup_vip('prod/prod-user-marathon:9444') == []
+    assert index.lookup_vip('marathon.l4lb.thisdcos.directory') == []
+
+
+def test_projected_state_indexes_the_same(index):
+    with open(STATE, 'rb') as f:
+        projected = TaskIndex(jsonstream.load(f, TASK_INDEX_FIELDS))
+    assert projected.framework_vips == index.framework_vips
+    assert sorted(projected.running) == sorted(index.running)
+
+
+def test_running_status():
+    assert running_status({'statuses': [{'state': 'TASK_STAGING'}]}) == (None, None)
+    status = {'state': 'TASK_RUNNING', 'container_status': {'network_infos': []}}
+    assert running_status({'statuses': [{'state': 'TASK_STARTING'}, status]}) == (status, None)
+
+
+def vip(*args):
+    return CliRunner().invoke(cli, ['--state_data_file', STATE, '--output', 'ndjson', 'vip'] + list(args),
+                              catch_exceptions=False)
+
+
+def test_vip_command():
+    result = vip('--name', 'dev/dev-user-marathon')
+    assert result.exit_code == 0, result.output
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert [r['type'] for r in records] == ['vip', 'backend']
+    assert records[0]['address'] == 'dev/dev-user-marathon.marathon.l4lb.thisdcos.directory:8443'
+    assert (records[1]['ip'], records[1]['port']) == ('10.0.0.177', 29629)
+
+    every = [json.loads(line) for line in vip().output.splitlines()]
+    assert len([r for r in every if r['type'] == 'vip']) == 3
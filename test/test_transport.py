@@ -0,0 +1,129 @@
+"""Transport against a local HTTP server: busy answers retried with
+backoff, errors that aren't, gzipped bodies read through a projection, and
+the per-host stats"""
+import gzip
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+import requests
+
+from dcos_monitor.transport import Transport, master_url
+
+DOCUMENT = {'frameworks': [{'id': 'F{0}'.format(n), 'name': 'framework', 'tasks': []} for n in range(50)]}
+BODY = gzip.compress(json.dumps(DOCUMENT).encode('utf-8'))
+
+
+class Handler(BaseHTTPRequestHandler):
+    # path -> statuses answered before the document
+    failures = {}
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        pending = self.failures.get(self.path, [])
+        served = self.server.paths.count(self.path) - 1
+        if served < len(pending):
+            self.send_response(pending[served])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(Handler, 'failures', {'/busy': [503, 502], '/down': [503] * 5, '/missing': [404]})
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    server.paths = []
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def transport():
+    return Transport(retries=2, backoff=0.01)
+
+
+def url(server, path):
+    return 'http://127.0.0.1:{0}{1}'.format(server.server_address[1], path)
+
+
+def host(server):
+    return '127.0.0.1:{0}'.format(server.server_address[1])
+
+
+def test_master_url():
+    assert master_url('10.0.6.89', '/slaves') == 'http://10.0.6.89:5050/slaves'
+    assert master_url('10.0.6.89:8080', '/slaves') == 'http://10.0.6.89:8080/slaves'
+    assert master_url('10.0.6.89', '/marathon/v2/apps', port=None) == 'http://10.0.6.89/marathon/v2/apps'
+
+
+def test_get_json(server, transport):
+    assert transport.get_json(url(server, '/state.json')) == DOCUMENT
+    stats = transport.stats[host(server)]
+    assert (stats.requests, stats.errors, stats.retries) == (1, 0, 0)
+    # what came off the wire, not the decompressed document
+    assert stats.bytes == len(BODY)
+
+
+def test_projection(server, transport):
+    projected = transport.get_json(url(server, '/state.json'), projection={'frameworks': {'id': True}})
+    assert projected == {'frameworks': [{'id': f['id']} for f in DOCUMENT['frameworks']]}
+
+
+def test_busy_answers_are_retried(server, transport):
+    assert transport.get_json(url(server, '/busy')) == DOCUMENT
+    assert server.paths == ['/busy'] * 3
+    stats = transport.stats[host(server)]
+    assert (stats.requests, stats.errors, stats.retries) == (3, 2, 2)
+
+
+def test_retries_run_out(server, transport):
+    with pytest.raises(requests.exceptions.HTTPError):
+        transport.get_json(url(server, '/down'))
+    assert server.paths == ['/down'] * 3
+    with pytest.raises(requests.exceptions.HTTPError):
+        transport.get_json(url(server, '/down'), retries=0)
+    assert len(server.paths) == 4
+
+
+def test_other_errors_are_not_retried(server, transport):
+    with pytest.raises(requests.exceptions.HTTPError):
+        transport.get_json(url(server, '/missing'))
+    assert server.paths == ['/missing']
+    assert transport.stats[host(server)].errors == 1
+
+
+def test_connection_errors_are_retried(transport):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    with pytest.raises(requests.exceptions.ConnectionError):
+        transport.get_json('http://127.0.0.1:{0}/slaves'.format(port))
+    stats = transport.stats['127.0.0.1:{0}'.format(port)]
+    assert (stats.requests, stats.errors, stats.retries) == (3, 3, 2)
+
+
+def test_summary(server, transport):
+    transport.get_json(url(server, '/busy'))
+    line, = transport.summary()
+    assert line.startswith('{0}: 3 requests (2 failed, 2 retries), {1} bytes, '.format(host(server), len(BODY)))
+
+
+def test_timeouts(transport):
+    assert transport.timeouts() == (5, 30)
+    assert transport.timeouts(2) == (2, 2)
+    assert transport.timeouts(60) == (5, 60)
+    assert transport.timeouts((1, 3)) == (1, 3)
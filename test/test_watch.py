@@ -0,0 +1,75 @@
+"""--watch: agents are only recomputed when their record changes, and a
+refresh that fails ends the run with status 1"""
+import json
+import logging
+import os
+
+import pytest
+
+from dcos_monitor import watch
+from dcos_monitor.watch import AgentWatcher, poll
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class Stop(BaseException):
+    pass
+
+
+class FakeContext(object):
+    """reload() returns `polls` in turn and raises the ones that are exceptions"""
+
+    def __init__(self, polls):
+        self.log = logging.getLogger('test_watch')
+        self.cache = object()
+        self.polls = list(polls)
+
+    def reload(self, dataset):
+        assert dataset == 'slave_data'
+        poll = self.polls.pop(0)
+        if isinstance(poll, BaseException):
+            raise poll
+        return poll
+
+
+@pytest.fixture(scope='module')
+def slave_data():
+    with open(os.path.join(HERE, 'dev-mom_prod-mom_slave.json')) as f:
+        return json.load(f)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(watch.time, 'sleep', lambda seconds: None)
+
+
+def test_agent_watcher(slave_data):
+    computed = []
+    watcher = AgentWatcher(lambda slave: computed.append(slave['id']) or slave['hostname'])
+    slaves = slave_data['slaves']
+    changed, removed = watcher.update(slaves)
+    assert changed == [s['id'] for s in slaves] and removed == []
+
+    # offers and the like don't count, resources do
+    edited = [dict(slaves[0], offered_resources={'cpus': 1.0}), dict(slaves[1], active=False)] + slaves[3:]
+    assert watcher.update(edited) == ([slaves[1]['id']], [slaves[2]['id']])
+    assert len(computed) == len(slaves) + 1
+    assert watcher.result(slaves[0]['id']) == slaves[0]['hostname']
+
+
+def test_poll_redraws_until_interrupted(slave_data):
+    ctx = FakeContext([slave_data, slave_data, KeyboardInterrupt()])
+    redrawn = []
+    poll(ctx, 1, redrawn.append)
+    assert redrawn == [slave_data['slaves']] * 2
+    assert ctx.cache is None
+
+
+@pytest.mark.parametrize('failure', [SystemExit(1), SystemExit(0), SystemExit(), ValueError('bad payload')])
+def test_failed_refresh_exits_non_zero(slave_data, failure):
+    ctx = FakeContext([slave_data, failure])
+    redrawn = []
+    with pytest.raises(SystemExit) as exited:
+        poll(ctx, 1, redrawn.append)
+    assert exited.value.code == 1
+    assert len(redrawn) == 1